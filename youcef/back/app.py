@@ -1,85 +1,163 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, redirect, send_file
 from flask_cors import CORS
 from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
-from models import db, Group, Worker, WorkSession, Advance, Loan, LoanPayment
+from models import db, Group, Worker, WorkSession, Advance, Loan, LoanPayment, PayrollRun, PayrollRunEntry, Job
 from config import Config
+from payroll import compute_payment_summary
+from payroll_runs import PayrollRunError, close_payroll_run
+from dashboard import compute_dashboard
+import exports
+import jobs
+import worker_import
+import serializers
+from clock_index import ClockIndex, calculate_hours, session_payload
+from clock_batch import apply_clock_events
+from clock_writer import ClockWriter
+import migrations
+import cycle_hours
+from pagination import ListQueryError, apply_filters, keyset_list, parse_bool_arg, parse_date_arg, parse_limit
+from change_tracking import ChangeTracker
+from metrics import Metrics
+from query_budget import query_budget
+from result_cache import ResultCache
+from events import EVENTS_PATH, EventHub
+import serving
+import storage_profile
+import read_pool
+from static_assets import HOME_PAGE, StaticAssets
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import os
+import sys
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
     
     # Initialize extensions
     db.init_app(app)
+    # WAL, busy timeout and the other pragmas on every pooled SQLite connection
+    storage_profile.init_app(app)
+    # Report routes (@read_only) read through a pool of their own
+    read_pool.init_app(app)
     
     # Configure CORS properly
     CORS(app, resources={
         r"/api/*": {
-            "origins": ["http://localhost:8080", "http://127.0.0.1:8080", "http://localhost:5000", "http://127.0.0.1:5000"],
+            "origins": app.config['CORS_ORIGINS'],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "X-Admin-Pin"]
+            "allow_headers": ["Content-Type", "X-Admin-Pin", "If-None-Match", "If-Modified-Since", "Last-Event-ID"],
+            "expose_headers": ["X-Next-Cursor", "ETag", "Last-Modified", "Content-Disposition"],
+            # Conditional GETs carry non-simple headers; cache the preflight
+            "max_age": 600
         }
     })
     
+    # Bad limit/after/filter query parameters on list endpoints
+    @app.errorhandler(ListQueryError)
+    def list_query_error(error):
+        return jsonify({'error': str(error)}), 400
+    
     # Authentication helper
     def check_admin_pin():
-        pin = request.headers.get('X-Admin-Pin') or request.json.get('admin_pin') if request.is_json else None
+        pin = request.headers.get('X-Admin-Pin')
+        if pin is None and request.is_json:
+            # Bodies like the import's JSON list carry no admin_pin field
+            data = request.get_json(silent=True)
+            pin = data.get('admin_pin') if isinstance(data, dict) else None
         return pin == Config.ADMIN_PIN
     
-    # Helper function to check if worker already clocked in today
-    def is_worker_clocked_in(worker_id):
-        today = date.today()
-        session = WorkSession.query.filter_by(
-            worker_id=worker_id, 
-            date=today, 
-            clock_out=None
-        ).first()
-        return session is not None
-    
-    # Calculate hours worked
-    def calculate_hours(clock_in, clock_out):
-        if clock_in and clock_out:
-            duration = clock_out - clock_in
-            return round(duration.total_seconds() / 3600, 2)
-        return 0
-
-    # Calculate worker's current monthly cycle based on hire date
-    def get_current_cycle_dates(hire_date):
-        from datetime import datetime, date
-        from dateutil.relativedelta import relativedelta
-        
-        today = date.today()
-        hire_day = hire_date.day
-        
-        # Calculate current cycle start date
-        if today.day >= hire_day:
-            # Current month cycle
-            cycle_start = date(today.year, today.month, hire_day)
-        else:
-            # Previous month cycle
-            prev_month = today - relativedelta(months=1)
-            cycle_start = date(prev_month.year, prev_month.month, hire_day)
-        
-        # Calculate cycle end date (day before next cycle)
-        cycle_end = cycle_start + relativedelta(months=1) - relativedelta(days=1)
-        
-        return cycle_start, cycle_end
-
+    # Per-route latency, SQL and commit timings behind /api/metrics
+    metrics = Metrics(app)
+    
+    # In-memory worker-code / open-session index for clock events
+    clock_index = ClockIndex()
+    app.extensions['clock_index'] = clock_index
+    
+    # Single-row clock-in/out writes share group commits under burst load
+    clock_writer = ClockWriter(app)
+    metrics.add_gauges('clock_writer', clock_writer.stats)
+    
+    # Per-table change counters behind the ETag / Last-Modified of GET routes
+    changes = ChangeTracker(app)
+    
+    # LRU of rendered responses for the heaviest reads, dropped on commit
+    cache = ResultCache(changes, app.config['RESULT_CACHE_SIZE'])
+    app.extensions['result_cache'] = cache
+    metrics.add_gauges('result_cache', cache.stats)
+    
+    # Scheduled PRAGMA optimize / ANALYZE / incremental vacuum, started with the server
+    maintenance = storage_profile.StorageMaintenance(app)
+    metrics.add_gauges('storage_maintenance', maintenance.stats)
+    
+    # Change notifications for open dashboards, pushed after each commit
+    # Same origins as the API (the Electron shell loads its pages from the backend)
+    event_hub = EventHub(app.config['CORS_ORIGINS'])
+    app.extensions['event_hub'] = event_hub
+    
+    def notify(event_type, **data):
+        event_hub.publish(event_type, data)
+    
+    # Heavy exports as background jobs on worker processes
+    job_runner = jobs.JobRunner(app)
+    metrics.add_gauges('jobs', job_runner.stats)
+    
+    # Pages and fingerprinted, precompressed assets of front/, served at /
+    assets = StaticAssets(app.config['FRONTEND_DIR'])
+    app.extensions['static_assets'] = assets
+    
     # ROUTES
     
     @app.route('/api/test', methods=['GET'])
+    @query_budget(0)
     def test():
         return jsonify({'message': 'Factory Management API is running!', 'status': 'success'})
     
+    @app.route('/api/events', methods=['GET'])
+    @query_budget(0)
+    def event_stream():
+        # The stream is served by the event hub's own loop, not a Flask thread
+        if not event_hub.running:
+            return jsonify({'error': 'Event stream is not running'}), 503
+        
+        host = request.host.split(':')[0]
+        target = f"{request.scheme}://{host}:{event_hub.address[1]}{EVENTS_PATH}"
+        if request.query_string:
+            target += '?' + request.query_string.decode()
+        return redirect(target, 307)
+    
+    @app.route('/api/cache/stats', methods=['GET'])
+    @query_budget(0)
+    def cache_stats():
+        return jsonify(cache.stats())
+    
+    @app.route('/api/metrics', methods=['GET'])
+    @query_budget(0)
+    def get_metrics():
+        return app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    # DASHBOARD
+    
+    @app.route('/api/dashboard', methods=['GET'])
+    @query_budget(2)
+    @changes.conditional('workers', 'work_sessions', 'advances')
+    @cache.cached('workers', 'work_sessions', 'advances')
+    def dashboard():
+        # ?limit= sets how many recent sessions come back
+        return jsonify(compute_dashboard(clock_index, parse_limit(app.config['DASHBOARD_RECENT_SESSIONS'])))
+    
     # GROUP MANAGEMENT
     
     @app.route('/api/groups', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('groups', 'workers')
+    @cache.cached('groups', 'workers')
     def get_groups():
-        groups = Group.query.filter_by(is_active=True).all()
-        return jsonify([group.to_dict() for group in groups])
+        groups = Group.query.filter_by(is_active=True)
+        return jsonify(serializers.groups.dump(groups))
     
     @app.route('/api/groups', methods=['POST'])
+    @query_budget(8)
     def create_group():
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -120,9 +198,12 @@ def create_app():
         
         db.session.commit()
         
-        return jsonify({'message': 'Group created successfully', 'group': group.to_dict()}), 201
+        group_data = group.to_dict()
+        notify('group_changed', action='created', group=group_data)
+        return jsonify({'message': 'Group created successfully', 'group': group_data}), 201
     
     @app.route('/api/groups/<int:group_id>', methods=['PUT'])
+    @query_budget(10)
     def update_group(group_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -165,9 +246,13 @@ def create_app():
             group.team_leader_id = new_leader_id
         
         db.session.commit()
-        return jsonify({'message': 'Group updated successfully', 'group': group.to_dict()})
+        
+        group_data = group.to_dict()
+        notify('group_changed', action='updated', group=group_data)
+        return jsonify({'message': 'Group updated successfully', 'group': group_data})
     
     @app.route('/api/groups/<int:group_id>', methods=['DELETE'])
+    @query_budget(6)
     def delete_group(group_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -187,16 +272,20 @@ def create_app():
         # Deactivate group
         group.is_active = False
         db.session.commit()
+        notify('group_changed', action='deleted', group={'id': group_id})
         
         return jsonify({'message': 'Group deleted successfully'})
     
     @app.route('/api/groups/<int:group_id>/workers', methods=['GET'])
+    @query_budget(2)
+    @changes.conditional('workers', 'groups')
     def get_group_workers(group_id):
-        group = Group.query.get_or_404(group_id)
-        workers = Worker.query.filter_by(group_id=group_id, is_active=True).all()
-        return jsonify([worker.to_dict() for worker in workers])
+        Group.query.get_or_404(group_id)
+        workers = Worker.query.filter_by(group_id=group_id, is_active=True)
+        return jsonify(serializers.workers.dump(workers))
     
     @app.route('/api/groups/<int:group_id>/add_worker', methods=['POST'])
+    @query_budget(5)
     def add_worker_to_group(group_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -218,10 +307,12 @@ def create_app():
         
         worker.group_id = group_id
         db.session.commit()
+        notify('worker_changed', action='updated', worker=worker.to_dict())
         
         return jsonify({'message': 'Worker added to group successfully'})
     
     @app.route('/api/groups/<int:group_id>/remove_worker', methods=['POST'])
+    @query_budget(6)
     def remove_worker_from_group(group_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -247,17 +338,22 @@ def create_app():
         
         worker.group_id = None
         db.session.commit()
+        notify('worker_changed', action='updated', worker=worker.to_dict())
         
         return jsonify({'message': 'Worker removed from group successfully'})
     
     # WORKER MANAGEMENT
     
     @app.route('/api/workers', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('workers', 'groups')
+    @cache.cached('workers', 'groups')
     def get_workers():
-        workers = Worker.query.filter_by(is_active=True).all()
-        return jsonify([worker.to_dict() for worker in workers])
+        workers = apply_filters(Worker.query.filter_by(is_active=True), group_column=Worker.group_id)
+        return keyset_list(workers, serializers.workers, (Worker.id,), descending=False)
     
     @app.route('/api/workers', methods=['POST'])
+    @query_budget(5)
     def add_worker():
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -297,15 +393,64 @@ def create_app():
         
         db.session.add(worker)
         db.session.commit()
+        clock_index.add_worker(worker)
+        
+        worker_data = worker.to_dict()
+        notify('worker_changed', action='created', worker=worker_data)
+        return jsonify({'message': 'Worker added successfully', 'worker': worker_data}), 201
+    
+    @app.route('/api/workers/next-code', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('workers')
+    def get_next_worker_code():
+        return jsonify({'code': worker_import.next_worker_code()})
+    
+    # Per 500 rows, up to IMPORT_MAX_ROWS: one code lookup and one INSERT
+    @app.route('/api/workers/import', methods=['POST'])
+    @query_budget(25)
+    def import_workers():
+        if not check_admin_pin():
+            return jsonify({'error': 'Invalid admin PIN'}), 401
+        
+        # A JSON list (or {"workers": [...]}) or a CSV body with a header line
+        if request.is_json:
+            data = request.json
+            records = data.get('workers') if isinstance(data, dict) else data
+        else:
+            records = worker_import.parse_csv(request.get_data(as_text=True))
+        
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'A non-empty list of workers is required'}), 400
         
-        return jsonify({'message': 'Worker added successfully', 'worker': worker.to_dict()}), 201
+        if len(records) > app.config['IMPORT_MAX_ROWS']:
+            return jsonify({'error': f"At most {app.config['IMPORT_MAX_ROWS']} workers per import"}), 400
+        
+        dry_run = parse_bool_arg('dry_run') or False
+        results, created = worker_import.import_workers(records, app.config['IMPORT_BATCH_SIZE'], dry_run)
+        clock_index.add_workers(created)
+        if created:
+            # One summary event instead of one per worker
+            notify('workers_imported', created=len(created))
+        
+        rejected = sum(1 for result in results if result['status'] == 'rejected')
+        accepted = len(results) - rejected
+        return jsonify({
+            'message': f"{accepted} of {len(results)} workers {'valid' if dry_run else 'imported'}",
+            'dry_run': dry_run,
+            'created': len(created),
+            'rejected': rejected,
+            'results': results
+        })
     
     @app.route('/api/workers/<int:worker_id>', methods=['GET'])
+    @query_budget(2)
+    @changes.conditional('workers', 'groups')
     def get_worker(worker_id):
         worker = Worker.query.get_or_404(worker_id)
         return jsonify(worker.to_dict())
     
     @app.route('/api/workers/<int:worker_id>', methods=['PUT'])
+    @query_budget(6)
     def update_worker(worker_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -338,9 +483,14 @@ def create_app():
             worker.group_id = group_id
         
         db.session.commit()
-        return jsonify({'message': 'Worker updated successfully', 'worker': worker.to_dict()})
+        clock_index.update_worker(worker)
+        
+        worker_data = worker.to_dict()
+        notify('worker_changed', action='updated', worker=worker_data)
+        return jsonify({'message': 'Worker updated successfully', 'worker': worker_data})
     
     @app.route('/api/workers/<int:worker_id>', methods=['DELETE'])
+    @query_budget(12)
     def delete_worker(worker_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -354,23 +504,21 @@ def create_app():
             # HARD DELETE: Actually remove the worker from database
             # First, remove related data to avoid foreign key constraints
             
-            # Delete work sessions
+            # Delete work sessions and their cycle totals
+            cycle_hours.forget_worker(worker_id)
             WorkSession.query.filter_by(worker_id=worker_id).delete()
             
             # Delete advances
             Advance.query.filter_by(worker_id=worker_id).delete()
             
             # Delete loans and their payments
-            loans = Loan.query.filter_by(worker_id=worker_id).all()
-            for loan in loans:
-                LoanPayment.query.filter_by(loan_id=loan.id).delete()
+            worker_loans = select(Loan.id).where(Loan.worker_id == worker_id)
+            LoanPayment.query.filter(LoanPayment.loan_id.in_(worker_loans)).delete(synchronize_session=False)
             Loan.query.filter_by(worker_id=worker_id).delete()
             
-            # Remove worker from group leadership if they are a team leader
-            if worker.is_team_leader:
-                groups = Group.query.filter_by(team_leader_id=worker_id).all()
-                for group in groups:
-                    group.team_leader_id = None
+            # Remove worker from group leadership; not only when is_team_leader is
+            # set, as a deactivated group keeps its leader id after clearing the flag
+            Group.query.filter_by(team_leader_id=worker_id).update({'team_leader_id': None})
             
             # Remove worker from any group
             if worker.group_id:
@@ -379,6 +527,8 @@ def create_app():
             # Finally, delete the worker
             db.session.delete(worker)
             db.session.commit()
+            clock_index.remove_worker(original_code, worker_id)
+            notify('worker_changed', action='deleted', worker={'id': worker_id, 'code': original_code})
             
             return jsonify({
                 'message': f'Worker {original_code} permanently deleted',
@@ -392,80 +542,141 @@ def create_app():
     # CLOCK IN/OUT SYSTEM
     
     @app.route('/api/clock-in', methods=['POST'])
+    @query_budget(1)
     def clock_in():
         data = request.json
         worker_code = data.get('worker_code')
         
-        worker = Worker.query.filter_by(code=worker_code, is_active=True).first()
+        worker = clock_index.worker_by_code(worker_code)
         if not worker:
             return jsonify({'error': 'Worker not found'}), 404
         
-        # Check if already clocked in today
-        if is_worker_clocked_in(worker.id):
-            return jsonify({'error': 'Worker already clocked in today'}), 400
-        
-        session = WorkSession(
-            worker_id=worker.id,
-            clock_in=datetime.now(),
-            date=date.today()
-        )
-        
-        db.session.add(session)
-        db.session.commit()
+        if not clock_index.claim(worker['id']):
+            return jsonify({'error': 'Another clock event for this worker is in progress'}), 409
         
+        try:
+            session = {'clock_in': datetime.now(), 'date': date.today()}
+            # A unique index allows one open session per worker and day, so the
+            # insert itself says whether the worker already clocked in
+            row = sqlite_insert(WorkSession).values(worker_id=worker['id'], **session).on_conflict_do_nothing(
+                index_elements=[WorkSession.worker_id, WorkSession.date],
+                index_where=WorkSession.clock_out.is_(None)
+            ).returning(WorkSession.id)
+            # Answers once the group commit holding the row is on disk
+            session['id'] = clock_writer.submit(lambda: db.session.execute(row).scalar())
+            if session['id'] is None:
+                return jsonify({'error': 'Worker already clocked in today'}), 400
+            clock_index.set_open_session(worker['id'], session)
+        finally:
+            clock_index.release(worker['id'])
+        
+        payload = session_payload(session, worker['id'], worker['name'])
+        notify('clock_in', session=payload)
         return jsonify({
-            'message': f'{worker.name} clocked in successfully',
-            'session': session.to_dict()
+            'message': f"{worker['name']} clocked in successfully",
+            'session': payload
         })
     
     @app.route('/api/clock-out', methods=['POST'])
+    @query_budget(2)
     def clock_out():
         data = request.json
         worker_code = data.get('worker_code')
         
-        worker = Worker.query.filter_by(code=worker_code, is_active=True).first()
+        worker = clock_index.worker_by_code(worker_code)
         if not worker:
             return jsonify({'error': 'Worker not found'}), 404
         
-        # Find today's open session
-        today = date.today()
-        session = WorkSession.query.filter_by(
-            worker_id=worker.id,
-            date=today,
-            clock_out=None
-        ).first()
+        if not clock_index.claim(worker['id']):
+            return jsonify({'error': 'Another clock event for this worker is in progress'}), 409
         
-        if not session:
-            return jsonify({'error': 'No active clock-in session found'}), 400
+        try:
+            # Find today's open session
+            session = clock_index.open_session(worker['id'])
+            if not session:
+                return jsonify({'error': 'No active clock-in session found'}), 400
+            
+            clock_out_time = datetime.now()
+            hours_worked = calculate_hours(session['clock_in'], clock_out_time)
+            
+            def close_session():
+                db.session.execute(
+                    update(WorkSession).where(WorkSession.id == session['id']).values(
+                        clock_out=clock_out_time,
+                        hours_worked=hours_worked
+                    )
+                )
+                cycle_hours.record_closed_sessions([(worker['id'], worker['hire_date'], session['date'], hours_worked)])
+            
+            clock_writer.submit(close_session)
+            clock_index.set_open_session(worker['id'], None)
+        finally:
+            clock_index.release(worker['id'])
         
-        session.clock_out = datetime.now()
-        session.hours_worked = calculate_hours(session.clock_in, session.clock_out)
+        payload = session_payload(session, worker['id'], worker['name'], clock_out_time, hours_worked)
+        notify('clock_out', session=payload)
+        return jsonify({
+            'message': f"{worker['name']} clocked out successfully",
+            'session': payload
+        })
+    
+    @app.route('/api/clock-events', methods=['POST'])
+    @query_budget(4)
+    def clock_events_batch():
+        data = request.json
+        events = data.get('events') if isinstance(data, dict) else data
         
-        db.session.commit()
+        if not isinstance(events, list) or not events:
+            return jsonify({'error': 'A non-empty list of events is required'}), 400
+        
+        if len(events) > app.config['CLOCK_BATCH_MAX_EVENTS']:
+            return jsonify({'error': f"At most {app.config['CLOCK_BATCH_MAX_EVENTS']} events per batch"}), 400
+        
+        results = apply_clock_events(events, clock_index)
+        applied = sum(1 for result in results if result['status'] == 'applied')
+        if applied:
+            # One summary event; a terminal backlog can be thousands of events
+            notify('clock_batch', applied=applied)
         
         return jsonify({
-            'message': f'{worker.name} clocked out successfully',
-            'session': session.to_dict()
+            'message': f'{applied} of {len(results)} clock events applied',
+            'applied': applied,
+            'rejected': len(results) - applied,
+            'results': results
         })
     
     @app.route('/api/sessions', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('work_sessions', 'workers')
+    @read_pool.read_only
     def get_sessions():
-        sessions = WorkSession.query.order_by(WorkSession.date.desc()).limit(50).all()
-        return jsonify([session.to_dict() for session in sessions])
+        sessions = apply_filters(WorkSession.query, worker_column=WorkSession.worker_id, date_column=WorkSession.date)
+        return keyset_list(sessions, serializers.sessions, (WorkSession.date, WorkSession.id), default_limit=50)
     
     @app.route('/api/sessions/<int:worker_id>', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('work_sessions', 'workers')
     def get_worker_sessions(worker_id):
-        sessions = WorkSession.query.filter_by(worker_id=worker_id).order_by(WorkSession.date.desc()).all()
-        return jsonify([session.to_dict() for session in sessions])
+        sessions = apply_filters(WorkSession.query.filter_by(worker_id=worker_id), date_column=WorkSession.date)
+        return keyset_list(sessions, serializers.sessions, (WorkSession.date, WorkSession.id))
     
     # ADVANCE PAYMENTS
     
     @app.route('/api/advances', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('advances', 'workers')
+    @read_pool.read_only
     def get_advances():
-        advances = Advance.query.order_by(Advance.date_given.desc()).all()
-        return jsonify([advance.to_dict() for advance in advances])
+        advances = apply_filters(
+            Advance.query,
+            worker_column=Advance.worker_id,
+            date_column=Advance.date_given,
+            paid_column=Advance.is_paid_back
+        )
+        return keyset_list(advances, serializers.advances, (Advance.date_given, Advance.id))
     
     @app.route('/api/advances', methods=['POST'])
+    @query_budget(4)
     def give_advance():
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -496,12 +707,15 @@ def create_app():
         db.session.add(advance)
         db.session.commit()
         
+        advance_data = advance.to_dict()
+        notify('advance_given', advance=advance_data)
         return jsonify({
             'message': f'Advance of {advance.amount} DA given to {worker.name}',
-            'advance': advance.to_dict()
+            'advance': advance_data
         }), 201
     
     @app.route('/api/advances/<int:advance_id>/payback', methods=['PUT'])
+    @query_budget(4)
     def mark_advance_paid(advance_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -511,19 +725,30 @@ def create_app():
         
         db.session.commit()
         
+        advance_data = advance.to_dict()
+        notify('advance_paid_back', advance=advance_data)
         return jsonify({
             'message': 'Advance marked as paid back',
-            'advance': advance.to_dict()
+            'advance': advance_data
         })
     
     # LOAN MANAGEMENT (DOUYOUN)
     
     @app.route('/api/loans', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('loans', 'loan_payments', 'workers')
+    @read_pool.read_only
     def get_loans():
-        loans = Loan.query.order_by(Loan.date_given.desc()).all()
-        return jsonify([loan.to_dict() for loan in loans])
+        loans = apply_filters(
+            Loan.query,
+            worker_column=Loan.worker_id,
+            date_column=Loan.date_given,
+            paid_column=Loan.is_fully_paid
+        )
+        return keyset_list(loans, serializers.loans, (Loan.date_given, Loan.id))
     
     @app.route('/api/loans', methods=['POST'])
+    @query_budget(5)
     def create_loan():
         try:
             if not check_admin_pin():
@@ -555,9 +780,11 @@ def create_app():
             db.session.add(loan)
             db.session.commit()
             
+            loan_data = loan.to_dict()
+            notify('loan_given', loan=loan_data)
             return jsonify({
                 'message': f'Loan of {loan.total_amount} DA given to {worker.name}',
-                'loan': loan.to_dict()
+                'loan': loan_data
             }), 201
             
         except Exception as e:
@@ -566,11 +793,15 @@ def create_app():
             return jsonify({'error': f'Internal server error: {str(e)}'}), 500
     
     @app.route('/api/loans/<int:worker_id>/worker', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('loans', 'loan_payments', 'workers')
     def get_worker_loans(worker_id):
-        loans = Loan.query.filter_by(worker_id=worker_id).order_by(Loan.date_given.desc()).all()
-        return jsonify([loan.to_dict() for loan in loans])
+        loans = Loan.query.filter_by(worker_id=worker_id).order_by(Loan.date_given.desc())
+        return jsonify(serializers.loans.dump(loans))
     
     @app.route('/api/loans/<int:loan_id>/payments', methods=['GET'])
+    @query_budget(4)
+    @changes.conditional('loans', 'loan_payments', 'workers')
     def get_loan_payments(loan_id):
         loan = Loan.query.get_or_404(loan_id)
         payments = LoanPayment.query.filter_by(loan_id=loan_id).order_by(LoanPayment.payment_date.desc()).all()
@@ -580,6 +811,7 @@ def create_app():
         })
     
     @app.route('/api/loans/<int:loan_id>/payment', methods=['POST'])
+    @query_budget(7)
     def add_loan_payment(loan_id):
         if not check_admin_pin():
             return jsonify({'error': 'Invalid admin PIN'}), 401
@@ -614,121 +846,227 @@ def create_app():
         db.session.add(payment)
         db.session.commit()
         
+        payment_data = payment.to_dict()
+        loan_data = loan.to_dict()
+        notify('loan_payment', payment=payment_data, loan=loan_data)
         return jsonify({
             'message': f'Payment of {payment_amount} DA recorded successfully',
-            'payment': payment.to_dict(),
-            'updated_loan': loan.to_dict()
+            'payment': payment_data,
+            'updated_loan': loan_data
         }), 201
     
     # PAYMENT CALCULATIONS
     
     @app.route('/api/payments/summary', methods=['GET'])
+    @query_budget(3)
+    @changes.conditional('workers', 'groups', 'worker_cycle_hours', 'advances')
+    @cache.cached('workers', 'groups', 'worker_cycle_hours', 'advances')
+    @read_pool.read_only
     def payment_summary():
-        workers = Worker.query.filter_by(is_active=True).all()
-        summary = []
-        total_earned_payroll = 0
-        total_advances_given = 0
-        total_final_payments = 0
-        
-        for worker in workers:
-            # Get current monthly cycle based on hire date
-            cycle_start, cycle_end = get_current_cycle_dates(worker.hire_date)
-            
-            # Calculate total hours worked in current cycle
-            sessions = WorkSession.query.filter(
-                WorkSession.worker_id == worker.id,
-                WorkSession.date >= cycle_start,
-                WorkSession.date <= cycle_end,
-                WorkSession.hours_worked.isnot(None)
-            ).all()
-            
-            total_hours = sum(session.hours_worked for session in sessions)
-            
-            # Calculate unpaid advances
-            unpaid_advances = Advance.query.filter_by(
-                worker_id=worker.id,
-                is_paid_back=False
-            ).all()
-            
-            total_advances = sum(advance.amount for advance in unpaid_advances)
-            
-            # Fixed monthly salary calculation (attendance tracked but not affecting pay)
-            required_hours = 160  # Still tracked for attendance monitoring
-            earned_salary = worker.salary  # Always full salary regardless of hours
-            completion_percentage = round((total_hours / required_hours) * 100, 1) if required_hours > 0 else 100
-            
-            # Note: Hours are tracked for attendance purposes but don't affect salary calculation
-            
-            # Calculate final payment
-            final_payment = max(0, earned_salary - total_advances)
-            remaining_debt = max(0, total_advances - earned_salary)
-            
-            # Determine payment status (based on advances only, not hours)
-            if total_advances == 0:
-                payment_status = "full_salary_no_advances"
-            elif total_advances <= earned_salary:
-                payment_status = "full_salary_with_advances"
-            else:
-                payment_status = "full_salary_excess_advances"
-            
-            worker_summary = {
-                'worker': worker.to_dict(),
-                'cycle_info': {
-                    'cycle_start': cycle_start.isoformat(),
-                    'cycle_end': cycle_end.isoformat(),
-                    'days_remaining': (cycle_end - date.today()).days
-                },
-                'work_progress': {
-                    'hours_worked': round(total_hours, 2),
-                    'required_hours': required_hours,
-                    'hours_remaining': max(0, required_hours - total_hours),
-                    'completion_percentage': completion_percentage
-                },
-                'salary_calculation': {
-                    'monthly_salary': worker.salary,
-                    'earned_salary': round(earned_salary, 2),
-                    'advances_taken': round(total_advances, 2),
-                    'final_payment': round(final_payment, 2),
-                    'remaining_debt': round(remaining_debt, 2)
-                },
-                'payment_status': payment_status,
-                'unpaid_advances_count': len(unpaid_advances)
-            }
-            
-            summary.append(worker_summary)
-            total_earned_payroll += earned_salary
-            total_advances_given += total_advances
-            total_final_payments += final_payment
+        return jsonify(compute_payment_summary())
+    
+    # CLOSED PAYROLL RUNS (immutable snapshots)
+    
+    @app.route('/api/payments/runs', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('payroll_runs')
+    @read_pool.read_only
+    def get_payroll_runs():
+        runs = apply_filters(PayrollRun.query, date_column=PayrollRun.as_of)
+        return keyset_list(runs, serializers.payroll_runs, (PayrollRun.as_of, PayrollRun.id))
+    
+    @app.route('/api/payments/runs', methods=['POST'])
+    @query_budget(7)
+    def close_payroll():
+        if not check_admin_pin():
+            return jsonify({'error': 'Invalid admin PIN'}), 401
+        
+        data = request.get_json(silent=True) or {}
+        
+        as_of = None
+        if data.get('as_of'):
+            try:
+                as_of = datetime.strptime(data['as_of'], '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'error': 'Invalid as_of format. Use YYYY-MM-DD'}), 400
         
+        try:
+            run, closed_count, skipped_count = close_payroll_run(as_of, data.get('notes'))
+        except PayrollRunError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        run_data = run.to_dict()
+        notify('payroll_closed', run=run_data)
+        return jsonify({
+            'message': f'Payroll run closed for {closed_count} workers',
+            'run': run_data,
+            'already_closed': skipped_count
+        }), 201
+    
+    @app.route('/api/payments/runs/<int:run_id>', methods=['GET'])
+    @query_budget(2)
+    @changes.conditional('payroll_runs', 'payroll_run_entries')
+    @read_pool.read_only
+    def get_payroll_run(run_id):
+        run = PayrollRun.query.get_or_404(run_id)
+        entries = PayrollRunEntry.query.filter_by(run_id=run_id).order_by(PayrollRunEntry.worker_id)
         return jsonify({
-            'workers': summary,
-            'totals': {
-                'total_earned_payroll': round(total_earned_payroll, 2),
-                'total_advances_given': round(total_advances_given, 2),
-                'total_final_payments': round(total_final_payments, 2),
-                'total_workers': len(summary)
-            },
-            'system_info': {
-                'required_hours_per_month': 160,
-                'payment_formula': 'Fixed monthly salary (hours tracked for attendance only)',
-                'cycle_calculation': 'Based on individual hire dates (e.g., 15th to 15th)',
-                'advance_policy': 'Advances deducted from monthly salary',
-                'attendance_tracking': 'Clock in/out maintained for monitoring purposes'
-            }
+            'run': run.to_dict(),
+            'entries': [entry.to_dict() for entry in entries]
         })
     
+    @app.route('/api/payments/history/<int:worker_id>', methods=['GET'])
+    @query_budget(1)
+    @changes.conditional('payroll_run_entries')
+    @read_pool.read_only
+    def get_worker_payroll_history(worker_id):
+        entries = apply_filters(
+            PayrollRunEntry.query.filter_by(worker_id=worker_id),
+            date_column=PayrollRunEntry.cycle_start
+        )
+        return keyset_list(entries, serializers.payroll_entries, (PayrollRunEntry.cycle_start, PayrollRunEntry.id))
+    
+    # EXPORTS (streamed CSV / XLSX, ?format=csv|xlsx)
+    
+    @app.route('/api/exports/sessions', methods=['GET'])
+    @query_budget(1)
+    @read_pool.read_only
+    def export_sessions():
+        fmt = exports.parse_format()
+        columns, rows = exports.session_rows()
+        return exports.export_response(f'sessions_{date.today().isoformat()}', columns, rows, fmt)
+    
+    @app.route('/api/exports/advances', methods=['GET'])
+    @query_budget(1)
+    @read_pool.read_only
+    def export_advances():
+        fmt = exports.parse_format()
+        columns, rows = exports.advance_rows()
+        return exports.export_response(f'advances_{date.today().isoformat()}', columns, rows, fmt)
+    
+    @app.route('/api/exports/loans', methods=['GET'])
+    @query_budget(1)
+    @read_pool.read_only
+    def export_loans():
+        fmt = exports.parse_format()
+        columns, rows = exports.loan_rows()
+        return exports.export_response(f'loans_{date.today().isoformat()}', columns, rows, fmt)
+    
+    @app.route('/api/exports/payroll', methods=['GET'])
+    @query_budget(3)
+    @read_pool.read_only
+    def export_payroll():
+        fmt = exports.parse_format()
+        as_of = parse_date_arg('as_of') or date.today()
+        columns, rows = exports.payroll_rows(compute_payment_summary(as_of)['workers'])
+        return exports.export_response(f'payroll_{as_of.isoformat()}', columns, rows, fmt)
+    
+    @app.route('/api/exports/payroll/<int:run_id>', methods=['GET'])
+    @query_budget(2)
+    @read_pool.read_only
+    def export_payroll_run(run_id):
+        fmt = exports.parse_format()
+        run = PayrollRun.query.get_or_404(run_id)
+        columns, rows = exports.payroll_run_rows(run.id)
+        return exports.export_response(f'payroll_run_{run.id}_{run.as_of.isoformat()}', columns, rows, fmt)
+    
+    # BACKGROUND JOBS (heavy exports on worker processes; poll, then download)
+    
+    @app.route('/api/jobs', methods=['POST'])
+    @query_budget(5)
+    def submit_job():
+        data = request.get_json(silent=True) or {}
+        try:
+            job = job_runner.submit(data.get('kind'), data.get('params') or {})
+        except jobs.JobError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'message': 'Job queued', 'job': job.to_dict()}), 202
+    
+    @app.route('/api/jobs', methods=['GET'])
+    @query_budget(1)
+    def get_jobs():
+        # ?status=queued|running|done|failed|cancelled
+        job_list = Job.query
+        if request.args.get('status'):
+            job_list = job_list.filter(Job.status == request.args['status'])
+        return keyset_list(job_list, serializers.jobs, (Job.created_at, Job.id), default_limit=50)
+    
+    @app.route('/api/jobs/<int:job_id>', methods=['GET'])
+    @query_budget(1)
+    def get_job(job_id):
+        return jsonify(Job.query.get_or_404(job_id).to_dict())
+    
+    @app.route('/api/jobs/<int:job_id>/result', methods=['GET'])
+    @query_budget(1)
+    def get_job_result(job_id):
+        job = Job.query.get_or_404(job_id)
+        if job.status != 'done':
+            return jsonify({'error': f'Job is {job.status}'}), 409
+        path = jobs.result_path(job_runner.directory, job)
+        if not os.path.exists(path):
+            return jsonify({'error': 'Job result is no longer available'}), 410
+        response = send_file(path, mimetype=exports.mimetype_of(path.rsplit('.', 1)[-1]),
+                             as_attachment=True, download_name=job.result_name)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    
+    @app.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+    @query_budget(2)
+    def cancel_job(job_id):
+        if not jobs.cancel(job_id):
+            job = Job.query.get_or_404(job_id)
+            return jsonify({'error': f'Job is already {job.status}'}), 409
+        return jsonify({'message': 'Job cancelled'})
+    
+    # FRONTEND
+    
+    @app.route('/', methods=['GET'])
+    @query_budget(0)
+    def frontend_home():
+        return redirect('/' + HOME_PAGE)
+    
+    @app.route('/<path:filename>', methods=['GET'])
+    @query_budget(0)
+    def frontend_file(filename):
+        if app.debug:
+            assets.reload_if_changed()
+        return assets.response(filename)
+    
     return app
 
 if __name__ == '__main__':
+    # --dev: Flask's debug reloader; otherwise the threaded production server
+    dev = '--dev' in sys.argv
     app = create_app()
     
-    # Create tables if they don't exist
+    # Create tables if they don't exist and apply pending migrations
     with app.app_context():
-        db.create_all()
+        migrations.upgrade()
+        app.extensions['clock_index'].warm()
+        app.extensions['job_runner'].recover()
+    
+    # With the debug reloader only the child process serves requests
+    if not dev or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        app.extensions['event_hub'].start(Config.HOST, Config.EVENTS_PORT)
+        app.extensions['storage_maintenance'].start()
     
     print("Factory Management API starting...")
     print(f"Database: {Config.SQLALCHEMY_DATABASE_URI}")
     print(f"Admin PIN: {Config.ADMIN_PIN}")
     print(f"Server: http://{Config.HOST}:{Config.PORT}")
+    print(f"Event stream: http://{Config.HOST}:{Config.EVENTS_PORT}{EVENTS_PATH}")
     
-    app.run(host=Config.HOST, port=Config.PORT, debug=Config.DEBUG)
+    if dev:
+        app.run(host=Config.HOST, port=Config.PORT, debug=True)
+    else:
+        # --watch-stdin: stop when the parent (the Electron shell) closes our stdin
+        serving.serve(app, Config.HOST, Config.PORT, watch_stdin='--watch-stdin' in sys.argv)
+        app.extensions['event_hub'].stop()
+        app.extensions['storage_maintenance'].stop()
+        app.extensions['clock_writer'].stop()
+        app.extensions['job_runner'].stop()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        app.extensions['read_pool'].dispose()
+        print("👋 Factory Management API stopped")
@@ -0,0 +1,526 @@
+"""
+Benchmark suite for every API route
+Drives each route of app.py through the Flask test client against a copy of
+a synthetic database (see synthetic_data.py) and reports p50/p95 latency,
+SQL statements per request and peak Python memory per request. The result
+cache is cleared before every request, so reads are measured cold.
+
+Results are compared with bench_baseline.json: a route regresses when it runs
+more statements than the baseline or its p50 grows beyond the tolerance.
+Latency baselines only mean something on the machine that recorded them;
+statement counts hold anywhere.
+
+Usage: python bench_endpoints.py [--db PATH] [--runs 20] [--tolerance 0.5]
+                                 [--save-baseline] [--baseline FILE] [--sqlite-defaults]
+       python bench_endpoints.py --check-budgets
+Without --db a dataset of DEFAULT_SCALE is generated into a temp file.
+--sqlite-defaults runs without the storage profile (rollback journal, full
+sync), to compare against a baseline recorded the same way.
+--check-budgets runs every route on BUDGET_SCALES datasets instead and fails
+when a route has no @query_budget or any request goes over it.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func
+
+from app import create_app
+from config import Config
+import migrations
+from query_budget import budget_of
+from models import db, Group, Worker, WorkSession, Advance, Loan, PayrollRun
+
+DEFAULT_SCALE = {'workers': 1000, 'groups': 40, 'years': 1, 'payroll_runs': 3, 'seed': 0}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+# Absolute slack on top of the relative tolerance, for sub-millisecond routes
+LATENCY_SLACK_MS = 0.5
+CLOCK_BATCH_EVENTS = 20
+# Badge swipes arriving at once in the burst case, one thread each; at most
+# CLOCK_BATCH_EVENTS, as it reuses the workers of a clock events batch
+BURST_SIZE = 16
+IMPORT_ROWS = 50
+# --check-budgets: the same requests must fit their budgets at every size
+BUDGET_SCALES = (
+    {'workers': 150, 'groups': 5, 'years': 1, 'payroll_runs': 1, 'seed': 1},
+    DEFAULT_SCALE,
+    {'workers': 3000, 'groups': 100, 'years': 2, 'payroll_runs': 6, 'seed': 2}
+)
+BUDGET_RUNS = 3
+PIN = {'X-Admin-Pin': Config.ADMIN_PIN}
+BACKGROUND_THREAD = 'bench-background'
+
+
+class Case:
+    """One benchmarked request. `make(i)` returns (path, json body) for run i;
+    `after(i, response)`, if given, sees each response. With `background`,
+    another thread keeps GETting that path while the case runs. With
+    `concurrent`, each run sends that many requests at once (make(i) for
+    i = run * concurrent ... ) and is timed as a whole."""
+
+    def __init__(self, name, rule, method, make, statuses=(200,), runs=None, after=None, background=None, concurrent=1):
+        self.name = name
+        self.rule = rule
+        self.method = method
+        self.make = make
+        self.statuses = statuses
+        self.runs = runs
+        self.after = after
+        self.background = background
+        self.concurrent = concurrent
+
+
+class Pool:
+    """Rows handed out once each, for writes that consume what they touch."""
+
+    def __init__(self, name, items):
+        self.name = name
+        self._items = list(items)
+
+    def take(self, count=1):
+        if len(self._items) < count:
+            raise SystemExit(f"❌ Dataset too small: out of {self.name}; use a larger --db or fewer --runs")
+        taken, self._items = self._items[:count], self._items[count:]
+        return taken
+
+
+def finished_job(client, body, timeout=120):
+    """Submit the job `body` describes and wait for it to finish; its id."""
+    job = client.post('/api/jobs', json=body).get_json()['job']
+    deadline = time.monotonic() + timeout
+    while job['status'] in ('queued', 'running'):
+        if time.monotonic() > deadline:
+            raise SystemExit(f"❌ Job {job['id']} still {job['status']} after {timeout}s")
+        time.sleep(0.1)
+        job = client.get(f"/api/jobs/{job['id']}").get_json()
+    if job['status'] != 'done':
+        raise SystemExit(f"❌ Job {job['id']} {job['status']}: {job['error']}")
+    return job['id']
+
+
+def build_cases(runs):
+    """Cases for every route, with the ids they need read from the dataset."""
+    today = date.today()
+    n = runs + 1  # timed runs plus the traced one
+
+    worker_id, worker_code = db.session.query(Worker.id, Worker.code).filter(Worker.is_active == True).order_by(Worker.id).first()
+    group_id = db.session.query(Worker.group_id).filter(Worker.group_id.isnot(None)).group_by(Worker.group_id).order_by(
+        func.count(Worker.id).desc()
+    ).limit(1).scalar()
+    loan_id = db.session.query(Loan.id).order_by(Loan.id.desc()).limit(1).scalar()
+    run_id = db.session.query(PayrollRun.id).order_by(PayrollRun.id.desc()).limit(1).scalar()
+    script = current_app.extensions['static_assets'].hashed['assets/js/app.js']
+
+    # Active, grouped, not leading a group and not clocked in today
+    open_today = db.session.query(WorkSession.worker_id).filter(WorkSession.date == today, WorkSession.clock_out.is_(None))
+    leaders = db.session.query(Group.team_leader_id).filter(Group.team_leader_id.isnot(None))
+    free = db.session.query(Worker.id, Worker.code, Worker.group_id).filter(
+        Worker.is_active == True,
+        Worker.group_id.isnot(None),
+        Worker.id.notin_(open_today),
+        Worker.id.notin_(leaders)
+    ).order_by(Worker.id.desc()).all()
+    workers = Pool('free workers', free)
+
+    clocking = workers.take(n)
+    clocking_again = workers.take(n)
+    clocking_payroll = workers.take(n)
+    regrouping = workers.take(n)
+    deleting = workers.take(n)
+    batches = [workers.take(CLOCK_BATCH_EVENTS) for _ in range(n)]
+    # Clocked in and out by the first clock events batch, then free again
+    bursting = batches[0][:BURST_SIZE]
+    unpaid = Pool('unpaid advances', db.session.query(Advance.id).filter(Advance.is_paid_back == False).order_by(Advance.id).all()).take(n)
+    owing = Pool('loans with a balance', db.session.query(Loan.id).filter(Loan.remaining_balance >= n).order_by(Loan.id).all()).take(1)[0][0]
+
+    stamp = datetime.now().strftime('%H%M%S%f')
+    month_ago = (today - timedelta(days=30)).isoformat()
+    created_groups = {}
+
+    def clock_events(i):
+        now = datetime.now()
+        events = []
+        for _, code, _ in batches[i]:
+            events.append({'worker_code': code, 'type': 'clock_in', 'timestamp': (now - timedelta(hours=8)).isoformat(timespec='seconds')})
+            events.append({'worker_code': code, 'type': 'clock_out', 'timestamp': now.isoformat(timespec='seconds')})
+        return '/api/clock-events', {'events': events}
+
+    def clock_burst(i):
+        # The same workers clock in on even runs and out on odd ones
+        action = 'clock-out' if i // BURST_SIZE % 2 else 'clock-in'
+        return f'/api/{action}', {'worker_code': bursting[i % BURST_SIZE][1]}
+
+    def import_rows(i):
+        return '/api/workers/import', {'workers': [{
+            'name': f'Bench {stamp} {i}-{row}', 'position': 'Operator', 'salary': 30000,
+            'hire_date': today.isoformat(), 'group_id': group_id
+        } for row in range(IMPORT_ROWS)]}
+
+    get = lambda path: (lambda i: (path, None))
+
+    # A finished job for the status, result and cancel cases
+    job_id = finished_job(current_app.test_client(), {'kind': 'export_sessions', 'params': {'date_from': month_ago}})
+    # Jobs the submit case queues: today's sessions only, so they finish fast
+    small_job = {'kind': 'export_sessions', 'params': {'date_from': today.isoformat()}}
+
+    return [
+        Case('test', '/api/test', 'GET', get('/api/test')),
+        Case('cache stats', '/api/cache/stats', 'GET', get('/api/cache/stats')),
+        Case('metrics', '/api/metrics', 'GET', get('/api/metrics')),
+        Case('events (hub stopped)', '/api/events', 'GET', get('/api/events'), statuses=(503,)),
+        Case('dashboard', '/api/dashboard', 'GET', get('/api/dashboard')),
+        Case('groups', '/api/groups', 'GET', get('/api/groups')),
+        Case('group workers', '/api/groups/<int:group_id>/workers', 'GET', get(f'/api/groups/{group_id}/workers')),
+        Case('workers', '/api/workers', 'GET', get('/api/workers')),
+        Case('workers page', '/api/workers', 'GET', get('/api/workers?limit=100')),
+        Case('worker', '/api/workers/<int:worker_id>', 'GET', get(f'/api/workers/{worker_id}')),
+        Case('next worker code', '/api/workers/next-code', 'GET', get('/api/workers/next-code')),
+        Case('sessions', '/api/sessions', 'GET', get('/api/sessions')),
+        Case('sessions by group, 30 days', '/api/sessions', 'GET', get(f'/api/sessions?group_id={group_id}&date_from={month_ago}&limit=1000')),
+        Case('worker sessions', '/api/sessions/<int:worker_id>', 'GET', get(f'/api/sessions/{worker_id}')),
+        Case('advances', '/api/advances', 'GET', get('/api/advances')),
+        Case('loans', '/api/loans', 'GET', get('/api/loans')),
+        Case('worker loans', '/api/loans/<int:worker_id>/worker', 'GET', get(f'/api/loans/{worker_id}/worker')),
+        Case('loan payments', '/api/loans/<int:loan_id>/payments', 'GET', get(f'/api/loans/{loan_id}/payments')),
+        Case('payment summary', '/api/payments/summary', 'GET', get('/api/payments/summary')),
+        Case('payroll runs', '/api/payments/runs', 'GET', get('/api/payments/runs')),
+        Case('payroll run', '/api/payments/runs/<int:run_id>', 'GET', get(f'/api/payments/runs/{run_id}')),
+        Case('payroll history', '/api/payments/history/<int:worker_id>', 'GET', get(f'/api/payments/history/{worker_id}')),
+        Case('export sessions, 30 days', '/api/exports/sessions', 'GET', get(f'/api/exports/sessions?date_from={month_ago}')),
+        Case('export sessions xlsx, 30 days', '/api/exports/sessions', 'GET', get(f'/api/exports/sessions?date_from={month_ago}&format=xlsx')),
+        Case('export advances', '/api/exports/advances', 'GET', get('/api/exports/advances')),
+        Case('export loans', '/api/exports/loans', 'GET', get('/api/exports/loans')),
+        Case('export payroll', '/api/exports/payroll', 'GET', get('/api/exports/payroll')),
+        Case('export payroll run', '/api/exports/payroll/<int:run_id>', 'GET', get(f'/api/exports/payroll/{run_id}')),
+        Case('jobs', '/api/jobs', 'GET', get('/api/jobs')),
+        Case('job', '/api/jobs/<int:job_id>', 'GET', get(f'/api/jobs/{job_id}')),
+        Case('job result', '/api/jobs/<int:job_id>/result', 'GET', get(f'/api/jobs/{job_id}/result')),
+        Case('cancel finished job', '/api/jobs/<int:job_id>/cancel', 'POST',
+             lambda i: (f'/api/jobs/{job_id}/cancel', None), statuses=(409,)),
+        Case('frontend page', '/<path:filename>', 'GET', get('/khadama.html')),
+        Case('frontend asset', '/<path:filename>', 'GET', get(f'/{script}')),
+
+        Case('clock in', '/api/clock-in', 'POST', lambda i: ('/api/clock-in', {'worker_code': clocking[i][1]})),
+        Case('clock out', '/api/clock-out', 'POST', lambda i: ('/api/clock-out', {'worker_code': clocking[i][1]})),
+        # A payroll export streaming on another thread: its read must not hold up the write
+        Case('clock in during export', '/api/clock-in', 'POST',
+             lambda i: ('/api/clock-in', {'worker_code': clocking_again[i][1]}),
+             background=f'/api/exports/sessions?date_from={month_ago}'),
+        Case('clock in during payroll export', '/api/clock-in', 'POST',
+             lambda i: ('/api/clock-in', {'worker_code': clocking_payroll[i][1]}), background='/api/exports/payroll'),
+        Case(f'clock events x{2 * CLOCK_BATCH_EVENTS}', '/api/clock-events', 'POST', clock_events),
+        # Shift change: the swipes share group commits
+        Case(f'clock burst x{BURST_SIZE}', '/api/clock-in', 'POST', clock_burst, concurrent=BURST_SIZE),
+        Case('create group', '/api/groups', 'POST', lambda i: ('/api/groups', {'name': f'Bench {stamp} {i}'}), statuses=(201,),
+             after=lambda i, response: created_groups.__setitem__(i, response.json['group']['id'])),
+        Case('update group', '/api/groups/<int:group_id>', 'PUT',
+             lambda i: (f'/api/groups/{group_id}', {'name': f'Bench {stamp} renamed {i}'})),
+        Case('remove worker from group', '/api/groups/<int:group_id>/remove_worker', 'POST',
+             lambda i: (f'/api/groups/{regrouping[i][2]}/remove_worker', {'worker_id': regrouping[i][0]})),
+        Case('add worker to group', '/api/groups/<int:group_id>/add_worker', 'POST',
+             lambda i: (f'/api/groups/{regrouping[i][2]}/add_worker', {'worker_id': regrouping[i][0]})),
+        Case('delete group', '/api/groups/<int:group_id>', 'DELETE',
+             lambda i: (f'/api/groups/{created_groups[i]}', None)),
+        Case('create worker', '/api/workers', 'POST', lambda i: ('/api/workers', {
+            'code': f'B{stamp}{i}', 'name': 'Bench Worker', 'position': 'Operator',
+            'salary': 30000, 'hire_date': today.isoformat()
+        }), statuses=(201,)),
+        Case('update worker', '/api/workers/<int:worker_id>', 'PUT',
+             lambda i: (f'/api/workers/{worker_id}', {'phone': f'0555{i:06d}'})),
+        Case('delete worker with history', '/api/workers/<int:worker_id>', 'DELETE',
+             lambda i: (f'/api/workers/{deleting[i][0]}', None)),
+        Case(f'import {IMPORT_ROWS} workers', '/api/workers/import', 'POST', import_rows),
+        Case('give advance', '/api/advances', 'POST',
+             lambda i: ('/api/advances', {'worker_id': worker_id, 'amount': 1000}), statuses=(201,)),
+        Case('advance payback', '/api/advances/<int:advance_id>/payback', 'PUT',
+             lambda i: (f'/api/advances/{unpaid[i][0]}/payback', None)),
+        Case('create loan', '/api/loans', 'POST',
+             lambda i: ('/api/loans', {'worker_id': worker_id, 'amount': 10000}), statuses=(201,)),
+        Case('loan payment', '/api/loans/<int:loan_id>/payment', 'POST',
+             lambda i: (f'/api/loans/{owing}/payment', {'payment_amount': 1}), statuses=(201,)),
+        Case('submit job', '/api/jobs', 'POST', lambda i: ('/api/jobs', small_job), statuses=(202,)),
+        # A cycle closes once; later runs measure the already-closed check
+        Case('close payroll run', '/api/payments/runs', 'POST',
+             lambda i: ('/api/payments/runs', {}), statuses=(201, 400), runs=1)
+    ]
+
+
+def call(app, client, case, i):
+    path, body = case.make(i)
+    app.extensions['result_cache'].clear()
+    response = client.open(path, method=case.method, json=body, headers=PIN)
+    response.get_data()  # drain streamed exports
+    if response.status_code not in case.statuses:
+        raise SystemExit(f"❌ {case.method} {path}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+    if case.after:
+        case.after(i, response)
+
+
+def run(app, client, case, i):
+    """Run `i` of `case`: one request, or case.concurrent at once."""
+    if case.concurrent == 1:
+        call(app, client, case, i)
+        return
+    first = i * case.concurrent
+    with ThreadPoolExecutor(case.concurrent) as pool:
+        # list() re-raises a failed request's SystemExit here
+        list(pool.map(lambda j: call(app, app.test_client(), case, j), range(first, first + case.concurrent)))
+
+
+def stream_in_background(app, path, stop):
+    """GET `path` on a thread of its own until `stop` is set."""
+    client = app.test_client()
+
+    def loop():
+        while not stop.is_set():
+            client.get(path, headers=PIN).get_data()
+
+    thread = threading.Thread(target=loop, name=BACKGROUND_THREAD, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for_jobs(app, timeout=120):
+    """Let the jobs a case queued finish, so they do not slow down the next."""
+    deadline = time.monotonic() + timeout
+    while app.extensions['job_runner'].stats()['active'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def measure(app, client, case, runs, statements):
+    runs = case.runs or runs
+    timings = []
+    counts = []
+    if case.background:
+        stop = threading.Event()
+        background = stream_in_background(app, case.background, stop)
+        time.sleep(0.05)  # let the first export get going
+    for i in range(runs):
+        statements.clear()
+        started = time.perf_counter()
+        run(app, client, case, i)
+        timings.append((time.perf_counter() - started) * 1000)
+        counts.append(len(statements))
+    if case.background:
+        stop.set()
+        background.join()
+
+    # One more run under tracemalloc, which slows Python down too much to time
+    tracemalloc.start()
+    run(app, client, case, runs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    wait_for_jobs(app)
+
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'queries': max(counts),
+        'peak_kb': round(peak / 1024)
+    }
+
+
+def dataset_summary():
+    return {
+        'workers': db.session.query(func.count(Worker.id)).scalar(),
+        'sessions': db.session.query(func.count(WorkSession.id)).scalar(),
+        'advances': db.session.query(func.count(Advance.id)).scalar(),
+        'loans': db.session.query(func.count(Loan.id)).scalar()
+    }
+
+
+def same_dataset(recorded, dataset):
+    # A generated dataset runs up to today, so its row counts drift a little day to day
+    if not recorded or recorded['workers'] != dataset['workers']:
+        return False
+    return abs(recorded['sessions'] - dataset['sessions']) <= 0.05 * max(recorded['sessions'], 1)
+
+
+def uncovered_routes(app, cases):
+    covered = {(case.rule, case.method) for case in cases}
+    return sorted(
+        f"{method} {rule.rule}"
+        for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+        if (rule.rule, method) not in covered
+    )
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each route against the baseline, and the regressions."""
+    regressions = []
+    lines = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            lines.append((name, result, 'new'))
+            continue
+        notes = []
+        if result['queries'] > before['queries']:
+            notes.append(f"queries {before['queries']}→{result['queries']}")
+        if result['p50_ms'] > before['p50_ms'] * (1 + tolerance) + LATENCY_SLACK_MS:
+            notes.append(f"p50 {before['p50_ms']}→{result['p50_ms']} ms")
+        if notes:
+            regressions.append(name)
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        lines.append((name, result, '❌ ' + ', '.join(notes) if notes else f'{change:+.0f}%'))
+    return lines, regressions
+
+
+def bench_config(path, sqlite_defaults=False):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        DEBUG = False
+        # The report already shows the slow routes
+        SLOW_REQUEST_MS = float('inf')
+        JOB_DIR = os.path.join(os.path.dirname(path), 'jobs')
+        if sqlite_defaults:
+            # The journal mode is stored in the file, so reset it; the busy timeout is the old one
+            SQLITE_PRAGMAS = {'journal_mode': 'DELETE'}
+            SQLALCHEMY_ENGINE_OPTIONS = {**Config.SQLALCHEMY_ENGINE_OPTIONS, 'connect_args': {'timeout': 15}}
+    return BenchConfig
+
+
+def open_dataset(path, scale, sqlite_defaults=False):
+    """An app on `path`, migrated and filled with `scale` unless it has data."""
+    app = create_app(bench_config(path, sqlite_defaults))
+    with app.app_context():
+        migrations.upgrade()
+        if scale:
+            from synthetic_data import generate
+            print(f"🏭 Generating {scale}")
+            generate(**scale, log=lambda line: print(f"   {line}"))
+        app.extensions['clock_index'].warm()
+    return app
+
+
+def close_dataset(app):
+    app.extensions['job_runner'].stop()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    app.extensions['read_pool'].dispose()
+
+
+def unbudgeted_routes(app):
+    return sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if rule.rule.startswith('/api/') and budget_of(app.view_functions[rule.endpoint]) is None
+    )
+
+
+def check_budgets(workdir, runs):
+    """Run every case on each of BUDGET_SCALES; the overruns, as report lines."""
+    overruns = []
+    for number, scale in enumerate(BUDGET_SCALES):
+        app = open_dataset(os.path.join(workdir, f'budget{number}.db'), scale)
+        with app.app_context():
+            cases = build_cases(runs)
+        client = app.test_client()
+        for case in cases:
+            for i in range(case.runs or runs):
+                run(app, client, case, i)
+        overruns.extend(
+            f"{scale['workers']} workers: {method} {path} ran {statements} statements, budget {budget}"
+            for method, path, statements, budget in app.extensions['metrics'].budget_overruns
+        )
+        close_dataset(app)
+    return overruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API route.')
+    parser.add_argument('--db', help='synthetic database to copy (default: generate DEFAULT_SCALE)')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative p50 growth')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check-budgets', action='store_true', help='check query budgets on datasets of growing size')
+    parser.add_argument('--sqlite-defaults', action='store_true', help='run without the SQLite storage profile')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'bench.db')
+
+    try:
+        if args.check_budgets:
+            unbudgeted = unbudgeted_routes(create_app(bench_config(path)))
+            if unbudgeted:
+                print(f"❌ No query budget: {', '.join(unbudgeted)}")
+                sys.exit(1)
+            overruns = check_budgets(workdir, BUDGET_RUNS)
+            for line in overruns:
+                print(f"   ❌ {line}")
+            if overruns:
+                print(f"❌ {len(overruns)} requests over their query budget")
+                sys.exit(1)
+            print(f"✅ Every route within its query budget at {', '.join(str(scale['workers']) for scale in BUDGET_SCALES)} workers")
+            return
+
+        if args.db:
+            # Writes are benchmarked too; never touch the original
+            shutil.copy(args.db, path)
+
+        app = open_dataset(path, None if args.db else DEFAULT_SCALE, args.sqlite_defaults)
+        with app.app_context():
+            dataset = dataset_summary()
+            cases = build_cases(args.runs)
+
+            # The measured requests' statements (clock writes run on the writer thread,
+            # reports on the read pool), not a background export's
+            statements = []
+            for engine in (db.engine, app.extensions['read_pool']):
+                event.listen(engine, 'before_cursor_execute',
+                             lambda *a: statements.append(1) if threading.current_thread().name != BACKGROUND_THREAD else None)
+
+        missing = uncovered_routes(app, cases)
+        if missing:
+            print(f"⚠️ Not benchmarked: {', '.join(missing)}")
+
+        client = app.test_client()
+        results = {}
+        for case in cases:
+            results[case.name] = measure(app, client, case, args.runs, statements)
+
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                stored = json.load(f)
+            baseline = stored['routes']
+            if not same_dataset(stored.get('dataset'), dataset):
+                print(f"⚠️ Baseline was recorded on a different dataset: {stored.get('dataset')}")
+
+        lines, regressions = compare(results, baseline, args.tolerance)
+        print(f"📊 {dataset}, {args.runs} runs per route")
+        print(f"{'route':<32} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'peak KB':>8}  vs baseline")
+        for name, result, note in lines:
+            print(f"{name:<32} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['queries']:>8} {result['peak_kb']:>8}  {note}")
+
+        if args.save_baseline:
+            with open(args.baseline, 'w') as f:
+                json.dump({'dataset': dataset, 'runs': args.runs, 'routes': results}, f, indent=2)
+            print(f"💾 Baseline saved to {args.baseline}")
+        elif regressions:
+            print(f"❌ {len(regressions)} routes regressed")
+            sys.exit(1)
+        elif baseline:
+            print("✅ No regressions")
+
+        close_dataset(app)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark for the payroll summary endpoint
+Seeds a throwaway database at increasing headcounts and reports latency and
+SQL statement count for GET /api/payments/summary. The query count must stay
+constant and per-worker latency roughly flat as headcount grows. The result
+cache is cleared before every request, so each one computes the summary.
+
+Usage: python bench_payroll.py [headcount ...]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from app import create_app
+from config import Config
+import migrations
+import cycle_hours
+from models import db, Group, Worker, WorkSession, Advance
+
+DEFAULT_HEADCOUNTS = [100, 500, 1500]
+SESSION_DAYS = 45
+RUNS = 5
+
+
+def seed(headcount, rng):
+    today = date.today()
+    db.session.execute(insert(Group), [{'name': f'Group {i}'} for i in range(max(1, headcount // 25))])
+    group_ids = [g.id for g in Group.query.all()]
+
+    db.session.execute(insert(Worker), [{
+        'code': f'W{i:05d}',
+        'name': f'Worker {i}',
+        'position': 'Operator',
+        'salary': rng.choice([30000, 45000, 60000]),
+        'hire_date': date(2023, rng.randint(1, 12), rng.randint(1, 28)),
+        'group_id': rng.choice(group_ids),
+        'is_active': True,
+        'is_team_leader': False
+    } for i in range(1, headcount + 1)])
+    worker_ids = [w.id for w in Worker.query.all()]
+
+    sessions = []
+    advances = []
+    for worker_id in worker_ids:
+        for offset in range(SESSION_DAYS):
+            day = today - timedelta(days=offset)
+            clock_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+            hours = round(rng.uniform(6, 9), 2)
+            sessions.append({
+                'worker_id': worker_id,
+                'clock_in': clock_in,
+                'clock_out': clock_in + timedelta(hours=hours),
+                'hours_worked': hours,
+                'date': day
+            })
+        for _ in range(rng.randint(0, 3)):
+            advances.append({
+                'worker_id': worker_id,
+                'amount': rng.randint(1, 10) * 1000,
+                'date_given': today - timedelta(days=rng.randint(0, 60)),
+                'is_paid_back': rng.random() < 0.3
+            })
+
+    db.session.execute(insert(WorkSession), sessions)
+    if advances:
+        db.session.execute(insert(Advance), advances)
+    # Sessions were inserted behind the aggregate's back
+    cycle_hours.rebuild()
+    db.session.commit()
+
+
+def run(headcount):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        DEBUG = False
+
+    try:
+        app = create_app(BenchConfig)
+        with app.app_context():
+            migrations.upgrade()
+            seed(headcount, random.Random(headcount))
+
+            # The summary reads through the report pool (read_pool.py)
+            statements = []
+            for engine in (db.engine, app.extensions['read_pool']):
+                event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(1))
+
+            client = app.test_client()
+            client.get('/api/payments/summary')  # warm-up
+
+            timings = []
+            for _ in range(RUNS):
+                # Measure the computation, not a result cache hit
+                app.extensions['result_cache'].clear()
+                statements.clear()
+                started = time.perf_counter()
+                response = client.get('/api/payments/summary')
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.status_code
+
+            db.session.remove()
+            db.engine.dispose()
+        app.extensions['read_pool'].dispose()
+
+        median = statistics.median(timings)
+        return median, len(statements), median / headcount * 1000
+    finally:
+        os.remove(path)
+
+
+def main():
+    headcounts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_HEADCOUNTS
+
+    print("📊 GET /api/payments/summary")
+    print(f"{'workers':>8} {'median ms':>10} {'queries':>8} {'µs/worker':>10}")
+    for headcount in headcounts:
+        median, queries, per_worker = run(headcount)
+        print(f"{headcount:>8} {median:>10.1f} {queries:>8} {per_worker:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Per-table change counters and conditional GET support
+Every committed write bumps a version counter for each table it touched.
+SQLAlchemy session events do the bumping, so write routes need no extra code.
+GET routes decorated with @changes.conditional(...) derive an ETag and
+Last-Modified from the versions of the tables they read. A request whose
+If-None-Match (or If-Modified-Since) still matches gets a 304 before the
+view runs, so nothing is queried or serialized.
+
+Counters live in this process; a restart changes the boot id in every ETag.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from functools import wraps
+from flask import current_app, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+PENDING_KEY = 'changed_tables'
+
+
+class ChangeTracker:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._boot_time = time.time()
+        self._versions = {}   # table name -> counter
+        self._modified = {}   # table name -> unix time of last bump
+        self._listeners = []  # called with the set of bumped tables
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['change_tracker'] = self
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def bump(self, tables):
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified[table] = now
+        for callback in self._listeners:
+            callback(tables)
+
+    def version(self, table):
+        return self._versions.get(table, 0)
+
+    def versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def last_modified(self, tables):
+        with self._lock:
+            stamp = max([self._modified.get(table, self._boot_time) for table in tables], default=self._boot_time)
+        # HTTP dates have one-second resolution
+        return datetime.fromtimestamp(int(stamp), timezone.utc)
+
+    def etag(self, tables):
+        # The path with its query string separates filtered/paged variants;
+        # today's date covers responses that depend on the current pay cycle
+        key = f'{self._boot_id}:{self.versions(tables)}:{request.full_path}:{date.today().isoformat()}'
+        return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+    def conditional(self, *tables):
+        """Answer GETs with 304 when none of `tables` changed since the
+        client's copy, otherwise run the view and tag its response."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                etag = self.etag(tables)
+                last_modified = self.last_modified(tables)
+
+                if request.if_none_match:
+                    not_modified = request.if_none_match.contains(etag)
+                else:
+                    since = request.if_modified_since
+                    not_modified = since is not None and last_modified <= since
+
+                if not_modified:
+                    response = current_app.response_class(status=304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            return wrapper
+        return decorator
+
+
+def _pending(session):
+    return session.info.setdefault(PENDING_KEY, set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    pending = _pending(session)
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        pending.add(instance.__table__.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_dml_tables(orm_execute_state):
+    # Bulk/Core INSERT, UPDATE and DELETE statements never pass through a flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _pending(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_tables(session):
+    tables = session.info.pop(PENDING_KEY, None)
+    if not tables:
+        return
+    try:
+        tracker = current_app.extensions.get('change_tracker')
+    except RuntimeError:
+        return  # outside an app context, e.g. a maintenance script
+    if tracker is not None:
+        tracker.bump(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,253 @@
+"""
+Batch clock-event ingestion
+Applies a list of timestamped clock-in/clock-out events, e.g. buffered by a
+badge terminal during a network outage, in a single transaction. The same
+rule as /api/clock-in holds: one open session per worker per day. A batch
+that still hits a constraint (a change made meanwhile) is retried one worker
+per transaction, and only that worker's events are rejected.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from models import db, WorkSession
+from clock_index import calculate_hours
+import cycle_hours
+
+EVENT_TYPES = ('clock_in', 'clock_out')
+
+# Terminal clocks drift; anything further in the future than this is rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+_close_session = WorkSession.__table__.update().where(
+    WorkSession.__table__.c.id == bindparam('session_id')
+).values(
+    clock_out=bindparam('clock_out_at'),
+    hours_worked=bindparam('hours')
+)
+
+# A clock-in whose day already has an open session (ix_work_sessions_open) is
+# skipped, not failed; RETURNING leaves it out
+_insert_sessions = sqlite_insert(WorkSession).on_conflict_do_nothing(
+    index_elements=[WorkSession.worker_id, WorkSession.date],
+    index_where=WorkSession.clock_out.is_(None)
+).returning(WorkSession.id, WorkSession.worker_id, WorkSession.clock_in, WorkSession.clock_out)
+
+
+def _parse_event(event, now):
+    if not isinstance(event, dict):
+        raise ValueError('Event must be an object')
+
+    worker_code = event.get('worker_code')
+    if not worker_code:
+        raise ValueError('worker_code is required')
+
+    event_type = event.get('type')
+    if event_type not in EVENT_TYPES:
+        raise ValueError("type must be 'clock_in' or 'clock_out'")
+
+    try:
+        timestamp = datetime.fromisoformat(event.get('timestamp') or '')
+    except (TypeError, ValueError):
+        raise ValueError('Invalid timestamp format. Use ISO 8601 (YYYY-MM-DDTHH:MM:SS)')
+
+    # Sessions are stored in server local time
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+
+    if timestamp > now + MAX_CLOCK_SKEW:
+        raise ValueError('Timestamp is in the future')
+
+    return worker_code, event_type, timestamp
+
+
+def _open_sessions(worker_ids):
+    """worker_id -> {date: session} of every open session of the workers,
+    whatever its day."""
+    sessions = defaultdict(dict)
+    if worker_ids:
+        rows = db.session.execute(
+            select(WorkSession.id, WorkSession.worker_id, WorkSession.date, WorkSession.clock_in).where(
+                WorkSession.worker_id.in_(worker_ids),
+                WorkSession.clock_out.is_(None)
+            )
+        )
+        for session_id, worker_id, day, clock_in in rows:
+            sessions[worker_id][day] = {'id': session_id, 'clock_in': clock_in, 'date': day}
+    return sessions
+
+
+def _write(applied):
+    """Insert, close and total the sessions of the `applied` events. Does
+    not commit; returns the positions of the clock-ins skipped because their
+    day already had an open session."""
+    new_rows = []
+    closed = []
+    closed_hours = []  # (worker_id, hire_date, date, hours) for cycle totals
+    for _, _, event_type, session, hours_worked, worker in applied:
+        if 'row' in session:
+            # Ids from an attempt that was rolled back
+            session.pop('id', None)
+        if event_type == 'clock_in':
+            new_rows.append(session['row'])
+        else:
+            closed_hours.append((worker['id'], worker['hire_date'], session['date'], hours_worked))
+            if 'row' not in session:
+                closed.append({'session_id': session['id'], 'clock_out_at': session['clock_out'], 'hours': hours_worked})
+
+    # One multi-row INSERT; an ORM flush would insert row by row to
+    # collect ids. Rows are told apart by (worker, clock in, clock out).
+    new_ids = defaultdict(list)
+    if new_rows:
+        for session_id, worker_id, clock_in, clock_out in db.session.execute(_insert_sessions, new_rows):
+            new_ids[(worker_id, clock_in, clock_out)].append(session_id)
+    if closed:
+        db.session.execute(_close_session, closed)
+    cycle_hours.record_closed_sessions(closed_hours)
+
+    skipped = []
+    for position, _, event_type, session, _, _ in applied:
+        row = session.get('row')
+        if event_type == 'clock_in':
+            ids = new_ids[(row['worker_id'], row['clock_in'], row['clock_out'])]
+            if ids:
+                session['id'] = ids.pop()
+            else:
+                skipped.append(position)
+    return skipped
+
+
+def apply_clock_events(events, clock_index):
+    """Validate and apply `events` in order of timestamp, one commit for the
+    whole batch. Returns one result per event, in request order."""
+    now = datetime.now()
+    results = [None] * len(events)
+
+    def reject(position, error):
+        results[position] = {'index': position, 'status': 'rejected', 'error': error}
+
+    parsed = []
+    for position, event in enumerate(events):
+        try:
+            worker_code, event_type, timestamp = _parse_event(event, now)
+        except ValueError as e:
+            reject(position, str(e))
+            continue
+
+        worker = clock_index.worker_by_code(worker_code)
+        if not worker:
+            reject(position, 'Worker not found')
+            continue
+
+        parsed.append((timestamp, position, worker_code, worker, event_type))
+
+    # Replay in time order; ties keep the order the terminal sent them in
+    parsed.sort(key=lambda item: (item[0], item[1]))
+
+    claimed = set()
+    busy = set()
+    for _, _, _, worker, _ in parsed:
+        worker_id = worker['id']
+        if worker_id not in claimed and worker_id not in busy:
+            (claimed if clock_index.claim(worker_id) else busy).add(worker_id)
+
+    try:
+        # Every open session, not just the newest: buffered events can close
+        # or reopen earlier days
+        open_sessions = _open_sessions(claimed)
+        applied = []
+
+        for timestamp, position, worker_code, worker, event_type in parsed:
+            worker_id = worker['id']
+            if worker_id in busy:
+                reject(position, 'Another clock event for this worker is in progress')
+                continue
+
+            sessions = open_sessions[worker_id]
+            day = timestamp.date()
+
+            if event_type == 'clock_in':
+                if day in sessions:
+                    reject(position, f'Worker already clocked in on {day.isoformat()}')
+                    continue
+
+                row = {'worker_id': worker_id, 'clock_in': timestamp, 'clock_out': None, 'hours_worked': None, 'date': day}
+                session = {'row': row, 'clock_in': timestamp, 'date': day}
+                sessions[day] = session
+                applied.append((position, worker_code, event_type, session, None, worker))
+            else:
+                session = sessions.get(day)
+                if not session:
+                    reject(position, f'No active clock-in session found on {day.isoformat()}')
+                    continue
+                if timestamp < session['clock_in']:
+                    reject(position, 'Clock-out is earlier than clock-in')
+                    continue
+
+                hours_worked = calculate_hours(session['clock_in'], timestamp)
+                del sessions[day]
+                session['clock_out'] = timestamp
+                if 'row' in session:
+                    session['row'].update(clock_out=timestamp, hours_worked=hours_worked)
+                applied.append((position, worker_code, event_type, session, hours_worked, worker))
+
+        # Workers whose open sessions were changed by someone else meanwhile
+        conflicted = set()
+        try:
+            try:
+                skipped = _write(applied)
+            except IntegrityError:
+                db.session.rollback()
+                skipped = []
+                by_worker = defaultdict(list)
+                for entry in applied:
+                    by_worker[entry[5]['id']].append(entry)
+                for worker_id, worker_applied in by_worker.items():
+                    try:
+                        skipped.extend(_write(worker_applied))
+                        db.session.commit()
+                    except IntegrityError as e:
+                        db.session.rollback()
+                        conflicted.add(worker_id)
+                        for entry in worker_applied:
+                            reject(entry[0], f'Conflicts with a change made meanwhile: {e.orig}')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        by_position = {entry[0]: entry for entry in applied}
+        for position in skipped:
+            entry = by_position[position]
+            conflicted.add(entry[5]['id'])
+            reject(position, f"Worker already clocked in on {entry[3]['date'].isoformat()}")
+        applied = [entry for entry in applied if results[entry[0]] is None]
+
+        for worker_id, sessions in open_sessions.items():
+            if worker_id in conflicted:
+                # Their writer keeps the index up to date
+                continue
+            latest = max(sessions.values(), key=lambda session: session['clock_in'], default=None)
+            clock_index.set_open_session(worker_id, latest and {
+                'id': latest['id'],
+                'clock_in': latest['clock_in'],
+                'date': latest['date']
+            })
+    finally:
+        for worker_id in claimed:
+            clock_index.release(worker_id)
+
+    for position, worker_code, event_type, session, hours_worked, _ in applied:
+        result = {
+            'index': position,
+            'status': 'applied',
+            'worker_code': worker_code,
+            'type': event_type,
+            'session_id': session['id']
+        }
+        if event_type == 'clock_out':
+            result['hours_worked'] = hours_worked
+        results[position] = result
+
+    return results
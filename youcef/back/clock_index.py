@@ -0,0 +1,139 @@
+"""
+In-memory index for the clock-in/clock-out hot path
+Maps worker code -> worker id/name/hire date and worker id -> today's open
+WorkSession so a clock event needs no SELECT, only its INSERT or UPDATE (plus
+the cycle hours upsert on clock-out). Routes that change workers or sessions
+must keep it in step after they commit.
+"""
+import threading
+from datetime import date
+from models import db, Worker, WorkSession
+from metrics import not_counted
+
+
+class ClockIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warm = False
+        self._workers = {}        # code -> {'id', 'name', 'hire_date'}
+        self._open_sessions = {}  # worker_id -> {'id', 'clock_in', 'date'}
+        self._pending = set()     # worker ids with a clock write in flight
+
+    def warm(self):
+        """(Re)load active workers and open sessions from the database."""
+        workers = db.session.query(
+            Worker.id, Worker.code, Worker.name, Worker.hire_date
+        ).filter(Worker.is_active == True).all()
+        sessions = db.session.query(
+            WorkSession.id, WorkSession.worker_id, WorkSession.clock_in, WorkSession.date
+        ).filter(WorkSession.clock_out.is_(None)).order_by(WorkSession.clock_in).all()
+
+        with self._lock:
+            self._workers = {
+                code: {'id': worker_id, 'name': name, 'hire_date': hire_date}
+                for worker_id, code, name, hire_date in workers
+            }
+            # Later sessions overwrite earlier ones: only the newest open one counts
+            self._open_sessions = {
+                worker_id: {'id': session_id, 'clock_in': clock_in, 'date': session_date}
+                for session_id, worker_id, clock_in, session_date in sessions
+            }
+            self._warm = True
+
+    def _ensure_warm(self):
+        if not self._warm:
+            # The first request after a start pays for the load, not its budget
+            with not_counted():
+                self.warm()
+
+    # Workers
+
+    def worker_by_code(self, code):
+        self._ensure_warm()
+        return self._workers.get(code)
+
+    def add_worker(self, worker):
+        with self._lock:
+            if worker.is_active:
+                self._workers[worker.code] = {'id': worker.id, 'name': worker.name, 'hire_date': worker.hire_date}
+
+    def add_workers(self, workers):
+        """Index newly inserted active workers, given as (id, code, name, hire_date)."""
+        with self._lock:
+            for worker_id, code, name, hire_date in workers:
+                self._workers[code] = {'id': worker_id, 'name': name, 'hire_date': hire_date}
+
+    def update_worker(self, worker):
+        with self._lock:
+            if worker.code in self._workers:
+                self._workers[worker.code].update(name=worker.name, hire_date=worker.hire_date)
+
+    def remove_worker(self, code, worker_id):
+        with self._lock:
+            self._workers.pop(code, None)
+            self._open_sessions.pop(worker_id, None)
+            self._pending.discard(worker_id)
+
+    # Sessions
+
+    def open_session(self, worker_id, today=None):
+        """Today's open session for the worker, or None."""
+        self._ensure_warm()
+        session = self._open_sessions.get(worker_id)
+        if session and session['date'] == (today or date.today()):
+            return session
+        return None
+
+    def open_session_count(self, today=None):
+        """How many workers are clocked in today."""
+        self._ensure_warm()
+        today = today or date.today()
+        with self._lock:
+            return sum(1 for session in self._open_sessions.values() if session['date'] == today)
+
+    def latest_open_session(self, worker_id):
+        """Newest open session for the worker, whatever its date."""
+        self._ensure_warm()
+        return self._open_sessions.get(worker_id)
+
+    def set_open_session(self, worker_id, session):
+        with self._lock:
+            if session is None:
+                self._open_sessions.pop(worker_id, None)
+            else:
+                self._open_sessions[worker_id] = session
+
+    def claim(self, worker_id):
+        """Take the worker for one clock write. False if another clock-in,
+        clock-out or batch for the same worker is still in flight."""
+        self._ensure_warm()
+        with self._lock:
+            if worker_id in self._pending:
+                return False
+            self._pending.add(worker_id)
+            return True
+
+    def release(self, worker_id):
+        with self._lock:
+            self._pending.discard(worker_id)
+
+
+# Calculate hours worked
+def calculate_hours(clock_in, clock_out):
+    if clock_in and clock_out:
+        duration = clock_out - clock_in
+        return round(duration.total_seconds() / 3600, 2)
+    return 0
+
+
+def session_payload(session, worker_id, worker_name, clock_out=None, hours_worked=None):
+    """Same shape as WorkSession.to_dict(), built without touching the database."""
+    return {
+        'id': session['id'],
+        'worker_id': worker_id,
+        'worker_name': worker_name,
+        'clock_in': session['clock_in'].isoformat() if session['clock_in'] else None,
+        'clock_out': clock_out.isoformat() if clock_out else None,
+        'hours_worked': hours_worked,
+        'date': session['date'].isoformat() if session['date'] else None
+    }
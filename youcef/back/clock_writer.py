@@ -0,0 +1,135 @@
+"""
+Group commit for clock-in/clock-out
+At shift change dozens of badges are swiped within a few milliseconds, and
+each swipe used to commit on its own: one WAL sync and one turn at SQLite's
+write lock per request. ClockWriter runs those writes on a single thread
+instead. Writes queued while the previous commit ran - and, during a burst,
+those arriving within CLOCK_COMMIT_WINDOW_MS - share one transaction. Each
+request blocks until the commit holding its write returns, so a swipe is
+only acknowledged once it is on disk; the group commits with
+synchronous=CLOCK_COMMIT_SYNCHRONOUS (FULL: the WAL is synced, power-loss
+safe), which costs one sync per group rather than per swipe.
+
+A failed group is retried one write per transaction, so one bad write
+cannot fail the others. The statements still count towards the route that
+submitted them in /api/metrics and its query budget.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from models import db
+from metrics import counting_for, current_request
+import storage_profile
+
+
+class ClockWriter:
+    def __init__(self, app):
+        self._app = app
+        self._window = app.config['CLOCK_COMMIT_WINDOW_MS'] / 1000
+        self._max_group = app.config['CLOCK_COMMIT_MAX_GROUP']
+        self._synchronous = app.config['CLOCK_COMMIT_SYNCHRONOUS']
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # The last group had company: wait out the window for the next one
+        self._burst = False
+        self._stats = {
+            'writes': 0,
+            'commits': 0,
+            'largest_group': 0,
+            'retried_groups': 0,
+            'last_commit_ms': 0.0
+        }
+        app.extensions['clock_writer'] = self
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def submit(self, write):
+        """Run `write()` (statements on db.session, no commit) in the next
+        group commit. Blocks until that commit is done; returns what `write`
+        returned or raises what it raised."""
+        future = Future()
+        self._start()
+        self._queue.put((write, current_request(), future))
+        return future.result()
+
+    def _start(self):
+        # On first use, so the test client and each server process get one
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='clock-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """Commit what is queued, then end the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _run(self):
+        with self._app.app_context():
+            stopping = False
+            while not stopping:
+                group, stopping = self._collect()
+                if group:
+                    self._commit(group)
+
+    def _collect(self):
+        """The next group of writes, and whether stop() was called."""
+        group = []
+        item = self._queue.get()
+        deadline = time.monotonic() + (self._window if self._burst else 0)
+        while item is not None:
+            group.append(item)
+            if len(group) == self._max_group:
+                break
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        return group, item is None
+
+    def _commit(self, group):
+        started = time.perf_counter()
+        retried = False
+        try:
+            results = self._transaction(group)
+        except Exception as e:
+            if len(group) == 1:
+                group[0][2].set_exception(e)
+            else:
+                retried = True
+                for item in group:
+                    try:
+                        item[2].set_result(self._transaction([item])[0])
+                    except Exception as e:
+                        item[2].set_exception(e)
+        else:
+            for (_, _, future), result in zip(group, results):
+                future.set_result(result)
+
+        self._burst = len(group) > 1
+        with self._lock:
+            self._stats['writes'] += len(group)
+            self._stats['commits'] += len(group) if retried else 1
+            self._stats['largest_group'] = max(self._stats['largest_group'], len(group))
+            self._stats['retried_groups'] += retried
+            self._stats['last_commit_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+    def _transaction(self, group):
+        try:
+            storage_profile.set_synchronous(db.session.connection(), self._synchronous)
+            results = []
+            for write, request_metrics, _ in group:
+                with counting_for(request_metrics):
+                    results.append(write())
+            db.session.commit()
+            return results
+        except Exception:
+            db.session.rollback()
+            raise
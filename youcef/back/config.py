@@ -11,7 +11,98 @@ class Config:
     # Flask server configuration
     HOST = '127.0.0.1'
     PORT = 5000
-    DEBUG = True
+    DEBUG = False
+    
+    # Browser origins allowed to call the API and read the event stream
+    CORS_ORIGINS = ["http://localhost:8080", "http://127.0.0.1:8080", "http://localhost:5000", "http://127.0.0.1:5000"]
+    
+    # Production server (python app.py; --dev runs Flask's debug reloader)
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 16))
+    # Accepted connections waiting for a free thread; more get a 503
+    SERVER_BACKLOG = 64
+    # Seconds an idle keep-alive connection stays open, and a request may stall reading or writing
+    SERVER_KEEPALIVE_TIMEOUT = 5
+    SERVER_REQUEST_TIMEOUT = 30
+    # Seconds in-flight requests get to finish when the server stops
+    SERVER_SHUTDOWN_TIMEOUT = 10
+    
+    # A pooled connection per server thread (pysqlite shares them across threads
+    # with check_same_thread=False)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': SERVER_THREADS,
+        'max_overflow': 4
+    }
+    # Separate read-only connections for report routes (see read_pool.py);
+    # more concurrent reports than this wait for one
+    REPORT_POOL_SIZE = 4
+    
+    # Background jobs (see jobs.py): worker processes for heavy exports,
+    # where their files go, and how long a finished job and its file are kept
+    JOB_PROCESSES = 2
+    JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jobs')
+    JOB_RETENTION_HOURS = 24
+    
+    # Page cache for all the connections both pools may open, split evenly:
+    # more server threads mean smaller caches, not more memory. Pages that do
+    # not fit are read through the memory map, which all connections share
+    SQLITE_CACHE_BUDGET_KIB = 65536
+    SQLITE_CONNECTIONS = SQLALCHEMY_ENGINE_OPTIONS['pool_size'] + SQLALCHEMY_ENGINE_OPTIONS['max_overflow'] + REPORT_POOL_SIZE
+    
+    # Set on every SQLite connection as it opens, in this order (see storage_profile.py)
+    SQLITE_PRAGMAS = {
+        'auto_vacuum': 'INCREMENTAL',  # new files only; migration 5 converts existing ones
+        'journal_mode': 'WAL',         # readers and the writer no longer block each other
+        'synchronous': 'NORMAL',       # WAL: a power cut may lose the last commits, never corrupts
+        'busy_timeout': 15000,         # ms a writer waits for the write lock
+        'cache_size': -(SQLITE_CACHE_BUDGET_KIB // SQLITE_CONNECTIONS),  # KiB per connection
+        'mmap_size': 268435456,        # bytes of the file read through memory mapping
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'
+    }
+    # Seconds between PRAGMA optimize passes, and between ANALYZE + incremental vacuum passes
+    STORAGE_OPTIMIZE_INTERVAL = 3600
+    STORAGE_ANALYZE_INTERVAL = 24 * 3600
+    # Rows ANALYZE samples per index, and free pages one vacuum pass gives back
+    STORAGE_ANALYSIS_LIMIT = 1000
+    STORAGE_VACUUM_PAGES = 25000
+    
+    # Pages and assets served at / (see static_assets.py)
+    FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'front')
+    
+    # Port of the server-sent events hub behind /api/events
+    EVENTS_PORT = 5001
+    
+    # Largest accepted POST /api/clock-events batch
+    CLOCK_BATCH_MAX_EVENTS = 10000
+    
+    # Clock-in/out group commit (see clock_writer.py): during a burst, writes
+    # arriving within the window share one transaction, up to the group size
+    CLOCK_COMMIT_WINDOW_MS = 2
+    CLOCK_COMMIT_MAX_GROUP = 256
+    # Group commits sync the WAL (power-loss safe); one sync per group keeps it cheap
+    CLOCK_COMMIT_SYNCHRONOUS = 'FULL'
+    
+    # Largest POST /api/workers/import and rows inserted per transaction
+    IMPORT_MAX_ROWS = 5000
+    IMPORT_BATCH_SIZE = 500
+    
+    # Largest ?limit= accepted by the paginated list endpoints
+    MAX_PAGE_SIZE = 1000
+    
+    # Recent sessions returned by /api/dashboard unless ?limit= says otherwise
+    DASHBOARD_RECENT_SESSIONS = 10
+    
+    # Responses kept by the read-endpoint cache (least recently used go first)
+    RESULT_CACHE_SIZE = 256
+    
+    # Rows fetched per round trip while streaming a CSV/XLSX export
+    EXPORT_BATCH_SIZE = 500
+    
+    # Requests slower than this are logged with their SQL statement count
+    SLOW_REQUEST_MS = 1000
+    
+    # Over a route's query budget: 'log' a warning, or 'raise' and fail the request
+    QUERY_BUDGET_MODE = 'log'
     
     # Secret key for sessions (generate a random one for production)
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'gplast-factory-management-2025'
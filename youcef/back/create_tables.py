@@ -1,7 +1,7 @@
 from app import create_app
-from models import db
+import migrations
 
 app = create_app()
 with app.app_context():
-    db.create_all()
+    migrations.upgrade()
     print("✅ Database tables created successfully!")
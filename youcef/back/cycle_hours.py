@@ -0,0 +1,132 @@
+"""
+Per-worker, per-cycle hours aggregate
+worker_cycle_hours holds the hours and count of closed sessions for each
+(worker, cycle start), so payroll reads one row per worker instead of summing
+that worker's sessions. Every write that closes, changes or deletes sessions
+must call record_closed_sessions()/forget_worker() before its commit, in the
+same transaction. rebuild() recomputes the table from work_sessions.
+
+Usage: python cycle_hours.py [rebuild|check]
+"""
+import sys
+from collections import defaultdict
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Worker, WorkSession, WorkerCycleHours
+from payroll import get_current_cycle_dates
+
+
+def cycle_start_for(hire_date, session_date):
+    return get_current_cycle_dates(hire_date, session_date)[0]
+
+
+def record_closed_sessions(sessions):
+    """Add closed sessions to the aggregate. `sessions` is a list of
+    (worker_id, hire_date, session_date, hours_worked). Does not commit."""
+    totals = defaultdict(lambda: [0, 0])
+    for worker_id, hire_date, session_date, hours_worked in sessions:
+        total = totals[(worker_id, cycle_start_for(hire_date, session_date))]
+        total[0] += hours_worked or 0
+        total[1] += 1
+    if not totals:
+        return
+
+    # Hours are rounded to 2 decimals per session, so the exact sum is too
+    upsert = sqlite_insert(WorkerCycleHours)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[WorkerCycleHours.worker_id, WorkerCycleHours.cycle_start],
+        set_={
+            'hours_worked': func.round(WorkerCycleHours.hours_worked + upsert.excluded.hours_worked, 2),
+            'session_count': WorkerCycleHours.session_count + upsert.excluded.session_count
+        }
+    )
+    db.session.execute(upsert, [{
+        'worker_id': worker_id,
+        'cycle_start': cycle_start,
+        'hours_worked': round(hours, 2),
+        'session_count': count
+    } for (worker_id, cycle_start), (hours, count) in totals.items()])
+
+
+def forget_worker(worker_id):
+    """Drop a worker's rows, e.g. before deleting their sessions. Does not commit."""
+    db.session.execute(delete(WorkerCycleHours).where(WorkerCycleHours.worker_id == worker_id))
+
+
+def compute_from_sessions():
+    """{(worker_id, cycle_start): (hours, count)} straight from work_sessions."""
+    hire_dates = dict(db.session.query(Worker.id, Worker.hire_date).all())
+
+    # Per-day totals first; cycles are whole days
+    days = db.session.query(
+        WorkSession.worker_id,
+        WorkSession.date,
+        func.sum(WorkSession.hours_worked),
+        func.count(WorkSession.id)
+    ).filter(
+        WorkSession.hours_worked.isnot(None)
+    ).group_by(WorkSession.worker_id, WorkSession.date).all()
+
+    totals = defaultdict(lambda: [0, 0])
+    for worker_id, session_date, hours, count in days:
+        hire_date = hire_dates.get(worker_id)
+        if hire_date is None:
+            continue
+        total = totals[(worker_id, cycle_start_for(hire_date, session_date))]
+        total[0] += hours
+        total[1] += count
+
+    return {key: (round(hours, 2), count) for key, (hours, count) in totals.items()}
+
+
+def rebuild():
+    """Recompute the whole table from work_sessions. Does not commit.
+    Returns the number of rows written."""
+    totals = compute_from_sessions()
+    db.session.execute(delete(WorkerCycleHours))
+    if totals:
+        db.session.execute(insert(WorkerCycleHours), [{
+            'worker_id': worker_id,
+            'cycle_start': cycle_start,
+            'hours_worked': hours,
+            'session_count': count
+        } for (worker_id, cycle_start), (hours, count) in totals.items()])
+    return len(totals)
+
+
+def check():
+    """Rows where the table disagrees with work_sessions."""
+    expected = compute_from_sessions()
+    stored = {
+        (row.worker_id, row.cycle_start): (row.hours_worked, row.session_count)
+        for row in WorkerCycleHours.query.all()
+    }
+    return sorted(
+        (key, stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) != expected.get(key)
+    )
+
+
+def main():
+    from app import create_app
+    import migrations
+
+    app = create_app()
+    with app.app_context():
+        migrations.upgrade()
+
+        if sys.argv[1:] == ['check']:
+            mismatches = check()
+            for (worker_id, cycle_start), stored, expected in mismatches:
+                print(f"   ❌ worker {worker_id}, cycle {cycle_start}: stored {stored}, sessions say {expected}")
+            print(f"{'✅' if not mismatches else '⚠️'} {len(mismatches)} mismatched rows")
+            return
+
+        rows = rebuild()
+        db.session.commit()
+        print(f"🎉 Rebuilt worker_cycle_hours: {rows} rows")
+
+
+if __name__ == '__main__':
+    main()
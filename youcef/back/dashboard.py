@@ -0,0 +1,62 @@
+"""
+Dashboard metrics
+Everything the dashboard cards and recent-sessions table show, from two SQL
+queries (one aggregate over active workers and their unpaid advances, one for
+the last sessions) plus the in-memory clock index. Cheap enough to poll.
+"""
+from sqlalchemy import func
+from models import db, Worker, WorkSession, Advance
+import serializers
+
+
+def payroll_totals():
+    """Headcount and the /api/payments/summary totals in one query."""
+    unpaid = db.session.query(
+        Advance.worker_id.label('worker_id'),
+        func.sum(Advance.amount).label('total'),
+        func.count(Advance.id).label('count')
+    ).filter(
+        Advance.is_paid_back == False
+    ).group_by(Advance.worker_id).subquery()
+
+    advances = func.coalesce(unpaid.c.total, 0)
+    headcount, salaries, advances_total, advances_count, final_payments = db.session.query(
+        func.count(Worker.id),
+        func.coalesce(func.sum(Worker.salary), 0),
+        func.coalesce(func.sum(unpaid.c.total), 0),
+        func.coalesce(func.sum(unpaid.c.count), 0),
+        # Two-argument max() is SQLite's scalar maximum
+        func.coalesce(func.sum(func.max(0, Worker.salary - advances)), 0)
+    ).outerjoin(
+        unpaid, unpaid.c.worker_id == Worker.id
+    ).filter(
+        Worker.is_active == True
+    ).one()
+
+    # Rounded like compute_payment_summary's totals
+    advances_total = round(advances_total, 2)
+    return {
+        'headcount': headcount,
+        'totals': {
+            'total_earned_payroll': round(salaries, 2),
+            'total_advances_given': advances_total,
+            'total_final_payments': round(final_payments, 2),
+            'total_workers': headcount
+        },
+        'advances': {
+            'outstanding_total': advances_total,
+            'outstanding_count': advances_count
+        }
+    }
+
+
+def recent_sessions(limit):
+    sessions = WorkSession.query.order_by(WorkSession.date.desc(), WorkSession.id.desc()).limit(limit)
+    return serializers.sessions.dump(sessions)
+
+
+def compute_dashboard(clock_index, session_limit):
+    dashboard = payroll_totals()
+    dashboard['clocked_in'] = clock_index.open_session_count()
+    dashboard['recent_sessions'] = recent_sessions(session_limit)
+    return dashboard
@@ -0,0 +1,222 @@
+"""
+Server-sent events for dashboards
+Routes publish a compact notification after each committed change (clock-in,
+clock-out, worker/group changed, advance given, loan payment). EventHub fans
+them out to every connected EventSource from one asyncio loop on its own
+thread and port, so an idle subscriber costs a socket, not a Flask worker
+thread. GET /api/events redirects browsers to the hub.
+
+Each event carries an id. A reconnecting client sends it back as
+Last-Event-ID (or ?lastEventId=) and gets the events it missed, or a single
+'reset' event when they are no longer buffered and it must reload.
+"""
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+from urllib.parse import parse_qs
+
+EVENTS_PATH = '/api/events'
+
+# Events kept for reconnecting clients
+HISTORY_SIZE = 500
+# Events queued for one slow subscriber before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 200
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15
+# Seconds a client gets to send its request headers
+REQUEST_TIMEOUT = 10
+
+
+
+def format_event(event_id, event_type, data):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+
+class EventHub:
+    def __init__(self, allowed_origins=()):
+        # Events carry worker details and amounts: only these origins may read them
+        self._allowed_origins = frozenset(allowed_origins)
+        self._lock = threading.Lock()
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._last_seq = 0
+        self._history = deque(maxlen=HISTORY_SIZE)  # (seq, message)
+        self._subscribers = {}  # asyncio.Queue -> handler task
+        self._loop = None
+        self._server = None
+        self.address = None
+
+    @property
+    def running(self):
+        return self._loop is not None
+
+    def start(self, host, port):
+        """Serve the stream on host:port from a daemon thread. Raises if the
+        port cannot be bound."""
+        ready = threading.Event()
+        failure = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                self._server = loop.run_until_complete(asyncio.start_server(self._handle, host, port))
+            except OSError as e:
+                failure.append(e)
+                ready.set()
+                loop.close()
+                return
+            self._loop = loop
+            self.address = (host, port)
+            ready.set()
+            try:
+                loop.run_forever()
+            finally:
+                loop.close()
+
+        threading.Thread(target=run, name='event-hub', daemon=True).start()
+        ready.wait()
+        if failure:
+            raise failure[0]
+
+    def stop(self):
+        loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop)
+
+    def publish(self, event_type, data):
+        """Queue an event for every subscriber. Safe to call from any thread."""
+        with self._lock:
+            self._last_seq += 1
+            seq = self._last_seq
+            message = format_event(f'{self._boot_id}-{seq}', event_type, data)
+            self._history.append((seq, message))
+
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._broadcast, seq, message)
+
+    # Everything below runs on the hub's event loop
+
+    async def _shutdown(self):
+        self._server.close()
+        tasks = list(self._subscribers.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.get_running_loop().stop()
+
+    def _broadcast(self, seq, message):
+        for queue, task in list(self._subscribers.items()):
+            try:
+                queue.put_nowait((seq, message))
+            except asyncio.QueueFull:
+                # Too far behind; it reconnects and catches up from history
+                del self._subscribers[queue]
+                task.cancel()
+
+    def _backlog(self, last_event_id):
+        """Events after `last_event_id`, or None if the client must reload."""
+        boot_id, _, seq = (last_event_id or '').partition('-')
+        if boot_id != self._boot_id or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._lock:
+            if seq > self._last_seq:
+                return None
+            oldest = self._history[0][0] if self._history else self._last_seq + 1
+            if seq < oldest - 1:
+                return None
+            return [(s, message) for s, message in self._history if s > seq]
+
+    def _cors_headers(self, origin):
+        headers = 'Vary: Origin\r\n'
+        if origin in self._allowed_origins:
+            headers += (
+                f'Access-Control-Allow-Origin: {origin}\r\n'
+                'Access-Control-Allow-Headers: Last-Event-ID, Cache-Control\r\n'
+            )
+        return headers
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        return method, target, headers
+
+    async def _handle(self, reader, writer):
+        queue = None
+        hangup = None
+        try:
+            try:
+                method, target, headers = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            except (ValueError, asyncio.TimeoutError):
+                return
+
+            path, _, query = target.partition('?')
+            cors_headers = self._cors_headers(headers.get('origin'))
+            if method == 'OPTIONS':
+                writer.write(f'HTTP/1.1 204 No Content\r\n{cors_headers}Content-Length: 0\r\n\r\n'.encode())
+                await writer.drain()
+                return
+            if method != 'GET' or path != EVENTS_PATH:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                return
+
+            writer.write((
+                'HTTP/1.1 200 OK\r\n'
+                'Content-Type: text/event-stream\r\n'
+                'Cache-Control: no-cache\r\n'
+                f'{cors_headers}'
+                '\r\n'
+                'retry: 3000\n\n'
+            ).encode())
+
+            # Subscribe before reading the backlog so nothing published in
+            # between is lost; duplicates are skipped by sequence number
+            queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            task = self._subscribers[queue] = asyncio.current_task()
+
+            # Clients never send anything more; EOF means they went away
+            hangup = asyncio.ensure_future(reader.read())
+            hangup.add_done_callback(lambda _: task.cancel())
+
+            sent = 0
+            last_event_id = headers.get('last-event-id') or parse_qs(query).get('lastEventId', [None])[0]
+            if last_event_id:
+                backlog = self._backlog(last_event_id)
+                if backlog is None:
+                    writer.write(format_event(f'{self._boot_id}-{self._last_seq}', 'reset', {}))
+                else:
+                    for seq, message in backlog:
+                        writer.write(message)
+                        sent = seq
+            await writer.drain()
+
+            while True:
+                try:
+                    seq, message = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    writer.write(b': keep-alive\n\n')
+                else:
+                    if seq <= sent:
+                        continue
+                    writer.write(message)
+                    sent = seq
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            if hangup is not None:
+                hangup.cancel()
+            if queue is not None:
+                self._subscribers.pop(queue, None)
+            writer.close()
@@ -0,0 +1,281 @@
+"""
+Streaming CSV / XLSX exports
+Each export is a query read through a cursor in EXPORT_BATCH_SIZE batches and
+written out by a generator, so the download starts with the first batch and
+memory stays flat however many years of rows it covers. XLSX files are
+written as a zip stream with inline-string cells: no spreadsheet library
+needed and nothing buffered beyond the current batch.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+from flask import current_app, request, stream_with_context
+from models import db, Group, Worker, WorkSession, Advance, Loan, LoanPayment, PayrollRunEntry
+from pagination import ListQueryError, apply_filters
+from payroll_runs import snapshot_row
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+PAYROLL_COLUMNS = [
+    'worker_id', 'worker_code', 'worker_name', 'cycle_start', 'cycle_end',
+    'hours_worked', 'required_hours', 'monthly_salary', 'advances_taken',
+    'unpaid_advances_count', 'final_payment', 'remaining_debt', 'payment_status'
+]
+
+
+def parse_format():
+    fmt = (request.args.get('format') or 'csv').lower()
+    if fmt not in ('csv', 'xlsx'):
+        raise ListQueryError('format must be csv or xlsx')
+    return fmt
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ', timespec='seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# CSV
+
+# Excel runs a text cell starting with one of these as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    value = _cell(value)
+    # Names, reasons and notes are typed in by users: keep them text
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_chunks(columns, rows, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The BOM makes Excel read the file as UTF-8 (Arabic names)
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for batch in _batches(rows, batch_size):
+        writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+# XLSX
+
+class _Pipe:
+    """Write-only file whose contents are taken out by the generator.
+    It has no tell(), so zipfile writes a streamable archive."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+}
+
+# Control characters XML 1.0 cannot carry
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    value = _cell(value)
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def _xlsx_chunks(sheet, columns, rows, batch_size):
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content.replace('{sheet}', escape(sheet)))
+        yield pipe.drain()
+
+        # Size unknown up front: zip64 so multi-year exports cannot overflow
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as worksheet:
+            worksheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(columns)
+            ).encode('utf-8'))
+            for batch in _batches(rows, batch_size):
+                worksheet.write(''.join(_xlsx_row(row) for row in batch).encode('utf-8'))
+                yield pipe.drain()
+            worksheet.write(b'</sheetData></worksheet>')
+    yield pipe.drain()
+
+
+def mimetype_of(fmt):
+    return XLSX_MIMETYPE if fmt == 'xlsx' else 'text/csv'
+
+
+def export_chunks(name, columns, rows, fmt):
+    """The bytes of the `fmt` file holding `rows` (tuples in `columns`
+    order), one chunk per batch."""
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    if fmt == 'xlsx':
+        return _xlsx_chunks(name[:31], columns, rows, batch_size)
+    return _csv_chunks(columns, rows, batch_size)
+
+
+def export_response(name, columns, rows, fmt):
+    """Stream `rows` (tuples in `columns` order) as a downloadable file."""
+    chunks = export_chunks(name, columns, rows, fmt)
+    mimetype = mimetype_of(fmt)
+
+    response = current_app.response_class(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _stream(query):
+    """Rows of a column query, fetched batch by batch."""
+    return query.yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+
+
+# Exports
+
+def session_rows():
+    query = db.session.query(
+        WorkSession.id, WorkSession.date, Worker.code, Worker.name, Group.name,
+        WorkSession.clock_in, WorkSession.clock_out, WorkSession.hours_worked
+    ).join(
+        Worker, Worker.id == WorkSession.worker_id
+    ).outerjoin(
+        Group, Group.id == Worker.group_id
+    )
+    query = apply_filters(query, worker_column=WorkSession.worker_id, date_column=WorkSession.date)
+    columns = ['session_id', 'date', 'worker_code', 'worker_name', 'group', 'clock_in', 'clock_out', 'hours_worked']
+    return columns, _stream(query.order_by(WorkSession.date, WorkSession.id))
+
+
+def advance_rows():
+    query = db.session.query(
+        Advance.id, Advance.date_given, Worker.code, Worker.name,
+        Advance.amount, Advance.reason, Advance.is_paid_back
+    ).join(
+        Worker, Worker.id == Advance.worker_id
+    )
+    query = apply_filters(
+        query,
+        worker_column=Advance.worker_id,
+        date_column=Advance.date_given,
+        paid_column=Advance.is_paid_back
+    )
+    columns = ['advance_id', 'date_given', 'worker_code', 'worker_name', 'amount', 'reason', 'paid_back']
+    return columns, _stream(query.order_by(Advance.date_given, Advance.id))
+
+
+def loan_rows():
+    """One row per loan payment, loan columns repeated; a loan without
+    payments gets a single row with the payment columns empty."""
+    query = db.session.query(
+        Loan.id, Loan.date_given, Worker.code, Worker.name, Loan.total_amount,
+        Loan.amount_paid_back, Loan.remaining_balance, Loan.is_fully_paid, Loan.reason,
+        LoanPayment.id, LoanPayment.payment_date, LoanPayment.payment_amount, LoanPayment.notes
+    ).join(
+        Worker, Worker.id == Loan.worker_id
+    ).outerjoin(
+        LoanPayment, LoanPayment.loan_id == Loan.id
+    )
+    query = apply_filters(
+        query,
+        worker_column=Loan.worker_id,
+        date_column=Loan.date_given,
+        paid_column=Loan.is_fully_paid
+    )
+    columns = [
+        'loan_id', 'date_given', 'worker_code', 'worker_name', 'total_amount',
+        'amount_paid_back', 'remaining_balance', 'fully_paid', 'reason',
+        'payment_id', 'payment_date', 'payment_amount', 'payment_notes'
+    ]
+    return columns, _stream(query.order_by(Loan.date_given, Loan.id, LoanPayment.payment_date, LoanPayment.id))
+
+
+def payroll_rows(summaries):
+    """Rows of the live payment summary, same columns as a closed run."""
+    return PAYROLL_COLUMNS, ([row[column] for column in PAYROLL_COLUMNS] for row in map(snapshot_row, summaries))
+
+
+def payroll_run_rows(run_id):
+    query = db.session.query(*[getattr(PayrollRunEntry, column) for column in PAYROLL_COLUMNS]).filter(
+        PayrollRunEntry.run_id == run_id
+    ).order_by(PayrollRunEntry.worker_id)
+    return PAYROLL_COLUMNS, _stream(query)
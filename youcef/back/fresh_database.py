@@ -4,14 +4,15 @@ Create fresh database with loan system
 from app import create_app
 from models import db, Group, Worker, Advance, Loan, LoanPayment
 from datetime import date
+import migrations
 
 def create_fresh_database():
     print("🔄 Creating fresh database with loan system...")
     
     app = create_app()
     with app.app_context():
-        # Create all tables
-        db.create_all()
+        # Create all tables and record the schema version
+        migrations.upgrade()
         print("✅ Database tables created successfully!")
         
         # Add some sample data
@@ -6,14 +6,20 @@ Creates all tables with the new schema including Groups and updated Workers tabl
 
 from app import create_app
 from models import db
+import migrations
 
 def init_database():
     app = create_app()
     
     with app.app_context():
-        # Drop all existing tables and create new ones
-        db.drop_all()
-        db.create_all()
+        # Drop all existing tables and create new ones. With foreign keys
+        # enforced no drop order works: groups and workers reference each other
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA foreign_keys = OFF')
+            db.metadata.drop_all(connection)
+            connection.commit()
+            connection.exec_driver_sql('PRAGMA foreign_keys = ON')
+        migrations.upgrade()
         
         print("✅ Database initialized successfully!")
         print("📊 Tables created:")
@@ -0,0 +1,297 @@
+"""
+Background jobs for heavy reports
+An export over years of sessions, or the payroll of a large factory, can take
+long enough to tie up a server thread - and, in Python, the CPU every other
+request thread shares. Submitted to POST /api/jobs instead, the export runs in
+one of JOB_PROCESSES worker processes and the request returns at once with
+the job's id. The jobs table holds each job's parameters, status and progress
+(rows written), so the client polls GET /api/jobs/<id> and downloads the
+file from /api/jobs/<id>/result once the job is done.
+
+A job's parameters are the query string of the matching export route, and
+the worker runs that export's own query inside a request context built from
+them; the parameters are checked the same way when the job is submitted, so a
+bad one is still a 400. Worker processes are spawned (not forked) and build
+their own app on the same database. They update their job's row themselves
+and write the file to JOB_DIR. Cancelling marks the row and the worker stops
+at its next progress report. Jobs a stopped server left behind are marked
+failed at the next start, and results are deleted JOB_RETENTION_HOURS after
+the job finished.
+"""
+import glob
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from flask import g
+from sqlalchemy import update
+from models import db, Job, PayrollRun, READ_ENGINE_KEY
+from metrics import counting_for, current_request
+from pagination import parse_date_arg, parse_int_arg
+from payroll import compute_payment_summary
+import exports
+
+ACTIVE = ('queued', 'running')
+FINISHED = ('done', 'failed', 'cancelled')
+# How often a running job reports its progress and checks for cancellation
+PROGRESS_INTERVAL = 0.5
+
+
+class JobError(ValueError):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# Kinds: each reads its parameters from request.args and returns the file
+# name, the columns and the (lazy) rows of its export
+
+def _sessions():
+    return (f'sessions_{date.today().isoformat()}', *exports.session_rows())
+
+
+def _advances():
+    return (f'advances_{date.today().isoformat()}', *exports.advance_rows())
+
+
+def _loans():
+    return (f'loans_{date.today().isoformat()}', *exports.loan_rows())
+
+
+def _payroll():
+    as_of = parse_date_arg('as_of') or date.today()
+
+    def rows():
+        # Computed once the rows are read, in the worker
+        yield from exports.payroll_rows(compute_payment_summary(as_of)['workers'])[1]
+
+    return f'payroll_{as_of.isoformat()}', exports.PAYROLL_COLUMNS, rows()
+
+
+def _payroll_run():
+    run_id = parse_int_arg('run_id')
+    run = db.session.get(PayrollRun, run_id) if run_id is not None else None
+    if run is None:
+        raise JobError('run_id must be the id of a payroll run')
+    return (f'payroll_run_{run.id}_{run.as_of.isoformat()}', *exports.payroll_run_rows(run.id))
+
+
+KINDS = {
+    'export_sessions': _sessions,
+    'export_advances': _advances,
+    'export_loans': _loans,
+    'export_payroll': _payroll,
+    'export_payroll_run': _payroll_run
+}
+
+
+def _set(job_id, statuses, **values):
+    """Set `values` on the job if its status is one of `statuses`; whether
+    it was. Runs in a transaction of its own, outside db.session."""
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            update(Job).where(Job.id == job_id, Job.status.in_(statuses)).values(**values)
+        )
+    return result.rowcount == 1
+
+
+def cancel(job_id):
+    """Cancel a queued or running job; False when it had already finished."""
+    return _set(job_id, ACTIVE, status='cancelled', finished_at=datetime.utcnow())
+
+
+def result_path(job_dir, job):
+    return os.path.join(job_dir, f'{job.id}{os.path.splitext(job.result_name)[1]}')
+
+
+class JobRunner:
+    """Queues jobs on the worker processes, started on first use."""
+
+    def __init__(self, app):
+        self._app = app
+        self._dir = app.config['JOB_DIR']
+        self._lock = threading.Lock()
+        self._pool = None
+        self._stats = {
+            'submitted': 0,
+            'active': 0,
+            'crashed': 0
+        }
+        app.extensions['job_runner'] = self
+
+    @property
+    def directory(self):
+        return self._dir
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def submit(self, kind, params):
+        """Check `params` the way the export route would, record the job and
+        queue it. Needs an app context; returns the Job."""
+        build = KINDS.get(kind)
+        if build is None:
+            raise JobError(f"kind must be one of: {', '.join(KINDS)}")
+        if not isinstance(params, dict):
+            raise JobError('params must be an object')
+
+        # A context of its own, so the current request's g and session are left alone
+        request_metrics = current_request()
+        with self._app.app_context(), self._app.test_request_context(query_string=params), counting_for(request_metrics):
+            exports.parse_format()
+            build()
+
+        self._expire()
+        job = Job(kind=kind, params=json.dumps(params))
+        db.session.add(job)
+        db.session.commit()
+
+        job_id = job.id
+        future = self._executor().submit(_run_job, job_id)
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['active'] += 1
+        future.add_done_callback(lambda future: self._finished(job_id, future))
+        return job
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                os.makedirs(self._dir, exist_ok=True)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._app.config['JOB_PROCESSES'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(dict(self._app.config),)
+                )
+            return self._pool
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            self._stats['active'] -= 1
+        if future.cancelled() or future.exception() is None:
+            return
+        # The worker died (or failed outside the job's own error handling)
+        error = future.exception()
+        with self._lock:
+            self._stats['crashed'] += 1
+            if isinstance(error, BrokenProcessPool):
+                self._pool = None
+        with self._app.app_context():
+            _set(job_id, ACTIVE, status='failed', error=str(error) or type(error).__name__,
+                 finished_at=datetime.utcnow())
+
+    def _expire(self):
+        cutoff = datetime.utcnow() - timedelta(hours=self._app.config['JOB_RETENTION_HOURS'])
+        expired = Job.query.filter(Job.finished_at < cutoff, Job.status.in_(FINISHED)).all()
+        for job in expired:
+            if job.result_name and os.path.exists(result_path(self._dir, job)):
+                os.remove(result_path(self._dir, job))
+            db.session.delete(job)
+
+    def recover(self):
+        """Fail the jobs a stopped server left queued or running, and remove
+        their partial files. Run at startup, inside an app context."""
+        interrupted = db.session.execute(
+            update(Job).where(Job.status.in_(ACTIVE)).values(
+                status='failed', error='Interrupted: the server stopped', finished_at=datetime.utcnow()
+            )
+        ).rowcount
+        db.session.commit()
+        for path in glob.glob(os.path.join(self._dir, '*.part')):
+            os.remove(path)
+        return interrupted
+
+    def stop(self):
+        """Cancel what is queued or running and let the workers exit."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        with self._app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(update(Job).where(Job.status.in_(ACTIVE)).values(
+                    status='cancelled', error='The server stopped', finished_at=datetime.utcnow()
+                ))
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Worker processes
+
+_worker_app = None
+
+
+def _init_worker(config):
+    global _worker_app
+    from app import create_app
+
+    _worker_app = create_app(type('JobConfig', (), config))
+
+
+class _Progress:
+    """Counts the rows going into the result; every PROGRESS_INTERVAL stores
+    the count and stops the job if it was cancelled."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.rows = 0
+        self._reported = time.monotonic()
+
+    def track(self, rows):
+        for row in rows:
+            yield row
+            self.rows += 1
+            if time.monotonic() - self._reported >= PROGRESS_INTERVAL:
+                if not _set(self.job_id, ('running',), progress=self.rows):
+                    raise JobCancelled()
+                self._reported = time.monotonic()
+
+
+def _run_job(job_id):
+    app = _worker_app
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        params = json.loads(job.params)
+        build = KINDS[job.kind]
+        db.session.remove()
+        # Cancelled while queued
+        if not _set(job_id, ('queued',), status='running', started_at=datetime.utcnow()):
+            return
+
+    job_dir = app.config['JOB_DIR']
+    partial = None
+    with app.test_request_context(query_string=params):
+        # The export queries go to the read-only pool, as on the export routes
+        g.setdefault(READ_ENGINE_KEY, app.extensions['read_pool'])
+        progress = _Progress(job_id)
+        try:
+            fmt = exports.parse_format()
+            name, columns, rows = build()
+            result_name = f'{name}.{fmt}'
+            partial = os.path.join(job_dir, f'{job_id}.{fmt}.part')
+            with open(partial, 'wb') as out:
+                for chunk in exports.export_chunks(name, columns, progress.track(rows), fmt):
+                    out.write(chunk)
+            path = os.path.join(job_dir, f'{job_id}.{fmt}')
+            os.replace(partial, path)
+            partial = path
+            if _set(job_id, ('running',), status='done', progress=progress.rows, result_name=result_name,
+                    result_size=os.path.getsize(path), finished_at=datetime.utcnow()):
+                partial = None
+        except JobCancelled:
+            pass
+        except Exception as e:
+            app.logger.exception(f'Job {job_id} failed')
+            _set(job_id, ('running',), status='failed', progress=progress.rows, error=str(e) or type(e).__name__,
+                 finished_at=datetime.utcnow())
+        finally:
+            # Whatever was written for a job that did not finish as done
+            if partial is not None and os.path.exists(partial):
+                os.remove(partial)
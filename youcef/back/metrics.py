@@ -0,0 +1,293 @@
+"""
+Per-route latency and SQL metrics
+Every request is timed and tagged with its route; engine events count the SQL
+statements it ran and the time spent in them, and the commit itself (WAL /
+journal write plus any wait for the SQLite write lock) is timed separately.
+GET /api/metrics renders everything in the Prometheus text format.
+
+The bookkeeping is a few perf_counter() calls and one short lock per request,
+cheap enough to leave on. Requests slower than SLOW_REQUEST_MS are logged,
+and so are requests over their route's query budget (see query_budget.py).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from query_budget import QueryBudgetExceeded, budget_of
+
+# Prometheus' default buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMIT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+STATEMENT_STARTS_KEY = 'metrics_statement_starts'
+
+
+class _Request:
+    __slots__ = ('started', 'status', 'statements', 'db_seconds', 'commit_started', 'commit_seconds', 'commits')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.status = 500
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.commit_started = None
+        self.commit_seconds = 0.0
+        self.commits = 0
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Per-bucket counts; render() accumulates them into Prometheus' le= form
+        position = bisect_left(self.buckets, value)
+        if position < len(self.counts):
+            self.counts[position] += 1
+        self.total += value
+        self.count += 1
+
+
+class _Route:
+    __slots__ = ('latency', 'commits', 'statuses', 'statements', 'db_seconds', 'over_budget')
+
+    def __init__(self):
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.commits = _Histogram(COMMIT_BUCKETS)
+        self.statuses = {}
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.over_budget = 0
+
+
+class Metrics:
+    def __init__(self, app):
+        self._lock = threading.Lock()
+        self._routes = {}  # (method, route) -> _Route
+        self._gauges = []  # (prefix, callable returning {name: number})
+        self.lock_errors = 0
+        self.slow_request_ms = app.config['SLOW_REQUEST_MS']
+        self.raise_over_budget = app.config['QUERY_BUDGET_MODE'] == 'raise'
+        # (method, full path, statements, budget) of recent overruns, for test runs
+        self.budget_overruns = deque(maxlen=1000)
+        self._app = app
+        self.started_at = time.time()
+        app.extensions['metrics'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        # Teardown runs after a streamed body is fully sent, so exports are timed whole
+        app.teardown_request(self._teardown_request)
+
+    def count_lock_error(self):
+        with self._lock:
+            self.lock_errors += 1
+
+    def add_gauges(self, prefix, collect):
+        """Expose `collect()`'s numeric values as `<prefix>_<name>` gauges."""
+        self._gauges.append((prefix, collect))
+
+    def _before_request(self):
+        g.request_metrics = _Request()
+
+    def _budget(self):
+        view = self._app.view_functions.get(request.endpoint)
+        return budget_of(view) if view is not None else None
+
+    def _after_request(self, response):
+        current = g.get('request_metrics')
+        if current is not None:
+            current.status = response.status_code
+            # Streamed bodies run their queries later; teardown still logs those
+            if self.raise_over_budget:
+                budget = self._budget()
+                if budget is not None and current.statements > budget:
+                    raise QueryBudgetExceeded(
+                        f'{request.method} {request.path} ran {current.statements} SQL statements, budget {budget}'
+                    )
+        return response
+
+    def _teardown_request(self, error):
+        current = g.pop('request_metrics', None)
+        if current is None:
+            return
+        elapsed = time.perf_counter() - current.started
+        # Unmatched URLs share one label so scanners cannot blow up the series count
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        key = (request.method, route)
+        budget = self._budget()
+        over_budget = budget is not None and current.statements > budget
+
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = _Route()
+            stats.latency.observe(elapsed)
+            stats.statuses[current.status] = stats.statuses.get(current.status, 0) + 1
+            stats.statements += current.statements
+            stats.db_seconds += current.db_seconds
+            if current.commits:
+                stats.commits.observe(current.commit_seconds)
+            if over_budget:
+                stats.over_budget += 1
+                self.budget_overruns.append((request.method, request.full_path, current.statements, budget))
+
+        if over_budget:
+            current_app.logger.warning(
+                f'Query budget exceeded: {request.method} {request.full_path} ran {current.statements} SQL statements, budget {budget}'
+            )
+
+        if elapsed * 1000 >= self.slow_request_ms:
+            current_app.logger.warning(
+                f'Slow request: {request.method} {request.full_path} {current.status} '
+                f'{elapsed * 1000:.0f} ms, {current.statements} statements, {current.db_seconds * 1000:.0f} ms in SQL'
+            )
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, labels, histogram_data):
+            cumulative = 0
+            for bound, count in zip(histogram_data.buckets, histogram_data.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram_data.count}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram_data.total:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram_data.count}')
+
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            header('http_requests_total', 'counter', 'Requests by route and status code.')
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'http_requests_total{{{_labels(method, route)},status="{status}"}} {count}')
+
+            header('http_request_duration_seconds', 'histogram', 'Request latency by route, including streamed bodies.')
+            for (method, route), stats in routes:
+                histogram('http_request_duration_seconds', _labels(method, route), stats.latency)
+
+            header('db_statements_total', 'counter', 'SQL statements executed by route.')
+            for (method, route), stats in routes:
+                lines.append(f'db_statements_total{{{_labels(method, route)}}} {stats.statements}')
+
+            header('db_statement_seconds_total', 'counter', 'Time spent executing SQL statements by route.')
+            for (method, route), stats in routes:
+                lines.append(f'db_statement_seconds_total{{{_labels(method, route)}}} {stats.db_seconds:.6f}')
+
+            header('db_commit_duration_seconds', 'histogram', 'Commit time per writing request, including SQLite lock waits.')
+            for (method, route), stats in routes:
+                if stats.commits.count:
+                    histogram('db_commit_duration_seconds', _labels(method, route), stats.commits)
+
+            header('query_budget_exceeded_total', 'counter', 'Requests that ran more SQL statements than their route allows.')
+            for (method, route), stats in routes:
+                if stats.over_budget:
+                    lines.append(f'query_budget_exceeded_total{{{_labels(method, route)}}} {stats.over_budget}')
+
+            header('db_lock_errors_total', 'counter', "Statements that failed with 'database is locked'.")
+            lines.append(f'db_lock_errors_total {self.lock_errors}')
+
+        header('process_start_time_seconds', 'gauge', 'Start time of the process since the epoch.')
+        lines.append(f'process_start_time_seconds {self.started_at:.0f}')
+
+        for prefix, collect in self._gauges:
+            for name, value in sorted(collect().items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'# TYPE {prefix}_{name} gauge')
+                    lines.append(f'{prefix}_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(method, route):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+def _current():
+    return g.get('request_metrics') if has_app_context() else None
+
+
+def current_request():
+    """The running request's counters, for work done on its behalf on
+    another thread (see counting_for)."""
+    return _current()
+
+
+@contextmanager
+def counting_for(request_metrics):
+    """Count the statements run inside towards `request_metrics`, a
+    current_request() from another thread. Needs an app context."""
+    g.request_metrics = request_metrics
+    try:
+        yield
+    finally:
+        g.pop('request_metrics', None)
+
+
+@contextmanager
+def not_counted():
+    """Run statements that are not the running request's own work (a cache
+    filled once per process) without counting them towards it."""
+    request_metrics = g.pop('request_metrics', None) if has_app_context() else None
+    try:
+        yield
+    finally:
+        if request_metrics is not None:
+            g.request_metrics = request_metrics
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(STATEMENT_STARTS_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info[STATEMENT_STARTS_KEY].pop()
+    current = _current()
+    if current is not None:
+        current.statements += 1
+        current.db_seconds += elapsed
+
+
+@event.listens_for(Engine, 'handle_error')
+def _statement_failed(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get(STATEMENT_STARTS_KEY):
+        connection.info[STATEMENT_STARTS_KEY].pop()
+    if 'database is locked' in str(exception_context.original_exception) and has_app_context():
+        metrics = current_app.extensions.get('metrics')
+        if metrics is not None:
+            metrics.count_lock_error()
+
+
+@event.listens_for(Engine, 'commit')
+def _commit_started(conn):
+    current = _current()
+    if current is not None:
+        current.commit_started = time.perf_counter()
+
+
+@event.listens_for(Session, 'after_commit')
+def _commit_finished(session):
+    current = _current()
+    if current is not None and current.commit_started is not None:
+        current.commit_seconds += time.perf_counter() - current.commit_started
+        current.commits += 1
+        current.commit_started = None
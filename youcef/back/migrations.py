@@ -0,0 +1,139 @@
+"""
+Versioned schema migrations
+db.create_all() only creates missing tables; it never changes tables that
+already exist. upgrade() creates missing tables and then applies, in order,
+every migration newer than the version recorded in schema_migrations, so an
+existing instance/factory.db is brought up to date in place.
+
+Migrations must be safe to re-run (IF NOT EXISTS etc.): SQLite runs DDL
+outside the implicit transaction, so a failed migration can be half applied.
+New migrations go at the end of MIGRATIONS with the next version number, and
+any index or table they add is also declared in models.py. A statement may
+also be a function, for data backfills that are easier written in Python.
+
+Usage: python migrations.py [status]
+"""
+import sys
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import text
+from models import db, SchemaMigration, PAYROLL_SNAPSHOT_TRIGGERS
+import cycle_hours
+import storage_profile
+
+Migration = namedtuple('Migration', ['version', 'description', 'statements'])
+
+
+def close_duplicate_open_sessions():
+    """Before the open-session index becomes unique: of the open sessions
+    a worker has on one day (racing swipes), keep the newest - the one the
+    clock index uses - and close the others with zero hours."""
+    closed = db.session.execute(text('''
+        UPDATE work_sessions SET clock_out = clock_in, hours_worked = 0
+        WHERE clock_out IS NULL AND EXISTS (
+            SELECT 1 FROM work_sessions AS newer
+            WHERE newer.worker_id = work_sessions.worker_id AND newer.date = work_sessions.date
+              AND newer.clock_out IS NULL
+              AND (newer.clock_in > work_sessions.clock_in
+                   OR (newer.clock_in = work_sessions.clock_in AND newer.id > work_sessions.id))
+        )
+    ''')).rowcount
+    if closed:
+        # Closed sessions count in the cycle totals
+        cycle_hours.rebuild()
+
+MIGRATIONS = [
+    Migration(1, 'Indexes for sessions, advances, loans and group membership', [
+        'CREATE INDEX IF NOT EXISTS ix_work_sessions_worker_date ON work_sessions (worker_id, date)',
+        'CREATE INDEX IF NOT EXISTS ix_work_sessions_date ON work_sessions (date)',
+        'CREATE INDEX IF NOT EXISTS ix_work_sessions_open ON work_sessions (worker_id, date) WHERE clock_out IS NULL',
+        'CREATE INDEX IF NOT EXISTS ix_advances_worker_paid ON advances (worker_id, is_paid_back)',
+        'CREATE INDEX IF NOT EXISTS ix_advances_unpaid ON advances (worker_id, amount) WHERE is_paid_back = 0',
+        'CREATE INDEX IF NOT EXISTS ix_loans_worker ON loans (worker_id, date_given)',
+        'CREATE INDEX IF NOT EXISTS ix_loan_payments_loan ON loan_payments (loan_id, payment_date)',
+        'CREATE INDEX IF NOT EXISTS ix_workers_group ON workers (group_id, is_active)',
+        'ANALYZE',
+    ]),
+    Migration(2, 'Indexes for keyset pagination and list filters', [
+        'CREATE INDEX IF NOT EXISTS ix_advances_date ON advances (date_given)',
+        'CREATE INDEX IF NOT EXISTS ix_advances_worker_date ON advances (worker_id, date_given)',
+        'CREATE INDEX IF NOT EXISTS ix_advances_paid_date ON advances (is_paid_back, date_given)',
+        'CREATE INDEX IF NOT EXISTS ix_loans_date ON loans (date_given)',
+        'CREATE INDEX IF NOT EXISTS ix_loans_paid_date ON loans (is_fully_paid, date_given)',
+        'ANALYZE',
+    ]),
+    # The table itself is created by db.create_all() from models.py
+    Migration(3, 'Backfill worker_cycle_hours from work sessions', [
+        cycle_hours.rebuild,
+    ]),
+    # db.create_all() makes the tables, indexes and (via models.py) triggers;
+    # re-stating the triggers here keeps them under version control too
+    Migration(4, 'Immutable payroll run snapshots', PAYROLL_SNAPSHOT_TRIGGERS),
+    # New databases already are; existing ones need one full VACUUM
+    Migration(5, 'Incremental auto-vacuum', [
+        storage_profile.enable_incremental_vacuum,
+    ]),
+    Migration(6, 'One open session per worker and day, enforced by a unique index', [
+        close_duplicate_open_sessions,
+        'DROP INDEX IF EXISTS ix_work_sessions_open',
+        'CREATE UNIQUE INDEX ix_work_sessions_open ON work_sessions (worker_id, date) WHERE clock_out IS NULL',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version():
+    if not db.inspect(db.engine).has_table(SchemaMigration.__tablename__):
+        return 0
+    version = db.session.query(db.func.max(SchemaMigration.version)).scalar()
+    return version or 0
+
+
+def pending_migrations():
+    version = current_version()
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def upgrade():
+    """Create missing tables and apply pending migrations. Must run inside an
+    app context. Returns the migrations that were applied."""
+    db.create_all()
+
+    applied = []
+    for migration in pending_migrations():
+        for statement in migration.statements:
+            if callable(statement):
+                statement()
+            else:
+                db.session.execute(text(statement))
+        db.session.add(SchemaMigration(
+            version=migration.version,
+            description=migration.description,
+            applied_at=datetime.utcnow()
+        ))
+        db.session.commit()
+        applied.append(migration)
+
+    return applied
+
+
+def main():
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        if sys.argv[1:] == ['status']:
+            print(f"📋 Schema version: {current_version()} (latest: {LATEST_VERSION})")
+            for migration in pending_migrations():
+                print(f"   ⏳ {migration.version}: {migration.description}")
+            return
+
+        applied = upgrade()
+        for migration in applied:
+            print(f"   ✅ {migration.version}: {migration.description}")
+        print(f"🎉 Database at schema version {current_version()}")
+
+
+if __name__ == '__main__':
+    main()
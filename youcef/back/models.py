@@ -1,7 +1,22 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from datetime import datetime, date
+import json
 
-db = SQLAlchemy()
+# Set by @read_pool.read_only for the length of a request
+READ_ENGINE_KEY = 'read_engine'
+
+class RoutingSession(Session):
+    """Queries of a request that put an engine in g.read_engine go to that
+    engine instead of the default one."""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            bind = g.get(READ_ENGINE_KEY)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Group(db.Model):
     __tablename__ = 'groups'
@@ -16,19 +31,25 @@ class Group(db.Model):
     workers = db.relationship('Worker', backref='group', lazy=True, foreign_keys='Worker.group_id')
     team_leader = db.relationship('Worker', foreign_keys=[team_leader_id], post_update=True)
     
+    # Filled in by list queries (see serializers.py) to avoid loading every worker
+    active_workers_count = db.query_expression()
+    
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'team_leader_id': self.team_leader_id,
             'team_leader_name': self.team_leader.name if self.team_leader else None,
-            'workers_count': len([w for w in self.workers if w.is_active]),
+            'workers_count': self.active_workers_count if self.active_workers_count is not None else len([w for w in self.workers if w.is_active]),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'is_active': self.is_active
         }
 
 class Worker(db.Model):
     __tablename__ = 'workers'
+    __table_args__ = (
+        db.Index('ix_workers_group', 'group_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.Text, unique=True, nullable=False)
@@ -67,6 +88,13 @@ class Worker(db.Model):
 
 class WorkSession(db.Model):
     __tablename__ = 'work_sessions'
+    __table_args__ = (
+        db.Index('ix_work_sessions_worker_date', 'worker_id', 'date'),
+        db.Index('ix_work_sessions_date', 'date'),
+        # Open sessions only: the clock-in/clock-out lookup, and the rule
+        # that a worker has at most one open session per day
+        db.Index('ix_work_sessions_open', 'worker_id', 'date', unique=True, sqlite_where=db.text('clock_out IS NULL')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     worker_id = db.Column(db.Integer, db.ForeignKey('workers.id'), nullable=False)
@@ -86,8 +114,26 @@ class WorkSession(db.Model):
             'date': self.date.isoformat() if self.date else None
         }
 
+# Closed-session hours per worker and pay cycle, kept in step with
+# work_sessions by cycle_hours.py so payroll never re-sums sessions
+class WorkerCycleHours(db.Model):
+    __tablename__ = 'worker_cycle_hours'
+    
+    worker_id = db.Column(db.Integer, db.ForeignKey('workers.id'), primary_key=True)
+    cycle_start = db.Column(db.Date, primary_key=True)
+    hours_worked = db.Column(db.Float, nullable=False, default=0)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+
 class Advance(db.Model):
     __tablename__ = 'advances'
+    __table_args__ = (
+        db.Index('ix_advances_worker_paid', 'worker_id', 'is_paid_back'),
+        db.Index('ix_advances_date', 'date_given'),
+        db.Index('ix_advances_worker_date', 'worker_id', 'date_given'),
+        db.Index('ix_advances_paid_date', 'is_paid_back', 'date_given'),
+        # Unpaid advances only: the payroll deduction lookup
+        db.Index('ix_advances_unpaid', 'worker_id', 'amount', sqlite_where=db.text('is_paid_back = 0')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     worker_id = db.Column(db.Integer, db.ForeignKey('workers.id'), nullable=False)
@@ -109,6 +155,11 @@ class Advance(db.Model):
 
 class Loan(db.Model):
     __tablename__ = 'loans'
+    __table_args__ = (
+        db.Index('ix_loans_worker', 'worker_id', 'date_given'),
+        db.Index('ix_loans_date', 'date_given'),
+        db.Index('ix_loans_paid_date', 'is_fully_paid', 'date_given'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     worker_id = db.Column(db.Integer, db.ForeignKey('workers.id'), nullable=False)
@@ -123,6 +174,9 @@ class Loan(db.Model):
     # Relationships
     payments = db.relationship('LoanPayment', backref='loan', lazy=True, cascade='all, delete-orphan')
     
+    # Filled in by list queries (see serializers.py) to avoid loading every payment
+    payment_count = db.query_expression()
+    
     def __init__(self, **kwargs):
         # Set remaining_balance equal to total_amount when creating
         if 'total_amount' in kwargs:
@@ -141,11 +195,14 @@ class Loan(db.Model):
             'date_given': self.date_given.isoformat() if self.date_given else None,
             'is_fully_paid': self.is_fully_paid,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'payments_count': len(self.payments) if self.payments else 0
+            'payments_count': self.payment_count if self.payment_count is not None else len(self.payments)
         }
 
 class LoanPayment(db.Model):
     __tablename__ = 'loan_payments'
+    __table_args__ = (
+        db.Index('ix_loan_payments_loan', 'loan_id', 'payment_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     loan_id = db.Column(db.Integer, db.ForeignKey('loans.id'), nullable=False)
@@ -163,3 +220,139 @@ class LoanPayment(db.Model):
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+# Closed payroll runs: one row per run and one frozen row per worker paid in it.
+# Figures are copied, not referenced, so later edits to workers, sessions or
+# advances never change what a past run says was paid.
+class PayrollRun(db.Model):
+    __tablename__ = 'payroll_runs'
+    __table_args__ = (
+        db.Index('ix_payroll_runs_as_of', 'as_of'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    as_of = db.Column(db.Date, nullable=False)
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    notes = db.Column(db.Text)
+    worker_count = db.Column(db.Integer, nullable=False)
+    total_earned_payroll = db.Column(db.Float, nullable=False)
+    total_advances_given = db.Column(db.Float, nullable=False)
+    total_final_payments = db.Column(db.Float, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'as_of': self.as_of.isoformat() if self.as_of else None,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'notes': self.notes,
+            'worker_count': self.worker_count,
+            'totals': {
+                'total_earned_payroll': self.total_earned_payroll,
+                'total_advances_given': self.total_advances_given,
+                'total_final_payments': self.total_final_payments
+            }
+        }
+
+class PayrollRunEntry(db.Model):
+    __tablename__ = 'payroll_run_entries'
+    __table_args__ = (
+        db.Index('ix_payroll_run_entries_run', 'run_id', 'worker_id'),
+        # A worker is paid at most once per cycle; also the history lookup
+        db.Index('ix_payroll_run_entries_worker_cycle', 'worker_id', 'cycle_start', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('payroll_runs.id'), nullable=False)
+    # No foreign key: the snapshot outlives a deleted worker
+    worker_id = db.Column(db.Integer, nullable=False)
+    worker_code = db.Column(db.Text, nullable=False)
+    worker_name = db.Column(db.Text, nullable=False)
+    cycle_start = db.Column(db.Date, nullable=False)
+    cycle_end = db.Column(db.Date, nullable=False)
+    hours_worked = db.Column(db.Float, nullable=False)
+    required_hours = db.Column(db.Float, nullable=False)
+    monthly_salary = db.Column(db.Float, nullable=False)
+    advances_taken = db.Column(db.Float, nullable=False)
+    unpaid_advances_count = db.Column(db.Integer, nullable=False)
+    final_payment = db.Column(db.Float, nullable=False)
+    remaining_debt = db.Column(db.Float, nullable=False)
+    payment_status = db.Column(db.Text, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'run_id': self.run_id,
+            'worker_id': self.worker_id,
+            'worker_code': self.worker_code,
+            'worker_name': self.worker_name,
+            'cycle_start': self.cycle_start.isoformat() if self.cycle_start else None,
+            'cycle_end': self.cycle_end.isoformat() if self.cycle_end else None,
+            'hours_worked': self.hours_worked,
+            'required_hours': self.required_hours,
+            'monthly_salary': self.monthly_salary,
+            'advances_taken': self.advances_taken,
+            'unpaid_advances_count': self.unpaid_advances_count,
+            'final_payment': self.final_payment,
+            'remaining_debt': self.remaining_debt,
+            'payment_status': self.payment_status
+        }
+
+# SQLite refuses any UPDATE or DELETE on closed runs
+def _immutable_triggers(table):
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_immutable_{action.lower()} BEFORE {action} ON {table} "
+        f"BEGIN SELECT RAISE(ABORT, 'Closed payroll runs cannot be changed'); END"
+        for action in ('UPDATE', 'DELETE')
+    ]
+
+PAYROLL_SNAPSHOT_TRIGGERS = []
+for _table in (PayrollRun.__table__, PayrollRunEntry.__table__):
+    for _trigger in _immutable_triggers(_table.name):
+        db.event.listen(_table, 'after_create', db.DDL(_trigger))
+        PAYROLL_SNAPSHOT_TRIGGERS.append(_trigger)
+
+class Job(db.Model):
+    """A background report (see jobs.py): its parameters, where it stands,
+    and the file it produced."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_created', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.Text, nullable=False)
+    # JSON object: the query string of the matching export
+    params = db.Column(db.Text, nullable=False, default='{}')
+    # queued, running, done, failed or cancelled
+    status = db.Column(db.Text, nullable=False, default='queued')
+    # Rows written to the result so far
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    result_name = db.Column(db.Text)
+    result_size = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': json.loads(self.params),
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'result_name': self.result_name,
+            'result_size': self.result_size,
+            'result_url': f'/api/jobs/{self.id}/result' if self.status == 'done' else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.Text, nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,153 @@
+"""
+Keyset pagination and server-side filters for the list endpoints
+Pages are requested with ?limit=N and continued with ?after=<cursor>, where the
+cursor is the X-Next-Cursor header of the previous page. The cursor encodes
+the sort key of the last row returned, so each page is an index range scan
+from that key instead of an OFFSET that gets slower the deeper you go.
+
+Response bodies stay plain JSON arrays, so callers that send no limit get the
+same full list as before.
+"""
+import base64
+import json
+from datetime import date, datetime
+from flask import current_app, jsonify, request
+from sqlalchemy import Date, DateTime, literal, select, tuple_
+from models import Worker
+
+
+class ListQueryError(ValueError):
+    pass
+
+
+# Query string parsing
+
+def parse_int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ListQueryError(f'{name} must be an integer')
+
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ListQueryError(f'Invalid {name} format. Use YYYY-MM-DD')
+
+
+def parse_bool_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ListQueryError(f'{name} must be true or false')
+
+
+def parse_limit(default=None):
+    limit = parse_int_arg('limit')
+    if limit is None:
+        return default
+    if limit < 1 or limit > current_app.config['MAX_PAGE_SIZE']:
+        raise ListQueryError(f"limit must be between 1 and {current_app.config['MAX_PAGE_SIZE']}")
+    return limit
+
+
+# Filters
+
+def apply_filters(query, worker_column=None, date_column=None, paid_column=None, group_column=None):
+    """Apply the worker_id, group_id, date_from, date_to and paid filters
+    that make sense for the listed model."""
+    worker_id = parse_int_arg('worker_id')
+    if worker_id is not None and worker_column is not None:
+        query = query.filter(worker_column == worker_id)
+
+    group_id = parse_int_arg('group_id')
+    if group_id is not None:
+        if group_column is not None:
+            query = query.filter(group_column == group_id)
+        elif worker_column is not None:
+            group_workers = select(Worker.id).where(Worker.group_id == group_id)
+            query = query.filter(worker_column.in_(group_workers))
+
+    if date_column is not None:
+        date_from = parse_date_arg('date_from')
+        if date_from:
+            query = query.filter(date_column >= date_from)
+        date_to = parse_date_arg('date_to')
+        if date_to:
+            query = query.filter(date_column <= date_to)
+
+    paid = parse_bool_arg('paid')
+    if paid is not None and paid_column is not None:
+        query = query.filter(paid_column == paid)
+
+    return query
+
+
+# Cursors
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, date) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_value(column, value):
+    # Dates and datetimes went into the cursor as ISO strings
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def decode_cursor(cursor, columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise ListQueryError('Invalid cursor')
+
+
+def keyset_list(query, serializer, keys, descending=True, default_limit=None):
+    """Serialize one page of `query` as a JSON array response.
+
+    `keys` is the sort key, ending with the primary key so it is unique.
+    All keys sort in the same direction so the cursor comparison is a
+    single row-value comparison SQLite can answer from an index.
+    """
+    limit = parse_limit(default_limit)
+    after = request.args.get('after')
+
+    if after:
+        values = decode_cursor(after, keys)
+        bound = tuple_(*[literal(value, column.type) for column, value in zip(keys, values)])
+        query = query.filter(tuple_(*keys) < bound if descending else tuple_(*keys) > bound)
+
+    query = query.order_by(*[key.desc() if descending else key.asc() for key in keys])
+    if limit:
+        query = query.limit(limit + 1)
+
+    rows = query.options(*serializer.options()).all()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], key.key) for key in keys])
+
+    response = jsonify([row.to_dict() for row in rows])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,182 @@
+"""
+Payroll computation engine
+Builds the /api/payments/summary payload for every active worker with a fixed
+number of grouped SQL queries, whatever the headcount
+"""
+from calendar import monthrange
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import Integer, case, cast, func
+from models import db, Worker, Advance, WorkerCycleHours
+import serializers
+
+REQUIRED_HOURS = 160
+
+SYSTEM_INFO = {
+    'required_hours_per_month': REQUIRED_HOURS,
+    'payment_formula': 'Fixed monthly salary (hours tracked for attendance only)',
+    'cycle_calculation': 'Based on individual hire dates (e.g., 15th to 15th)',
+    'advance_policy': 'Advances deducted from monthly salary',
+    'attendance_tracking': 'Clock in/out maintained for monitoring purposes'
+}
+
+
+def _cycle_start_in(year, month, hire_day):
+    # Hire days past the end of a short month start that month's cycle on its last day
+    return date(year, month, min(hire_day, monthrange(year, month)[1]))
+
+
+# Calculate worker's current monthly cycle based on hire date
+def get_current_cycle_dates(hire_date, today=None):
+    today = today or date.today()
+    hire_day = hire_date.day
+
+    # Calculate current cycle start date
+    cycle_start = _cycle_start_in(today.year, today.month, hire_day)
+    if today < cycle_start:
+        # Previous month cycle
+        prev_month = today - relativedelta(months=1)
+        cycle_start = _cycle_start_in(prev_month.year, prev_month.month, hire_day)
+
+    # Calculate cycle end date (day before next cycle)
+    next_month = cycle_start + relativedelta(months=1)
+    cycle_end = _cycle_start_in(next_month.year, next_month.month, hire_day) - relativedelta(days=1)
+
+    return cycle_start, cycle_end
+
+
+def _hire_day_column():
+    # hire_date is stored as ISO text in SQLite
+    return cast(func.strftime('%d', Worker.hire_date), Integer)
+
+
+def cycle_hours_by_worker(cycles):
+    """Total hours per active worker inside their current cycle (one query).
+
+    Reads the worker_cycle_hours aggregate (see cycle_hours.py): one primary
+    key lookup per worker, however many sessions they have. `cycles` maps
+    hire day -> (cycle_start, cycle_end); workers sharing a hire day share a
+    cycle, so the start is a CASE over at most 31 hire days.
+    """
+    if not cycles:
+        return {}
+
+    cycle_start = case({day: start for day, (start, end) in cycles.items()}, value=_hire_day_column())
+
+    rows = db.session.query(
+        WorkerCycleHours.worker_id,
+        WorkerCycleHours.hours_worked
+    ).join(
+        Worker, Worker.id == WorkerCycleHours.worker_id
+    ).filter(
+        Worker.is_active == True,
+        WorkerCycleHours.cycle_start == cycle_start
+    ).all()
+
+    return {worker_id: hours or 0 for worker_id, hours in rows}
+
+
+def unpaid_advances_by_worker():
+    """(total amount, count) of unpaid advances per worker (one query)."""
+    rows = db.session.query(
+        Advance.worker_id,
+        func.sum(Advance.amount),
+        func.count(Advance.id)
+    ).filter(
+        Advance.is_paid_back == False
+    ).group_by(Advance.worker_id).all()
+
+    return {worker_id: (total or 0, count) for worker_id, total, count in rows}
+
+
+def build_worker_summary(worker, cycle_start, cycle_end, total_hours, total_advances, advances_count, today=None):
+    today = today or date.today()
+
+    # Fixed monthly salary calculation (attendance tracked but not affecting pay)
+    required_hours = REQUIRED_HOURS  # Still tracked for attendance monitoring
+    earned_salary = worker.salary  # Always full salary regardless of hours
+    completion_percentage = round((total_hours / required_hours) * 100, 1) if required_hours > 0 else 100
+
+    # Calculate final payment
+    final_payment = max(0, earned_salary - total_advances)
+    remaining_debt = max(0, total_advances - earned_salary)
+
+    # Determine payment status (based on advances only, not hours)
+    if total_advances == 0:
+        payment_status = "full_salary_no_advances"
+    elif total_advances <= earned_salary:
+        payment_status = "full_salary_with_advances"
+    else:
+        payment_status = "full_salary_excess_advances"
+
+    return {
+        'worker': worker.to_dict(),
+        'cycle_info': {
+            'cycle_start': cycle_start.isoformat(),
+            'cycle_end': cycle_end.isoformat(),
+            'days_remaining': (cycle_end - today).days
+        },
+        'work_progress': {
+            'hours_worked': round(total_hours, 2),
+            'required_hours': required_hours,
+            'hours_remaining': max(0, required_hours - total_hours),
+            'completion_percentage': completion_percentage
+        },
+        'salary_calculation': {
+            'monthly_salary': worker.salary,
+            'earned_salary': round(earned_salary, 2),
+            'advances_taken': round(total_advances, 2),
+            'final_payment': round(final_payment, 2),
+            'remaining_debt': round(remaining_debt, 2)
+        },
+        'payment_status': payment_status,
+        'unpaid_advances_count': advances_count
+    }
+
+
+def compute_payment_summary(today=None):
+    """Payroll summary for all active workers in three queries:
+    workers (with their group), cycle hours, unpaid advances."""
+    today = today or date.today()
+
+    workers = serializers.workers.query().filter_by(is_active=True).all()
+
+    worker_cycles = {}
+    cycles = {}
+    for worker in workers:
+        cycle = get_current_cycle_dates(worker.hire_date, today)
+        worker_cycles[worker.id] = cycle
+        cycles[worker.hire_date.day] = cycle
+
+    hours = cycle_hours_by_worker(cycles)
+    advances = unpaid_advances_by_worker()
+
+    summary = []
+    total_earned_payroll = 0
+    total_advances_given = 0
+    total_final_payments = 0
+
+    for worker in workers:
+        cycle_start, cycle_end = worker_cycles[worker.id]
+        total_advances, advances_count = advances.get(worker.id, (0, 0))
+
+        worker_summary = build_worker_summary(
+            worker, cycle_start, cycle_end,
+            hours.get(worker.id, 0), total_advances, advances_count, today
+        )
+
+        summary.append(worker_summary)
+        total_earned_payroll += worker.salary
+        total_advances_given += total_advances
+        total_final_payments += max(0, worker.salary - total_advances)
+
+    return {
+        'workers': summary,
+        'totals': {
+            'total_earned_payroll': round(total_earned_payroll, 2),
+            'total_advances_given': round(total_advances_given, 2),
+            'total_final_payments': round(total_final_payments, 2),
+            'total_workers': len(summary)
+        },
+        'system_info': SYSTEM_INFO
+    }
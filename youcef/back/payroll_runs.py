@@ -0,0 +1,98 @@
+"""
+Closing payroll runs
+close_payroll_run() freezes the payment summary for each active worker's
+cycle into payroll_runs / payroll_run_entries. Those rows are never updated
+(triggers in models.py reject it), so a past month reads back exactly as it
+was paid, through the run_id and (worker_id, cycle_start) indexes, however
+much history has accumulated since.
+"""
+from datetime import date, datetime
+from sqlalchemy import insert, tuple_
+from models import db, PayrollRun, PayrollRunEntry
+from payroll import compute_payment_summary, get_current_cycle_dates
+
+
+class PayrollRunError(ValueError):
+    pass
+
+
+def snapshot_row(summary):
+    """The payroll_run_entries columns for one worker of a payment summary."""
+    worker = summary['worker']
+    cycle = summary['cycle_info']
+    progress = summary['work_progress']
+    salary = summary['salary_calculation']
+    return {
+        'worker_id': worker['id'],
+        'worker_code': worker['code'],
+        'worker_name': worker['name'],
+        'cycle_start': date.fromisoformat(cycle['cycle_start']),
+        'cycle_end': date.fromisoformat(cycle['cycle_end']),
+        'hours_worked': progress['hours_worked'],
+        'required_hours': progress['required_hours'],
+        'monthly_salary': salary['monthly_salary'],
+        'advances_taken': salary['advances_taken'],
+        'unpaid_advances_count': summary['unpaid_advances_count'],
+        'final_payment': salary['final_payment'],
+        'remaining_debt': salary['remaining_debt'],
+        'payment_status': summary['payment_status']
+    }
+
+
+def close_payroll_run(as_of=None, notes=None, today=None):
+    """Snapshot the payment summary as of `as_of` (default today) for every
+    active worker whose cycle is not closed yet. Commits and returns
+    (run, entry count, number of workers skipped as already closed).
+
+    Salaries, unpaid advances and who is active are only known as they are
+    now, so `as_of` must fall inside every active worker's current cycle: a
+    snapshot of an earlier cycle would mix it with today's figures, and the
+    entries can never be corrected. `today` replays a close made on an
+    earlier day (synthetic_data.py builds its history that way)."""
+    today = today or date.today()
+    as_of = as_of or today
+    if as_of > today:
+        raise PayrollRunError('Cannot close a payroll run in the future')
+
+    summaries = compute_payment_summary(as_of)['workers']
+
+    if as_of < today:
+        current_starts = [
+            get_current_cycle_dates(date.fromisoformat(s['worker']['hire_date']), today)[0] for s in summaries
+        ]
+        if current_starts and as_of < max(current_starts):
+            raise PayrollRunError(
+                f'as_of must be within the current cycle of every active worker (on or after {max(current_starts).isoformat()})'
+            )
+
+    keys = [(s['worker']['id'], date.fromisoformat(s['cycle_info']['cycle_start'])) for s in summaries]
+    closed = set()
+    if keys:
+        closed = set(db.session.query(PayrollRunEntry.worker_id, PayrollRunEntry.cycle_start).filter(
+            tuple_(PayrollRunEntry.worker_id, PayrollRunEntry.cycle_start).in_(keys)
+        ).all())
+
+    to_close = [summary for summary, key in zip(summaries, keys) if key not in closed]
+    if not to_close:
+        raise PayrollRunError('Payroll is already closed for every active worker in this cycle')
+
+    run = PayrollRun(
+        as_of=as_of,
+        closed_at=datetime.utcnow(),
+        notes=notes,
+        worker_count=len(to_close),
+        total_earned_payroll=round(sum(s['salary_calculation']['monthly_salary'] for s in to_close), 2),
+        total_advances_given=round(sum(s['salary_calculation']['advances_taken'] for s in to_close), 2),
+        total_final_payments=round(sum(s['salary_calculation']['final_payment'] for s in to_close), 2)
+    )
+
+    try:
+        db.session.add(run)
+        db.session.flush()
+        db.session.execute(insert(PayrollRunEntry), [dict(snapshot_row(summary), run_id=run.id) for summary in to_close])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return run, len(to_close), len(closed)
@@ -0,0 +1,30 @@
+"""
+Query-count budgets
+@query_budget(n) declares the most SQL statements one request to a route may
+run, streamed bodies included. Budgets are fixed numbers, so a route that
+starts loading rows one query each goes over its budget as soon as it has
+more rows than that - the N+1 regression this exists to catch.
+
+metrics.py counts the statements and checks the budget when the request
+ends. Over budget it logs a warning and counts the route in
+query_budget_exceeded_total; with QUERY_BUDGET_MODE = 'raise' the request
+fails instead (for development). bench_endpoints.py --check-budgets runs every
+route on datasets of increasing size and fails on any overrun.
+"""
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(statements):
+    """Declare the statement budget of a view. functools.wraps carries the
+    attribute through the other route decorators."""
+    def decorator(view):
+        view.query_budget = statements
+        return view
+    return decorator
+
+
+def budget_of(view):
+    return getattr(view, 'query_budget', None)
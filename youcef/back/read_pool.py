@@ -0,0 +1,35 @@
+"""
+Read-only connection pool for reports
+Payroll summaries, the full session/advance/loan lists, payroll history and
+the exports can keep a connection busy for a long time. Views decorated with
+@read_only run their queries on a pool of their own: REPORT_POOL_SIZE
+connections to the same file, opened with PRAGMA query_only. A burst of
+reports queues for those instead of taking the connections the clock-in and
+other write routes need, and a report that tries to write fails instead.
+
+The reports read the live database rather than a copy: in WAL mode a reader
+sees the last commit and neither blocks the writer nor waits for it.
+"""
+from functools import wraps
+from flask import current_app, g
+from sqlalchemy import create_engine
+from models import db, READ_ENGINE_KEY
+import storage_profile
+
+
+def init_app(app):
+    with app.app_context():
+        url = db.engine.url
+    engine = create_engine(url, pool_size=app.config['REPORT_POOL_SIZE'], max_overflow=0)
+    storage_profile.apply_pragmas(engine, {**app.config['SQLITE_PRAGMAS'], 'query_only': 'ON'})
+    app.extensions['read_pool'] = engine
+    return engine
+
+
+def read_only(view):
+    """Run the view, and the streamed body it returns, on the read pool."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.setdefault(READ_ENGINE_KEY, current_app.extensions['read_pool'])
+        return view(*args, **kwargs)
+    return wrapper
@@ -5,6 +5,7 @@ Deletes old database and creates new one with loan tables
 import os
 from app import create_app
 from models import db
+import migrations
 
 def reset_database():
     print("🗑️ Deleting old database...")
@@ -17,16 +18,18 @@ def reset_database():
     ]
     
     for db_file in db_files:
-        if os.path.exists(db_file):
-            os.remove(db_file)
-            print(f"   ✅ Deleted {db_file}")
+        # With the WAL journal the last commits may still be in the -wal file
+        for path in (db_file, db_file + "-wal", db_file + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"   ✅ Deleted {path}")
     
     print("\n🏗️ Creating fresh database with loan system...")
     
     # Create fresh database
     app = create_app()
     with app.app_context():
-        db.create_all()
+        migrations.upgrade()
         print("   ✅ All tables created successfully!")
         
         # Verify tables exist
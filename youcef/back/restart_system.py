@@ -13,10 +13,11 @@ def main():
     try:
         from app import create_app
         from models import db, Loan, LoanPayment
+        import migrations
         
         app = create_app()
         with app.app_context():
-            db.create_all()
+            migrations.upgrade()
             print("✅ Database tables created successfully!")
             
             # Test loan creation
@@ -29,10 +30,9 @@ def main():
         print(f"❌ Database error: {e}")
         return
     
-    print("\n🚀 Now start the servers:")
-    print("   Backend:  python app.py")
-    print("   Frontend: python -m http.server 8080 (in front folder)")
-    print("   Browser:  http://localhost:8080")
+    print("\n🚀 Now start the server:")
+    print("   Backend:  python app.py (also serves the frontend)")
+    print("   Browser:  http://127.0.0.1:5000")
 
 if __name__ == "__main__":
     main()
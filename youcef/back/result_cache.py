@@ -0,0 +1,108 @@
+"""
+Response cache for expensive read endpoints
+Keeps the serialized responses of decorated GET routes in a bounded LRU. Each
+entry remembers the change-tracker versions of the tables it was built from;
+when a write commits, the tracker reports the tables it touched and every
+entry that read one of them is dropped, so a cached response is never older
+than the last committed write that could change it.
+
+Concurrent misses for the same response at the same table versions are
+coalesced: one request runs the view, the others wait and reuse its result
+instead of repeating the same queries (see single_flight.py).
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from flask import current_app, request
+from single_flight import SingleFlight
+
+
+class ResultCache:
+    def __init__(self, tracker, max_entries):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (tables, versions, status, headers, body)
+        self._tracker = tracker
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._flights = SingleFlight()
+        tracker.add_listener(self.invalidate)
+
+    def invalidate(self, tables):
+        """Drop every entry built from one of `tables`."""
+        tables = set(tables)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if tables.intersection(entry[0])]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'computed': self._flights.leaders,
+                'coalesced': self._flights.shared
+            }
+
+    def _get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _render(self, key, tables, versions, view, args, kwargs):
+        response = current_app.make_response(view(*args, **kwargs))
+        headers = [(name, value) for name, value in response.headers if name != 'Content-Length']
+        entry = (tables, versions, response.status_code, headers, response.get_data())
+        if response.status_code == 200:
+            self._put(key, entry)
+        return entry
+
+    def cached(self, *tables):
+        """Serve the view's 200 responses from the cache until one of
+        `tables` changes."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Today's date keys responses that depend on the current pay cycle
+                key = (request.full_path, date.today())
+                # Read before running the view: a write landing mid-request
+                # leaves the entry tagged with the old versions, i.e. stale
+                versions = self._tracker.versions(tables)
+
+                entry = self._get(key, versions)
+                if entry is None:
+                    # Identical requests arriving meanwhile wait for this one
+                    entry, _ = self._flights.do((key, versions), lambda: self._render(key, tables, versions, view, args, kwargs))
+
+                _, _, status, headers, body = entry
+                return current_app.response_class(body, status=status, headers=headers)
+            return wrapper
+        return decorator
@@ -0,0 +1,53 @@
+"""
+Serialization layer for the list endpoints
+Each serializer declares the relations and aggregates its model's to_dict()
+reads, and loads them up front (joined eager loads and correlated count
+subqueries) so serializing N rows costs the same number of queries for any N.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, with_expression
+from models import Group, Worker, WorkSession, Advance, Loan, LoanPayment, PayrollRun, PayrollRunEntry, Job
+
+
+class Serializer:
+    def __init__(self, model, relations=(), aggregates=None):
+        self.model = model
+        self.relations = relations
+        # attribute name -> callable building the scalar subquery
+        self.aggregates = aggregates or {}
+
+    def options(self):
+        opts = [joinedload(getattr(self.model, name)) for name in self.relations]
+        for name, expression in self.aggregates.items():
+            opts.append(with_expression(getattr(self.model, name), expression()))
+        return opts
+
+    def query(self):
+        """Model query with everything to_dict() needs already attached."""
+        return self.model.query.options(*self.options())
+
+    def dump(self, query):
+        return [row.to_dict() for row in query.options(*self.options())]
+
+
+def _active_workers_count():
+    return select(func.count(Worker.id)).where(
+        Worker.group_id == Group.id,
+        Worker.is_active == True
+    ).correlate_except(Worker).scalar_subquery()
+
+
+def _loan_payment_count():
+    return select(func.count(LoanPayment.id)).where(
+        LoanPayment.loan_id == Loan.id
+    ).correlate_except(LoanPayment).scalar_subquery()
+
+
+groups = Serializer(Group, relations=('team_leader',), aggregates={'active_workers_count': _active_workers_count})
+workers = Serializer(Worker, relations=('group',))
+sessions = Serializer(WorkSession, relations=('worker',))
+advances = Serializer(Advance, relations=('worker',))
+loans = Serializer(Loan, relations=('worker',), aggregates={'payment_count': _loan_payment_count})
+payroll_runs = Serializer(PayrollRun)
+payroll_entries = Serializer(PayrollRunEntry)
+jobs = Serializer(Job)
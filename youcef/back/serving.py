@@ -0,0 +1,280 @@
+"""
+Production server
+python app.py serves the API from SERVER_THREADS worker threads in this one
+process, with HTTP/1.1 keep-alive, read/write timeouts and a graceful stop:
+on SIGINT/SIGTERM (or, with --watch-stdin, when the parent closes our stdin)
+it stops accepting, lets in-flight requests finish for up to
+SERVER_SHUTDOWN_TIMEOUT seconds and returns.
+
+Threads rather than processes: the clock index, response cache, in-flight
+coalescing and event hub live in this process's memory, and SQLite has one
+writer at a time anyway. Each thread borrows its own connection from the
+SQLAlchemy pool for the length of a request.
+
+python app.py --dev still runs Flask's debug reloader.
+"""
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from werkzeug.exceptions import InternalServerError
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import LimitedStream
+
+_BUSY_RESPONSE = (
+    b'HTTP/1.1 503 Service Unavailable\r\n'
+    b'Content-Type: application/json\r\n'
+    b'Content-Length: 28\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+    b'{"error": "Server is busy"}\n'
+)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """Werkzeug's handler, except that responses keep the connection open:
+    unread request bodies are drained and unsized responses are chunked."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def handle_one_request(self):
+        server = self.server
+        # Between requests: wait for the next one with the shorter keep-alive
+        # timeout, where a shutdown can close the connection
+        if not server.connection_idle(self.connection):
+            self.close_connection = True
+            return
+        try:
+            self.connection.settimeout(server.keepalive_timeout)
+            waiting = self.rfile.peek(1)
+        except (OSError, ValueError):
+            waiting = b''
+        finally:
+            server.connection_busy(self.connection)
+        if not waiting:
+            self.close_connection = True
+            return
+
+        self.connection.settimeout(server.request_timeout)
+        super().handle_one_request()
+
+    def run_wsgi(self):
+        if self.headers.get('Expect', '').lower().strip(' \t') == '100-continue':
+            self.wfile.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        self.environ = environ = self.make_environ()
+        body = None
+        if environ.get('wsgi.input_terminated'):
+            # Chunked request body: its end is only known once read
+            self.close_connection = True
+        else:
+            length = environ.get('CONTENT_LENGTH') or ''
+            body = LimitedStream(self.rfile, int(length) if length.isdigit() else 0)
+            environ['wsgi.input'] = body
+            environ['wsgi.input_terminated'] = True
+
+        self._status = self._headers = None
+        self._headers_sent = False
+        self._chunked = False
+        try:
+            self._execute(self.server.app)
+            if body is not None:
+                body.exhaust()
+        except (ConnectionError, socket.timeout) as e:
+            self.close_connection = True
+            self.connection_dropped(e, environ)
+        except Exception:
+            if self.server.passthrough_errors:
+                raise
+            self.close_connection = True
+            if not self._headers_sent:
+                self._status = self._headers = None
+                try:
+                    self._execute(InternalServerError())
+                except Exception:
+                    pass
+            self.server.log('error', f'Error on request:\n{traceback.format_exc()}')
+
+    def _execute(self, app):
+        response = app(self.environ, self._start_response)
+        try:
+            for data in response:
+                self._write(data)
+            if not self._headers_sent:
+                self._write(b'')
+            if self._chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+    def _start_response(self, status, headers, exc_info=None):
+        if exc_info:
+            try:
+                if self._headers_sent:
+                    raise exc_info[1].with_traceback(exc_info[2])
+            finally:
+                exc_info = None
+        elif self._headers is not None:
+            raise AssertionError('Headers already set')
+        self._status = status
+        self._headers = headers
+        return self._write
+
+    def _send_headers(self):
+        code, _, message = self._status.partition(' ')
+        code = int(code)
+        self.send_response(code, message)
+        names = set()
+        for name, value in self._headers:
+            self.send_header(name, value)
+            names.add(name.lower())
+
+        self._bodyless = self.command == 'HEAD' or code < 200 or code in (204, 304)
+        if 'content-length' not in names and not self._bodyless:
+            if self.request_version >= 'HTTP/1.1':
+                self._chunked = True
+                self.send_header('Transfer-Encoding', 'chunked')
+            else:
+                # HTTP/1.0: the end of the body is the end of the connection
+                self.close_connection = True
+        if self.close_connection or self.server.draining:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self._headers_sent = True
+
+    def _write(self, data):
+        if not self._headers_sent:
+            self._send_headers()
+        if data and not self._bodyless:
+            if self._chunked:
+                data = b'%x\r\n%s\r\n' % (len(data), data)
+            self.wfile.write(data)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """A WSGI server handing accepted connections to a fixed set of threads.
+    Connections beyond `backlog` waiting for a thread get a 503."""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, backlog, keepalive_timeout, request_timeout):
+        super().__init__(host, port, app, handler=_RequestHandler)
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.draining = False
+        self._lock = threading.Lock()
+        self._idle = set()
+        self._pending = queue.Queue(maxsize=backlog)
+        self._workers = [
+            threading.Thread(target=self._work, name=f'http-{number}', daemon=True)
+            for number in range(threads)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self._pending.put_nowait((request, client_address))
+        except queue.Full:
+            try:
+                request.sendall(_BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def connection_idle(self, connection):
+        with self._lock:
+            if self.draining:
+                return False
+            self._idle.add(connection)
+            return True
+
+    def connection_busy(self, connection):
+        with self._lock:
+            self._idle.discard(connection)
+
+    def drain(self, timeout):
+        """After serve_forever() returned: close idle keep-alive connections,
+        finish queued and running requests. False if `timeout` ran out."""
+        with self._lock:
+            self.draining = True
+            idle = list(self._idle)
+        for connection in idle:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        # Queued connections are still served; the sentinels come after them
+        for _ in self._workers:
+            self._pending.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.monotonic()))
+        return not any(worker.is_alive() for worker in self._workers)
+
+
+def _watch_stdin(stop):
+    # Read until EOF: the parent closed the pipe or exited
+    try:
+        while sys.stdin.buffer.read(4096):
+            pass
+    except (OSError, ValueError):
+        pass
+    stop('parent process closed stdin')
+
+
+def serve(app, host, port, watch_stdin=False):
+    """Serve `app` until a stop signal, then drain. Blocks."""
+    config = app.config
+    server = PooledWSGIServer(
+        host, port, app,
+        threads=config['SERVER_THREADS'],
+        backlog=config['SERVER_BACKLOG'],
+        keepalive_timeout=config['SERVER_KEEPALIVE_TIMEOUT'],
+        request_timeout=config['SERVER_REQUEST_TIMEOUT']
+    )
+
+    stopping = threading.Event()
+
+    def stop(reason):
+        if not stopping.is_set():
+            stopping.set()
+            print(f"🛑 Stopping ({reason})")
+            # shutdown() waits for serve_forever(), so never call it on its thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), lambda signum, frame: stop(signal.Signals(signum).name))
+    if watch_stdin:
+        threading.Thread(target=_watch_stdin, args=(stop,), name='stdin-watch', daemon=True).start()
+
+    print(f"🧵 {config['SERVER_THREADS']} threads, keep-alive {config['SERVER_KEEPALIVE_TIMEOUT']}s, "
+          f"request timeout {config['SERVER_REQUEST_TIMEOUT']}s")
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        server.server_close()
+        if server.drain(config['SERVER_SHUTDOWN_TIMEOUT']):
+            print("✅ In-flight requests finished")
+        else:
+            print(f"⚠️ Requests still running after {config['SERVER_SHUTDOWN_TIMEOUT']}s, exiting anyway")
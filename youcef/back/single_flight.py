@@ -0,0 +1,51 @@
+"""
+Single-flight request coalescing
+When several threads ask for the same key at once, only the first runs the
+computation; the others wait for it and share its result (or its exception).
+Once the call finishes the key is forgotten, so later callers compute afresh.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call in progress
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Return (fn's result, True if it was shared from another caller)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
@@ -0,0 +1,160 @@
+"""
+Frontend served by the backend
+The pages in front/ and everything under front/assets are read once at
+startup and served from memory at http://HOST:PORT/, so browsers load the UI
+and call the API on one origin (no CORS preflights) through the threaded
+server.
+
+Each asset also gets a content-hashed name (app.3f9c1e2ab4.js) that is cached
+for a year; pages are rewritten to point at those names and revalidated on
+every load by ETag, so a repeat visit costs one 304. Text files are
+compressed up front with gzip and, when the brotli package is installed,
+brotli; each request gets the smallest variant its Accept-Encoding allows.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import current_app, request
+from werkzeug.exceptions import NotFound
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSETS_DIR = 'assets'
+HOME_PAGE = 'launcher.html'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Spelled out: on Windows mimetypes reads the registry, which may say text/plain for .js
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.ico': 'image/x-icon'
+}
+COMPRESSIBLE = {'.html', '.css', '.js', '.json', '.svg', '.txt'}
+# Below this a compressed copy saves less than its headers cost
+MIN_COMPRESS_BYTES = 512
+
+# src="assets/..." and href="assets/...", with any ?v= cache buster dropped
+_REFERENCE = re.compile(r'''((?:src|href)=["'])(assets/[^"'?#]+)(?:\?[^"'#]*)?(["'])''')
+
+
+class _File:
+    __slots__ = ('content_type', 'etag', 'variants')
+
+    def __init__(self, body, extension):
+        self.content_type = CONTENT_TYPES.get(extension) or mimetypes.guess_type('x' + extension)[0] or 'application/octet-stream'
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.variants = {'identity': body}
+        if extension in COMPRESSIBLE and len(body) >= MIN_COMPRESS_BYTES:
+            self._add('gzip', gzip.compress(body, 9, mtime=0))
+            if brotli is not None:
+                self._add('br', brotli.compress(body, quality=11))
+
+    def _add(self, encoding, data):
+        if len(data) < len(self.variants['identity']):
+            self.variants[encoding] = data
+
+    def pick(self, accept_encodings):
+        """(encoding, body): the smallest variant the client accepts."""
+        encoding = 'identity'
+        for candidate, data in self.variants.items():
+            if candidate != 'identity' and accept_encodings[candidate] and len(data) < len(self.variants[encoding]):
+                encoding = candidate
+        return encoding, self.variants[encoding]
+
+
+class StaticAssets:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self._files = {}  # served path -> _File
+        self.hashed = {}  # 'assets/js/app.js' -> 'assets/js/app.<hash>.js'
+        self._immutable = set()  # the hashed names
+        self._signature = None
+        self.load()
+
+    def _sources(self):
+        """(served path, absolute path) of every page and asset."""
+        if not os.path.isdir(self.root):
+            return []
+        sources = [(name, os.path.join(self.root, name)) for name in sorted(os.listdir(self.root)) if name.endswith('.html')]
+        for directory, subdirectories, names in os.walk(os.path.join(self.root, ASSETS_DIR)):
+            subdirectories.sort()
+            for name in sorted(names):
+                path = os.path.join(directory, name)
+                sources.append((os.path.relpath(path, self.root).replace(os.sep, '/'), path))
+        return sources
+
+    def _current_signature(self, sources):
+        signature = []
+        for served, path in sources:
+            stat = os.stat(path)
+            signature.append((served, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def load(self):
+        """Read, fingerprint and compress everything again."""
+        with self._lock:
+            sources = self._sources()
+            files = {}
+            hashed = {}
+            pages = []
+            for served, path in sources:
+                with open(path, 'rb') as f:
+                    body = f.read()
+                if not served.startswith(ASSETS_DIR + '/'):
+                    pages.append((served, body))
+                    continue
+                stem, extension = os.path.splitext(served)
+                asset = _File(body, extension.lower())
+                hashed[served] = f'{stem}.{asset.etag[:10]}{extension}'
+                files[served] = files[hashed[served]] = asset
+
+            def fingerprint(match):
+                return match.group(1) + hashed.get(match.group(2), match.group(2)) + match.group(3)
+
+            for served, body in pages:
+                body = _REFERENCE.sub(fingerprint, body.decode('utf-8')).encode('utf-8')
+                files[served] = _File(body, '.html')
+
+            self._files = files
+            self.hashed = hashed
+            self._immutable = set(hashed.values())
+            self._signature = self._current_signature(sources)
+
+    def reload_if_changed(self):
+        """For the debug server: pick up edits to front/ without a restart."""
+        if self._current_signature(self._sources()) != self._signature:
+            self.load()
+
+    def response(self, path):
+        """The file at `path`: 304 when the client's copy is current,
+        otherwise the best encoding it accepts."""
+        asset = self._files.get(path)
+        if asset is None:
+            raise NotFound()
+
+        if request.if_none_match.contains_weak(asset.etag):
+            response = current_app.response_class(status=304)
+        else:
+            encoding, body = asset.pick(request.accept_encodings)
+            response = current_app.response_class(body, content_type=asset.content_type)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        # One ETag for all encodings, so weak: the bytes differ, the content does not
+        response.set_etag(asset.etag, weak=True)
+        # Hashed names never change content; plain names and pages revalidate
+        response.headers['Cache-Control'] = IMMUTABLE if path in self._immutable else 'no-cache'
+        if len(asset.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        return response
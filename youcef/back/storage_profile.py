@@ -0,0 +1,201 @@
+"""
+SQLite storage profile
+Every pooled connection gets SQLITE_PRAGMAS as it opens: WAL, so payroll
+reads and streamed exports no longer block clock-in commits (nor commits the
+readers); synchronous=NORMAL, which in WAL mode syncs at checkpoints instead
+of on every commit; a busy timeout instead of an instant 'database is
+locked'; a larger page cache, memory-mapped reads and foreign key
+enforcement.
+
+StorageMaintenance keeps the planner statistics and the file in shape from
+a background thread: PRAGMA optimize every STORAGE_OPTIMIZE_INTERVAL, and
+every STORAGE_ANALYZE_INTERVAL a sampled ANALYZE, an incremental vacuum and a
+WAL checkpoint. Incremental vacuum needs auto_vacuum=INCREMENTAL, which a new
+database gets from its first connection and an existing one from migration 5
+(a single full VACUUM).
+
+Usage: python storage_profile.py [status|maintain]
+"""
+import sys
+import threading
+import time
+from sqlalchemy import event
+from models import db
+
+# Lets the server finish starting before the first pass
+STARTUP_DELAY = 60
+# Marks a pooled connection whose synchronous level set_synchronous() changed
+SYNCHRONOUS_KEY = 'synchronous_override'
+
+PRAGMAS_REPORTED = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size',
+                    'foreign_keys', 'auto_vacuum', 'page_count', 'freelist_count')
+
+
+def init_app(app):
+    """Apply the app's SQLITE_PRAGMAS to every connection its engine opens."""
+    with app.app_context():
+        apply_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
+
+def apply_pragmas(engine, pragmas):
+    """Set `pragmas` on every connection `engine` opens."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, 'checkin')
+    def _restore_synchronous(dbapi_connection, connection_record):
+        # Before the next thread checks the connection out; FULL is SQLite's default
+        if connection_record.info.pop(SYNCHRONOUS_KEY, False) and dbapi_connection is not None:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"PRAGMA synchronous = {pragmas.get('synchronous', 'FULL')}")
+            finally:
+                cursor.close()
+
+
+def set_synchronous(connection, level):
+    """Run `connection` with synchronous=`level` until it goes back to the
+    pool, e.g. FULL for commits that must survive a power cut."""
+    connection.exec_driver_sql(f'PRAGMA synchronous = {level}')
+    connection.info[SYNCHRONOUS_KEY] = True
+
+
+def _run(*statements):
+    """Run `statements` on one connection outside any transaction (VACUUM
+    refuses to run in one); the rows of the last."""
+    with db.engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        for statement in statements:
+            result = connection.exec_driver_sql(statement)
+        return result.fetchall() if result.returns_rows else None
+
+
+def status():
+    """Current value of each reported pragma."""
+    return {name: _run(f'PRAGMA {name}')[0][0] for name in PRAGMAS_REPORTED}
+
+
+def enable_incremental_vacuum():
+    """Switch an existing database to auto_vacuum=INCREMENTAL. Takes one full
+    VACUUM, which rewrites the file; a no-op when already switched."""
+    if _run('PRAGMA auto_vacuum')[0][0] != 2:
+        _run('PRAGMA auto_vacuum = INCREMENTAL', 'VACUUM')
+
+
+def optimize():
+    _run('PRAGMA optimize')
+
+
+def analyze(analysis_limit):
+    # analysis_limit samples about that many rows per index: seconds become milliseconds
+    _run(f'PRAGMA analysis_limit = {analysis_limit}', 'ANALYZE')
+
+
+def incremental_vacuum(pages):
+    """Return up to `pages` free pages to the file system; the number freed."""
+    before = _run('PRAGMA freelist_count')[0][0]
+    _run(f'PRAGMA incremental_vacuum({pages})')
+    return before - _run('PRAGMA freelist_count')[0][0]
+
+
+def checkpoint():
+    # Truncate the WAL after a burst of writes has grown it
+    _run('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+class StorageMaintenance:
+    """The scheduled passes, on a daemon thread started with the server."""
+
+    def __init__(self, app):
+        self._app = app
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            'optimize_runs': 0,
+            'analyze_runs': 0,
+            'failures': 0,
+            'last_optimize_seconds': 0.0,
+            'last_analyze_seconds': 0.0,
+            'freed_pages': 0
+        }
+        app.extensions['storage_maintenance'] = self
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self):
+        threading.Thread(target=self._loop, name='storage-maintenance', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_optimize(self):
+        started = time.perf_counter()
+        optimize()
+        with self._lock:
+            self._stats['optimize_runs'] += 1
+            self._stats['last_optimize_seconds'] = round(time.perf_counter() - started, 3)
+
+    def run_analyze(self):
+        config = self._app.config
+        started = time.perf_counter()
+        analyze(config['STORAGE_ANALYSIS_LIMIT'])
+        freed = incremental_vacuum(config['STORAGE_VACUUM_PAGES'])
+        checkpoint()
+        with self._lock:
+            self._stats['analyze_runs'] += 1
+            self._stats['last_analyze_seconds'] = round(time.perf_counter() - started, 3)
+            self._stats['freed_pages'] += freed
+
+    def _loop(self):
+        config = self._app.config
+        next_optimize = next_analyze = time.monotonic() + STARTUP_DELAY
+        while not self._stop.wait(max(0, min(next_optimize, next_analyze) - time.monotonic())):
+            now = time.monotonic()
+            try:
+                with self._app.app_context():
+                    if now >= next_analyze:
+                        self.run_analyze()
+                    else:
+                        self.run_optimize()
+            except Exception:
+                with self._lock:
+                    self._stats['failures'] += 1
+                self._app.logger.exception('Storage maintenance failed')
+            # ANALYZE covers what optimize would have done
+            next_optimize = now + config['STORAGE_OPTIMIZE_INTERVAL']
+            if now >= next_analyze:
+                next_analyze = now + config['STORAGE_ANALYZE_INTERVAL']
+
+
+def main():
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        if sys.argv[1:] == ['maintain']:
+            maintenance = StorageMaintenance(app)
+            maintenance.run_analyze()
+            stats = maintenance.stats()
+            print(f"🧹 ANALYZE, incremental vacuum and checkpoint in {stats['last_analyze_seconds']}s, "
+                  f"{stats['freed_pages']} pages freed")
+        elif sys.argv[1:] not in ([], ['status']):
+            print(__doc__)
+            sys.exit(1)
+
+        for name, value in status().items():
+            print(f"   {name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
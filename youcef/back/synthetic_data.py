@@ -0,0 +1,241 @@
+"""
+Synthetic factory data at realistic scale
+Fills a new database with groups, workers hired over the whole period, a
+work session for most working days of each worker (a few still open today),
+advances, loans with monthly payments and closed monthly payroll runs.
+Everything is generated from a seed, so the same arguments give the same data.
+
+Usage: python synthetic_data.py PATH [--workers 5000] [--groups 200] [--years 5]
+                                     [--payroll-runs 12] [--seed 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, insert
+
+from models import db, Group, Worker, WorkSession, Advance, Loan, LoanPayment
+import cycle_hours
+
+POSITIONS = ['Operator', 'Machine Operator', 'Packer', 'Technician', 'Storekeeper', 'Driver']
+SALARIES = [30000, 35000, 40000, 45000, 50000, 60000]
+FIRST_NAMES = ['Ahmed', 'Mohamed', 'Youcef', 'Karim', 'Sofiane', 'Amine', 'Rachid', 'Nadia', 'Samira', 'Fatima', 'Amina', 'Yasmine']
+LAST_NAMES = ['Benali', 'Boudiaf', 'Haddad', 'Mansouri', 'Belkacem', 'Saidi', 'Cherif', 'Khelifi', 'Guergour', 'Zerrouki']
+
+# Inserted per executemany; bounds memory for multi-million-row tables
+CHUNK_ROWS = 50000
+# Friday is the weekly day off
+DAY_OFF = 4
+ATTENDANCE = 0.92
+OPEN_TODAY = 0.3
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(insert(model), rows)
+
+
+def seed_groups_and_workers(rng, workers, groups, start, today):
+    _insert(Group, [{'name': f'Line {i:03d}', 'is_active': True} for i in range(1, groups + 1)])
+    group_ids = [group_id for group_id, in db.session.query(Group.id).order_by(Group.id)]
+
+    span = (today - start).days
+    _insert(Worker, [{
+        'code': f'W{i:03d}',
+        'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'phone': f'05{rng.randint(10000000, 99999999)}',
+        'position': rng.choice(POSITIONS),
+        'salary': rng.choice(SALARIES),
+        'hire_date': start + timedelta(days=rng.randint(0, span)),
+        'birthday': date(rng.randint(1965, 2004), rng.randint(1, 12), rng.randint(1, 28)),
+        'is_active': rng.random() > 0.05,
+        'is_team_leader': False,
+        'group_id': group_ids[(i - 1) % len(group_ids)] if group_ids else None
+    } for i in range(1, workers + 1)])
+
+    # The earliest-hired active member of each group leads it
+    leaders = {}
+    for worker_id, group_id in db.session.query(Worker.id, Worker.group_id).filter(
+        Worker.is_active == True, Worker.group_id.isnot(None)
+    ).order_by(Worker.hire_date.desc()):
+        leaders[group_id] = worker_id
+    if leaders:
+        db.session.execute(
+            Worker.__table__.update().where(Worker.__table__.c.id == bindparam('worker_id')).values(is_team_leader=True),
+            [{'worker_id': worker_id} for worker_id in leaders.values()]
+        )
+        db.session.execute(
+            Group.__table__.update().where(Group.__table__.c.id == bindparam('group_id')).values(team_leader_id=bindparam('leader_id')),
+            [{'group_id': group_id, 'leader_id': worker_id} for group_id, worker_id in leaders.items()]
+        )
+    db.session.commit()
+
+    return db.session.query(Worker.id, Worker.hire_date, Worker.salary, Worker.is_active).all()
+
+
+def seed_sessions(rng, workers, today):
+    """Sessions chunk by chunk, keeping worker_cycle_hours in step."""
+    sessions = []
+    closed = []
+    total = 0
+
+    def flush():
+        _insert(WorkSession, sessions)
+        cycle_hours.record_closed_sessions(closed)
+        db.session.commit()
+        sessions.clear()
+        closed.clear()
+
+    for worker_id, hire_date, _, is_active in workers:
+        # Inactive workers left somewhere in the last year
+        last_day = today if is_active else max(hire_date, today - timedelta(days=rng.randint(1, 365)))
+        day = hire_date
+        while day <= last_day:
+            if day.weekday() != DAY_OFF and rng.random() < ATTENDANCE:
+                clock_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=7, minutes=rng.randint(0, 90))
+                if day == today and rng.random() < OPEN_TODAY:
+                    sessions.append({'worker_id': worker_id, 'clock_in': clock_in, 'clock_out': None, 'hours_worked': None, 'date': day})
+                else:
+                    hours = round(rng.uniform(6, 10), 2)
+                    sessions.append({
+                        'worker_id': worker_id,
+                        'clock_in': clock_in,
+                        'clock_out': clock_in + timedelta(hours=hours),
+                        'hours_worked': hours,
+                        'date': day
+                    })
+                    closed.append((worker_id, hire_date, day, hours))
+            day += timedelta(days=1)
+
+        if len(sessions) >= CHUNK_ROWS:
+            total += len(sessions)
+            flush()
+
+    total += len(sessions)
+    flush()
+    return total
+
+
+def seed_advances(rng, workers, today):
+    advances = []
+    for worker_id, hire_date, salary, _ in workers:
+        months = max(1, (today - hire_date).days // 30)
+        for _ in range(rng.randint(0, min(months, 8))):
+            given = hire_date + timedelta(days=rng.randint(0, (today - hire_date).days))
+            advances.append({
+                'worker_id': worker_id,
+                'amount': rng.randint(1, int(salary // 5000)) * 1000,
+                'reason': rng.choice([None, 'Family', 'Medical', 'Rent']),
+                'date_given': given,
+                # Older advances have been deducted from a past salary
+                'is_paid_back': (today - given).days > 45 or rng.random() < 0.2
+            })
+    _insert(Advance, advances)
+    db.session.commit()
+    return len(advances)
+
+
+def seed_loans(rng, workers, today):
+    loans = []
+    schedules = []
+    for worker_id, hire_date, salary, _ in workers:
+        if rng.random() > 0.25:
+            continue
+        for _ in range(rng.randint(1, 2)):
+            given = hire_date + timedelta(days=rng.randint(0, (today - hire_date).days))
+            total = float(rng.randint(2, 10) * 10000)
+            installment = total / rng.choice([5, 10, 20])
+            payments = []
+            paid = 0.0
+            payment_date = given + timedelta(days=30)
+            while payment_date <= today and paid < total:
+                amount = min(installment, total - paid)
+                payments.append({'payment_amount': amount, 'payment_date': payment_date, 'notes': 'Monthly deduction'})
+                paid += amount
+                payment_date += timedelta(days=30)
+            loans.append({
+                'worker_id': worker_id,
+                'total_amount': total,
+                'amount_paid_back': paid,
+                'remaining_balance': total - paid,
+                'reason': rng.choice([None, 'Housing', 'Car', 'Wedding']),
+                'date_given': given,
+                'is_fully_paid': total - paid <= 0.01,
+                'created_at': datetime.combine(given, datetime.min.time())
+            })
+            schedules.append(payments)
+
+    _insert(Loan, loans)
+    loan_ids = [loan_id for loan_id, in db.session.query(Loan.id).order_by(Loan.id)]
+    payments = [dict(payment, loan_id=loan_id) for loan_id, schedule in zip(loan_ids, schedules) for payment in schedule]
+    _insert(LoanPayment, payments)
+    db.session.commit()
+    return len(loans), len(payments)
+
+
+def seed_payroll_runs(months, today):
+    from payroll_runs import PayrollRunError, close_payroll_run
+
+    closed = 0
+    for offset in range(months, 0, -1):
+        as_of = today - timedelta(days=30 * offset)
+        try:
+            # Closed on the day itself, as it would have been
+            close_payroll_run(as_of, notes='Synthetic monthly run', today=as_of)
+            closed += 1
+        except PayrollRunError:
+            pass
+    return closed
+
+
+def generate(workers=5000, groups=200, years=5, payroll_runs=12, seed=0, today=None, log=print):
+    """Fill the current app's (empty, migrated) database."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = today - timedelta(days=365 * years)
+
+    started = time.perf_counter()
+    worker_rows = seed_groups_and_workers(rng, workers, groups, start, today)
+    log(f"👥 {groups} groups, {workers} workers")
+    log(f"⏱️ {seed_sessions(rng, worker_rows, today)} work sessions")
+    log(f"💵 {seed_advances(rng, worker_rows, today)} advances")
+    loans, payments = seed_loans(rng, worker_rows, today)
+    log(f"🏦 {loans} loans, {payments} loan payments")
+    log(f"📒 {seed_payroll_runs(payroll_runs, today)} closed payroll runs")
+    log(f"✅ Generated in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic factory database.')
+    parser.add_argument('path', help='SQLite file to create')
+    parser.add_argument('--workers', type=int, default=5000)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--payroll-runs', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.path)
+    if os.path.exists(path):
+        print(f"❌ {path} already exists; pick a new file")
+        sys.exit(1)
+
+    from app import create_app
+    from config import Config
+    import migrations
+
+    class SyntheticConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(SyntheticConfig)
+    with app.app_context():
+        migrations.upgrade()
+        generate(args.workers, args.groups, args.years, args.payroll_runs, args.seed)
+    print(f"🎉 {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Tests for POST /api/clock-events with open sessions on earlier days
+Runs against a throwaway database: python test_clock_batch.py (or pytest)
+"""
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from app import create_app
+from config import Config
+from models import db, Worker, WorkSession
+import clock_batch
+import migrations
+
+
+def make_app(path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        JOB_DIR = os.path.join(os.path.dirname(path), 'jobs')
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        migrations.upgrade()
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        for code in ('T-1', 'T-2'):
+            db.session.add(Worker(code=code, name=f'Worker {code}', position='Operator', salary=30000,
+                                  hire_date=today - timedelta(days=400)))
+        db.session.flush()
+        worker = Worker.query.filter_by(code='T-1').one()
+        # Left open yesterday, and clocked in again today
+        for day in (yesterday, today):
+            db.session.add(WorkSession(worker_id=worker.id, date=day, clock_in=datetime.combine(day, datetime.min.time()).replace(hour=7)))
+        db.session.commit()
+        app.extensions['clock_index'].warm()
+    return app
+
+
+def at(day, hour):
+    return datetime.combine(day, datetime.min.time()).replace(hour=hour).isoformat()
+
+
+def post_events(app, events):
+    response = app.test_client().post('/api/clock-events', json={'events': events})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['results']
+
+
+def test_earlier_open_session():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'clock_batch.db'))
+        yesterday = date.today() - timedelta(days=1)
+        results = post_events(app, [
+            {'worker_code': 'T-1', 'type': 'clock_in', 'timestamp': at(yesterday, 9)},
+            {'worker_code': 'T-2', 'type': 'clock_in', 'timestamp': at(yesterday, 8)}
+        ])
+        assert results[0]['status'] == 'rejected'
+        assert 'already clocked in' in results[0]['error']
+        assert results[1]['status'] == 'applied'
+
+        results = post_events(app, [{'worker_code': 'T-1', 'type': 'clock_out', 'timestamp': at(yesterday, 15)}])
+        assert results[0]['status'] == 'applied' and results[0]['hours_worked'] == 8
+
+        with app.app_context():
+            open_days = [session.date for session in WorkSession.query.filter_by(clock_out=None)]
+            assert sorted(open_days) == [yesterday, date.today()]
+    finally:
+        shutil.rmtree(workdir)
+
+
+def test_conflict_rejects_only_that_event():
+    workdir = tempfile.mkdtemp()
+    load = clock_batch._open_sessions
+    try:
+        app = make_app(os.path.join(workdir, 'clock_batch.db'))
+        # As if the open sessions were written after the batch looked them up
+        clock_batch._open_sessions = lambda worker_ids: load(())
+        today = date.today()
+        results = post_events(app, [
+            {'worker_code': 'T-1', 'type': 'clock_in', 'timestamp': at(today, 8)},
+            {'worker_code': 'T-2', 'type': 'clock_in', 'timestamp': at(today, 8)}
+        ])
+        assert results[0]['status'] == 'rejected'
+        assert 'already clocked in' in results[0]['error']
+        assert results[1]['status'] == 'applied'
+    finally:
+        clock_batch._open_sessions = load
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    test_earlier_open_session()
+    test_conflict_rejects_only_that_event()
+    print("✅ Clock event batches handle open sessions on earlier days")
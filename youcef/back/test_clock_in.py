@@ -0,0 +1,79 @@
+"""
+Tests for one open session per worker and day (POST /api/clock-in, migration 6)
+Runs against a throwaway database: python test_clock_in.py (or pytest)
+"""
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from sqlalchemy import text
+from models import db, SchemaMigration, Worker, WorkSession
+from test_clock_batch import make_app
+import migrations
+
+
+def test_migration_closes_duplicate_open_sessions():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'clock_in.db'))
+        today = date.today()
+        with app.app_context():
+            # Back to version 5: the open-session index was not unique yet
+            db.session.execute(text('DROP INDEX ix_work_sessions_open'))
+            db.session.execute(text('CREATE INDEX ix_work_sessions_open ON work_sessions (worker_id, date) WHERE clock_out IS NULL'))
+            SchemaMigration.query.filter_by(version=6).delete()
+            worker = Worker.query.filter_by(code='T-2').one()
+            # Racing swipes left three open sessions on one day
+            for hour in (7, 8, 8):
+                db.session.add(WorkSession(worker_id=worker.id, date=today,
+                                           clock_in=datetime.combine(today, datetime.min.time()).replace(hour=hour)))
+            db.session.commit()
+
+            assert [migration.version for migration in migrations.upgrade()] == [6]
+            sessions = WorkSession.query.filter_by(worker_id=worker.id).order_by(WorkSession.id).all()
+            assert [session.clock_out is None for session in sessions] == [False, False, True]
+            assert all(session.hours_worked == 0 for session in sessions[:2])
+
+            sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'ix_work_sessions_open'")).scalar()
+            assert sql.startswith('CREATE UNIQUE INDEX')
+    finally:
+        shutil.rmtree(workdir)
+
+
+def test_double_clock_in():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'clock_in.db'))
+        client = app.test_client()
+        response = client.post('/api/clock-in', json={'worker_code': 'T-2'})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+        response = client.post('/api/clock-in', json={'worker_code': 'T-2'})
+        assert response.status_code == 400
+        assert 'already clocked in' in response.get_json()['error']
+
+        with app.app_context():
+            worker = Worker.query.filter_by(code='T-2').one()
+            assert WorkSession.query.filter_by(worker_id=worker.id).count() == 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+def test_first_clock_in_within_budget():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'clock_in.db'))
+        # As right after a start: the clock index loads on first use
+        app.extensions['clock_index']._warm = False
+        response = app.test_client().post('/api/clock-in', json={'worker_code': 'T-2'})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        assert list(app.extensions['metrics'].budget_overruns) == []
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    test_migration_closes_duplicate_open_sessions()
+    test_double_clock_in()
+    test_first_clock_in_within_budget()
+    print("✅ Workers have at most one open session a day")
@@ -0,0 +1,99 @@
+"""
+Tests for the clock group commit (ClockWriter)
+Runs against a throwaway database: python test_clock_writer.py (or pytest)
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models import db, Worker
+from test_clock_batch import make_app
+
+
+def add_worker(code):
+    def write():
+        return db.session.execute(insert(Worker).values(
+            code=code, name=f'Worker {code}', position='Operator', salary=30000, hire_date=date.today()
+        ).returning(Worker.id)).scalar()
+    return write
+
+
+def submit_while_blocked(writer, writes, then=None):
+    """Hold the writer thread on a first write, queue `writes` from one
+    thread each, call `then()` and let the writer go. Returns each write's
+    result or exception."""
+    blocked, release = threading.Event(), threading.Event()
+    outcomes = [None] * len(writes)
+
+    def block():
+        blocked.set()
+        release.wait(5)
+
+    def submit(position, write):
+        try:
+            outcomes[position] = writer.submit(write)
+        except Exception as e:
+            outcomes[position] = e
+
+    gate = threading.Thread(target=writer.submit, args=(block,))
+    gate.start()
+    assert blocked.wait(5)
+    threads = [threading.Thread(target=submit, args=item) for item in enumerate(writes)]
+    for thread in threads:
+        thread.start()
+    while writer._queue.qsize() < len(writes):
+        time.sleep(0.001)
+    if then is not None:
+        then()
+    release.set()
+    for thread in [gate] + threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_failed_write_does_not_fail_its_group():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'clock_writer.db'))
+        writer = app.extensions['clock_writer']
+        # T-1 already exists: that insert breaks the group's transaction
+        codes = ['T-3', 'T-4', 'T-1', 'T-5', 'T-6']
+        outcomes = submit_while_blocked(writer, [add_worker(code) for code in codes])
+
+        assert isinstance(outcomes[2], IntegrityError)
+        assert all(isinstance(outcome, int) for position, outcome in enumerate(outcomes) if position != 2)
+        stats = writer.stats()
+        assert stats['largest_group'] == len(codes) and stats['retried_groups'] == 1
+        with app.app_context():
+            assert Worker.query.filter(Worker.code.in_(codes)).count() == len(codes)
+    finally:
+        app.extensions['clock_writer'].stop(5)
+        shutil.rmtree(workdir)
+
+
+def test_stop_commits_queued_writes():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'clock_writer.db'))
+        writer = app.extensions['clock_writer']
+        codes = ['T-3', 'T-4', 'T-5']
+        stopper = threading.Thread(target=writer.stop, args=(5,))
+        outcomes = submit_while_blocked(writer, [add_worker(code) for code in codes], then=stopper.start)
+        stopper.join(5)
+
+        assert all(isinstance(outcome, int) for outcome in outcomes)
+        assert writer.stats()['commits'] == 2
+        with app.app_context():
+            assert Worker.query.filter(Worker.code.in_(codes)).count() == len(codes)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    test_failed_write_does_not_fail_its_group()
+    test_stop_commits_queued_writes()
+    print("✅ Clock group commits isolate failed writes and drain on stop")
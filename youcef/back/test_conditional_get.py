@@ -0,0 +1,63 @@
+"""
+Tests for ETags and cached responses going stale after writes
+Runs against a throwaway database: python test_conditional_get.py (or pytest)
+"""
+import os
+import shutil
+import tempfile
+from datetime import date
+from config import Config
+from test_clock_batch import make_app, at, post_events
+
+
+def worker_summary(summary, code):
+    return next(worker for worker in summary['workers'] if worker['worker']['code'] == code)
+
+
+def test_etag_changes_after_clock_out():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'conditional_get.db'))
+        client = app.test_client()
+        response = client.get('/api/payments/summary')
+        etag = response.headers['ETag']
+        assert worker_summary(response.get_json(), 'T-1')['work_progress']['hours_worked'] == 0
+        assert client.get('/api/payments/summary', headers={'If-None-Match': etag}).status_code == 304
+
+        results = post_events(app, [{'worker_code': 'T-1', 'type': 'clock_out', 'timestamp': at(date.today(), 15)}])
+        assert results[0]['status'] == 'applied'
+
+        response = client.get('/api/payments/summary', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert worker_summary(response.get_json(), 'T-1')['work_progress']['hours_worked'] == 8
+    finally:
+        shutil.rmtree(workdir)
+
+
+def test_cached_response_dropped_after_worker_edit():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'conditional_get.db'))
+        cache = app.extensions['result_cache']
+        client = app.test_client()
+        workers = client.get('/api/workers').get_json()
+        assert client.get('/api/workers').get_json() == workers
+        assert cache.stats()['hits'] == 1
+
+        worker = next(worker for worker in workers if worker['code'] == 'T-2')
+        response = client.put(f"/api/workers/{worker['id']}", json={'name': 'Renamed'},
+                              headers={'X-Admin-Pin': Config.ADMIN_PIN})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+        names = {worker['code']: worker['name'] for worker in client.get('/api/workers').get_json()}
+        assert names['T-2'] == 'Renamed'
+        assert cache.stats()['hits'] == 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    test_etag_changes_after_clock_out()
+    test_cached_response_dropped_after_worker_edit()
+    print("✅ ETags and cached responses follow committed writes")
@@ -0,0 +1,46 @@
+"""
+Tests for GET /api/dashboard against /api/payments/summary
+Runs against a throwaway database: python test_dashboard.py (or pytest)
+"""
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from models import db, Worker, Advance
+from test_clock_batch import make_app
+
+
+def test_totals_match_summary():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'dashboard.db'))
+        with app.app_context():
+            for code, salary in (('T-3', 28500.1), ('T-4', 28500.2)):
+                db.session.add(Worker(code=code, name=f'Worker {code}', position='Operator', salary=salary,
+                                      hire_date=date.today() - timedelta(days=200)))
+            db.session.flush()
+            # 0.1 + 0.2 and friends: sums that are not exact in floating point
+            for code, amounts in (('T-1', (0.1, 0.2)), ('T-2', (1200.1, 0.2)), ('T-3', (28500.3,))):
+                worker = Worker.query.filter_by(code=code).one()
+                for amount in amounts:
+                    db.session.add(Advance(worker_id=worker.id, amount=amount, date_given=date.today()))
+            db.session.commit()
+
+        client = app.test_client()
+        dashboard = client.get('/api/dashboard').get_json()
+        summary = client.get('/api/payments/summary').get_json()
+        assert dashboard['totals'] == summary['totals']
+
+        workers = [worker['salary_calculation'] for worker in summary['workers']]
+        advances = round(sum(worker['advances_taken'] for worker in workers), 2)
+        assert dashboard['totals']['total_earned_payroll'] == round(sum(worker['earned_salary'] for worker in workers), 2)
+        assert dashboard['totals']['total_advances_given'] == advances == 29700.9
+        assert dashboard['totals']['total_final_payments'] == round(sum(worker['final_payment'] for worker in workers), 2)
+        assert dashboard['advances'] == {'outstanding_total': advances, 'outstanding_count': 5}
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    test_totals_match_summary()
+    print("✅ Dashboard totals match the payroll summary")
@@ -54,7 +54,7 @@ def test_everything():
             print(f"❌ Loan creation failed: {response.text}")
     
     print("\n🎉 System test complete!")
-    print("   🌐 Frontend: http://localhost:8080/khadama.html")
+    print("   🌐 Frontend: http://127.0.0.1:5000/khadama.html")
     print("   🔴 Try the Douyoun button now!")
 
 if __name__ == "__main__":
@@ -0,0 +1,34 @@
+"""
+Tests for POST /api/workers/import
+Runs against a throwaway database: python test_worker_import.py (or pytest)
+"""
+import os
+import shutil
+import tempfile
+from config import Config
+from models import Worker
+from test_clock_batch import make_app
+
+
+def test_list_body_without_pin():
+    workdir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(workdir, 'worker_import.db'))
+        client = app.test_client()
+        workers = [{'code': 'T-3', 'name': 'Worker T-3', 'position': 'Operator', 'salary': 30000,
+                    'hire_date': '2024-01-15'}]
+
+        response = client.post('/api/workers/import', json=workers)
+        assert response.status_code == 401, response.get_data(as_text=True)
+
+        response = client.post('/api/workers/import', json=workers, headers={'X-Admin-Pin': Config.ADMIN_PIN})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        with app.app_context():
+            assert Worker.query.filter_by(code='T-3').count() == 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    test_list_body_without_pin()
+    print("✅ Worker imports without an admin PIN are refused")
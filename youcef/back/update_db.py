@@ -5,6 +5,7 @@ Adds new Loan and LoanPayment tables while preserving existing data
 
 from app import create_app
 from models import db, Group, Worker, WorkSession, Advance, Loan, LoanPayment
+import migrations
 import os
 
 def update_database():
@@ -13,8 +14,10 @@ def update_database():
     with app.app_context():
         print("📊 Updating database with new loan system...")
         
-        # Create new tables (will skip existing ones)
-        db.create_all()
+        # Create new tables and apply pending schema migrations (indexes etc.)
+        applied = migrations.upgrade()
+        for migration in applied:
+            print(f"   ✅ Migration {migration.version}: {migration.description}")
         
         print("✅ Database updated successfully!")
         print("📋 Current tables:")
@@ -0,0 +1,316 @@
+"""
+Bulk worker import
+Validates a whole list of workers (CSV rows or JSON objects) up front - one
+query for codes already taken, one for the groups - allocates W### codes for
+rows that have none, then inserts the valid rows in IMPORT_BATCH_SIZE batches,
+one transaction each. Returns one result per row, in input order.
+
+Usage: python worker_import.py workers.csv|workers.json [--dry-run] [--pin PIN]
+Posts the file to the running server's /api/workers/import, so its clock
+index, caches and live updates stay in step; with no server running it
+imports straight into the database.
+"""
+import csv
+import io
+import json
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import Integer, cast, func, insert
+from sqlalchemy.exc import IntegrityError
+from models import db, Group, Worker
+
+FIELDS = ('code', 'name', 'phone', 'position', 'salary', 'hire_date', 'birthday', 'group_id', 'group', 'is_team_leader')
+
+# Code allocation reads the highest code, so two imports must not interleave
+_import_lock = threading.Lock()
+
+
+def parse_csv(text):
+    """Rows of a CSV with a header line, as dicts keyed by lower-case field name."""
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    return [
+        {(key or '').strip().lower(): value for key, value in row.items()}
+        for row in reader
+    ]
+
+
+def _code_number(code):
+    if code and code[0] == 'W' and code[1:].isdigit():
+        return int(code[1:])
+    return None
+
+
+def next_worker_code():
+    """The W### code after the highest one in use (index-only scan of codes)."""
+    highest = db.session.query(func.max(cast(func.substr(Worker.code, 2), Integer))).filter(
+        Worker.code.op('GLOB')('W[0-9]*')
+    ).scalar()
+    return f'W{(highest or 0) + 1:03d}'
+
+
+def _taken_codes(codes):
+    taken = set()
+    codes = list(codes)
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(codes), 500):
+        chunk = codes[start:start + 500]
+        taken.update(code for code, in db.session.query(Worker.code).filter(Worker.code.in_(chunk)))
+    return taken
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _date(record, field, errors, required=False):
+    value = _text(record, field)
+    if value is None:
+        if required:
+            errors.append(f'{field} is required')
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        errors.append(f'Invalid {field} format. Use YYYY-MM-DD')
+        return None
+
+
+def _bool(record, field, errors):
+    value = record.get(field)
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    value = str(value).strip().lower()
+    if value in ('', '0', 'false', 'no'):
+        return False
+    if value in ('1', 'true', 'yes'):
+        return True
+    errors.append(f'{field} must be true or false')
+    return False
+
+
+def _validate(record, groups_by_id, groups_by_name):
+    """(row values for the insert, list of errors) for one record."""
+    errors = []
+    if not isinstance(record, dict):
+        return None, ['Row must be an object']
+
+    # '' collects the values of CSV rows longer than the header
+    unknown = set(record) - set(FIELDS) - {''}
+    if unknown:
+        errors.append(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    name = _text(record, 'name')
+    if not name:
+        errors.append('name is required')
+    position = _text(record, 'position')
+    if not position:
+        errors.append('position is required')
+
+    salary = None
+    try:
+        salary = float(_text(record, 'salary') or '')
+        if salary <= 0:
+            errors.append('salary must be positive')
+    except ValueError:
+        errors.append('salary must be a number')
+
+    hire_date = _date(record, 'hire_date', errors, required=True)
+    birthday = _date(record, 'birthday', errors)
+
+    group_id = None
+    group_ref = _text(record, 'group_id')
+    group_name = _text(record, 'group')
+    if group_ref is not None:
+        try:
+            group_id = int(group_ref)
+        except ValueError:
+            errors.append('group_id must be an integer')
+        else:
+            if group_id not in groups_by_id:
+                errors.append(f'Invalid group {group_id}')
+    elif group_name is not None:
+        group_id = groups_by_name.get(group_name.lower())
+        if group_id is None:
+            errors.append(f'Invalid group {group_name}')
+
+    row = {
+        'code': _text(record, 'code'),
+        'name': name,
+        'phone': _text(record, 'phone'),
+        'position': position,
+        'salary': salary,
+        'hire_date': hire_date,
+        'birthday': birthday,
+        'group_id': group_id,
+        'is_team_leader': _bool(record, 'is_team_leader', errors)
+    }
+    return row, errors
+
+
+def _insert(rows):
+    """Insert `rows` in one statement; code -> new worker id."""
+    # Matched back by code: an ordered RETURNING would insert row by row
+    return dict(db.session.execute(insert(Worker).returning(Worker.code, Worker.id), rows).all())
+
+
+def _conflict_error(row, error):
+    message = str(error.orig)
+    if 'workers.code' in message:
+        return f"Worker code {row['code']} already exists"
+    if 'FOREIGN KEY' in message:
+        return 'Group no longer exists'
+    return f'Could not be inserted: {message}'
+
+
+def import_workers(records, batch_size, dry_run=False):
+    """Validate all `records`, then insert the valid ones (unless `dry_run`).
+    Returns (results, created workers as (id, code, name, hire_date))."""
+    with _import_lock:
+        groups = db.session.query(Group.id, Group.name).filter(Group.is_active == True).all()
+        groups_by_id = {group_id: name for group_id, name in groups}
+        groups_by_name = {name.lower(): group_id for group_id, name in groups}
+
+        results = [None] * len(records)
+        rows = []
+        for position, record in enumerate(records):
+            row, errors = _validate(record, groups_by_id, groups_by_name)
+            results[position] = {'index': position, 'errors': errors}
+            rows.append(row)
+
+        # Codes: duplicates within the file, then against the table
+        given = Counter(row['code'] for row in rows if row and row['code'])
+        taken = _taken_codes(given)
+        for position, row in enumerate(rows):
+            code = row and row['code']
+            if code and given[code] > 1:
+                results[position]['errors'].append(f'Duplicate code {code} in import')
+            elif code in taken:
+                results[position]['errors'].append(f'Worker code {code} already exists')
+
+        # Allocate codes after the highest W### in the table or the file
+        numbers = [_code_number(code) for code in given]
+        next_number = max([_code_number(next_worker_code())] + [number + 1 for number in numbers if number is not None])
+        for position, row in enumerate(rows):
+            if row and not row['code'] and not results[position]['errors']:
+                row['code'] = f'W{next_number:03d}'
+                next_number += 1
+
+        valid = [position for position, result in enumerate(results) if not result['errors']]
+        for position, result in enumerate(results):
+            errors = result.pop('errors')
+            if errors:
+                result.update(status='rejected', error='; '.join(errors))
+            else:
+                result.update(status='valid', code=rows[position]['code'])
+
+        created = []
+        if dry_run:
+            return results, created
+
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            try:
+                inserted = _insert([rows[position] for position in batch])
+                db.session.commit()
+            except IntegrityError:
+                # Something changed since validation, e.g. a code taken by a
+                # concurrent add_worker: retry row by row so each row gets its own result
+                db.session.rollback()
+                inserted = {}
+                for position in batch:
+                    try:
+                        inserted.update(_insert([rows[position]]))
+                        db.session.commit()
+                    except IntegrityError as e:
+                        db.session.rollback()
+                        results[position].update(status='rejected', error=_conflict_error(rows[position], e))
+
+            for position in batch:
+                row = rows[position]
+                worker_id = inserted.get(row['code'])
+                if worker_id is None:
+                    continue
+                results[position].update(status='created', worker_id=worker_id)
+                created.append((worker_id, row['code'], row['name'], row['hire_date']))
+
+        return results, created
+
+
+def _read_file(path):
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    if path.lower().endswith('.json'):
+        records = json.loads(content)
+        return records.get('workers') if isinstance(records, dict) else records
+    return parse_csv(content)
+
+
+def _post(records, dry_run, pin):
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+    from config import Config
+
+    url = f'http://{Config.HOST}:{Config.PORT}/api/workers/import' + ('?dry_run=true' if dry_run else '')
+    body = json.dumps({'workers': records, 'admin_pin': pin}).encode('utf-8')
+    request = Request(url, data=body, headers={'Content-Type': 'application/json', 'X-Admin-Pin': pin})
+    try:
+        with urlopen(request) as response:
+            return json.load(response)
+    except HTTPError as e:
+        return json.load(e)
+
+
+def _import_directly(records, dry_run):
+    from app import create_app
+    import migrations
+
+    app = create_app()
+    with app.app_context():
+        migrations.upgrade()
+        results, _ = import_workers(records, app.config['IMPORT_BATCH_SIZE'], dry_run)
+    return {'results': results}
+
+
+def main():
+    from urllib.error import URLError
+    from config import Config
+
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    pin = Config.ADMIN_PIN
+    if '--pin' in args:
+        pin = args[args.index('--pin') + 1]
+        args.remove(pin)
+    paths = [arg for arg in args if not arg.startswith('--')]
+    if len(paths) != 1:
+        print(__doc__)
+        sys.exit(1)
+
+    records = _read_file(paths[0])
+    print(f"📥 {len(records)} workers read from {paths[0]}")
+    try:
+        report = _post(records, dry_run, pin)
+        print("🔗 Sent to the running server")
+    except URLError:
+        print("⚠️ Server not running, importing straight into the database")
+        report = _import_directly(records, dry_run)
+
+    if 'error' in report:
+        print(f"❌ {report['error']}")
+        sys.exit(1)
+
+    for result in report['results']:
+        if result['status'] == 'rejected':
+            print(f"   ❌ row {result['index'] + 1}: {result['error']}")
+    counts = Counter(result['status'] for result in report['results'])
+    print(f"{'🔍' if dry_run else '🎉'} {counts['created']} created, {counts['valid']} valid, {counts['rejected']} rejected")
+
+
+if __name__ == '__main__':
+    main()
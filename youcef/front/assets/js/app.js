@@ -1,14 +1,19 @@
 // GPLAST Factory Management - JavaScript Application
 
 // Configuration
-const API_BASE_URL = 'http://127.0.0.1:5000/api';
+// Same origin when the backend serves the pages; Electron opens them from disk
+const API_BASE_URL = location.protocol === 'file:' ? 'http://127.0.0.1:5000/api' : `${location.origin}/api`;
 const ADMIN_PIN = '1234'; // This should match your backend config
-const REFRESH_INTERVAL = 30000; // 30 seconds
+const REFRESH_INTERVAL = 30000; // 30 seconds, only when the event stream is unavailable
+const RECENT_SESSIONS_LIMIT = 10;
 
 // Global State
 let workers = [];
 let payrollData = null;
+let recentSessions = [];
 let refreshTimer = null;
+let eventSource = null;
+let metricsRefreshTimer = null;
 
 // Utility Functions
 function formatCurrency(amount) {
@@ -67,27 +72,43 @@ function getPaymentStatusClass(status) {
 }
 
 // API Functions
+// Last GET response per endpoint, revalidated with If-None-Match
+const responseCache = new Map();
+
 async function apiCall(endpoint, options = {}) {
     const fullUrl = `${API_BASE_URL}${endpoint}`;
+    const isGet = !options.method || options.method.toUpperCase() === 'GET';
+    const cached = isGet ? responseCache.get(endpoint) : null;
     console.log('Making API call to:', fullUrl);
-    
+
     try {
         const response = await fetch(fullUrl, {
+            ...options,
             headers: {
                 'Content-Type': 'application/json',
+                ...(cached ? { 'If-None-Match': cached.etag } : {}),
                 ...options.headers
-            },
-            ...options
+            }
         });
 
         console.log('Response status:', response.status);
-        
+
+        // Unchanged since the last fetch: the server skipped the query
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
         const data = await response.json();
         console.log('API response:', data);
+
+        const etag = response.headers.get('ETag');
+        if (isGet && etag) {
+            responseCache.set(endpoint, { etag, data });
+        }
         return data;
     } catch (error) {
         console.error(`API call failed for ${endpoint}:`, error);
@@ -134,9 +155,18 @@ async function fetchPayrollSummary() {
     }
 }
 
+// Headcount, totals, clocked-in count and the last sessions in one request
+async function fetchDashboard() {
+    try {
+        return await apiCall(`/dashboard?limit=${RECENT_SESSIONS_LIMIT}`);
+    } catch (error) {
+        return null;
+    }
+}
+
 async function fetchRecentSessions() {
     try {
-        return await apiCall('/sessions');
+        return await apiCall(`/sessions?limit=${RECENT_SESSIONS_LIMIT}`);
     } catch (error) {
         return [];
     }
@@ -260,17 +290,14 @@ async function initializeDashboard() {
 
 async function loadDashboardData() {
     try {
-        // Load all data
-        const [workersData, payrollSummary, recentSessions] = await Promise.all([
-            fetchWorkers(),
-            fetchPayrollSummary(),
-            fetchRecentSessions()
-        ]);
+        const dashboard = await fetchDashboard();
+        if (!dashboard) return;
 
         // Update metrics
-        updateDashboardMetrics(workersData, payrollSummary);
+        updateDashboardMetrics(dashboard);
         
         // Update recent sessions
+        recentSessions = dashboard.recent_sessions;
         updateRecentSessions(recentSessions);
         
         updateLastUpdateTime();
@@ -279,31 +306,35 @@ async function loadDashboardData() {
     }
 }
 
-function updateDashboardMetrics(workers, payrollData) {
+function updateDashboardMetrics(dashboard) {
     // Total Workers
     const totalWorkersEl = document.getElementById('totalWorkers');
     if (totalWorkersEl) {
-        totalWorkersEl.textContent = workers.length;
+        totalWorkersEl.textContent = dashboard.headcount;
     }
 
-    if (payrollData) {
-        // Total Earned Payroll
-        const totalPayrollEl = document.getElementById('totalEarnedPayroll');
-        if (totalPayrollEl) {
-            totalPayrollEl.textContent = formatCurrency(payrollData.totals.total_earned_payroll);
-        }
+    // Workers clocked in right now
+    const clockedInEl = document.getElementById('clockedInNow');
+    if (clockedInEl) {
+        clockedInEl.textContent = dashboard.clocked_in;
+    }
 
-        // Total Advances
-        const totalAdvancesEl = document.getElementById('totalAdvances');
-        if (totalAdvancesEl) {
-            totalAdvancesEl.textContent = formatCurrency(payrollData.totals.total_advances_given);
-        }
+    // Total Earned Payroll
+    const totalPayrollEl = document.getElementById('totalEarnedPayroll');
+    if (totalPayrollEl) {
+        totalPayrollEl.textContent = formatCurrency(dashboard.totals.total_earned_payroll);
+    }
 
-        // Final Payments
-        const finalPaymentsEl = document.getElementById('totalFinalPayments');
-        if (finalPaymentsEl) {
-            finalPaymentsEl.textContent = formatCurrency(payrollData.totals.total_final_payments);
-        }
+    // Total Advances
+    const totalAdvancesEl = document.getElementById('totalAdvances');
+    if (totalAdvancesEl) {
+        totalAdvancesEl.textContent = formatCurrency(dashboard.totals.total_advances_given);
+    }
+
+    // Final Payments
+    const finalPaymentsEl = document.getElementById('totalFinalPayments');
+    if (finalPaymentsEl) {
+        finalPaymentsEl.textContent = formatCurrency(dashboard.totals.total_final_payments);
     }
 }
 
@@ -316,7 +347,7 @@ function updateRecentSessions(sessions) {
         return;
     }
 
-    tbody.innerHTML = sessions.slice(0, 10).map(session => `
+    tbody.innerHTML = sessions.slice(0, RECENT_SESSIONS_LIMIT).map(session => `
         <tr>
             <td>
                 <strong>${session.worker_name || 'Unknown'}</strong>
@@ -335,7 +366,10 @@ function updateRecentSessions(sessions) {
 
 // Workers Management Functions
 async function loadWorkersTable() {
-    const workers = await fetchWorkers();
+    renderWorkersTable(await fetchWorkers());
+}
+
+function renderWorkersTable(workers) {
     const tbody = document.getElementById('workersTableBody');
     
     if (!tbody) return;
@@ -627,6 +661,12 @@ function verifyPin() {
 
 // Refresh Functions
 function startAutoRefresh() {
+    if (!connectEventStream()) {
+        startPolling();
+    }
+}
+
+function startPolling() {
     if (refreshTimer) {
         clearInterval(refreshTimer);
     }
@@ -641,6 +681,93 @@ function startAutoRefresh() {
     }, REFRESH_INTERVAL);
 }
 
+// Live Updates (server-sent events)
+// Each event patches the state already on screen instead of re-downloading it.
+function connectEventStream() {
+    if (!window.EventSource) return false;
+    if (eventSource) eventSource.close();
+
+    eventSource = new EventSource(`${API_BASE_URL}/events`);
+
+    const on = (type, handler) => eventSource.addEventListener(type, event => {
+        handler(JSON.parse(event.data));
+        updateLastUpdateTime();
+    });
+
+    on('clock_in', data => applySessionChange(data.session));
+    on('clock_out', data => applySessionChange(data.session));
+    on('clock_batch', () => reloadRecentSessions());
+    on('worker_changed', data => applyWorkerChange(data.action, data.worker));
+    on('workers_imported', () => { reloadWorkers(); scheduleMetricsRefresh(); });
+    on('group_changed', () => reloadWorkers());
+    on('advance_given', () => scheduleMetricsRefresh());
+    on('advance_paid_back', () => scheduleMetricsRefresh());
+    // Too many missed events to replay: reload everything once
+    on('reset', () => refreshAll());
+
+    eventSource.onerror = () => {
+        // The browser retries on its own unless the stream was refused
+        if (eventSource.readyState === EventSource.CLOSED) {
+            console.warn('Event stream unavailable, falling back to polling');
+            eventSource = null;
+            startPolling();
+        }
+    };
+    return true;
+}
+
+function applySessionChange(session) {
+    if (!document.getElementById('recentSessions')) return;
+
+    // The clocked-in count moves with every clock event
+    scheduleMetricsRefresh();
+    recentSessions = [session, ...recentSessions.filter(s => s.id !== session.id)]
+        .sort((a, b) => b.date.localeCompare(a.date) || b.id - a.id)
+        .slice(0, RECENT_SESSIONS_LIMIT);
+    updateRecentSessions(recentSessions);
+}
+
+async function reloadRecentSessions() {
+    if (!document.getElementById('recentSessions')) return;
+    recentSessions = await fetchRecentSessions();
+    updateRecentSessions(recentSessions);
+}
+
+function applyWorkerChange(action, worker) {
+    const others = workers.filter(w => w.id !== worker.id);
+    workers = action === 'deleted' ? others : [...others, worker].sort((a, b) => a.id - b.id);
+
+    if (document.getElementById('workersTableBody')) {
+        renderWorkersTable(workers);
+    }
+    // Headcount and salaries feed the dashboard totals
+    scheduleMetricsRefresh();
+}
+
+async function reloadWorkers() {
+    await fetchWorkers();
+    if (document.getElementById('workersTableBody')) {
+        renderWorkersTable(workers);
+    }
+}
+
+// Several changes in a burst cost a single dashboard request
+function scheduleMetricsRefresh() {
+    if (!document.getElementById('totalWorkers')) return;
+    clearTimeout(metricsRefreshTimer);
+    metricsRefreshTimer = setTimeout(async () => {
+        const dashboard = await fetchDashboard();
+        if (dashboard) updateDashboardMetrics(dashboard);
+    }, 500);
+}
+
+async function refreshAll() {
+    await loadDashboardData();
+    if (document.getElementById('workersTableBody')) {
+        await loadWorkersTable();
+    }
+}
+
 async function refreshData() {
     await testAPIConnection();
     await loadDashboardData();
@@ -1285,24 +1412,14 @@ window.showAddWorkerModal = function() {
     modal.show();
 };
 
-// Generate next available worker code
+// Generate next available worker code (allocated by the server)
 async function generateNextWorkerCode() {
     try {
-        const workers = await fetchWorkers();
-        
-        // Extract existing codes and find the highest number
-        const existingCodes = workers
-            .map(w => w.code)
-            .filter(code => code.startsWith('W'))
-            .map(code => parseInt(code.substring(1)))
-            .filter(num => !isNaN(num));
-        
-        const maxCode = existingCodes.length > 0 ? Math.max(...existingCodes) : 0;
-        const nextCode = `W${String(maxCode + 1).padStart(3, '0')}`;
+        const { code } = await apiCall('/workers/next-code');
         
         const codeInput = document.getElementById('workerCode');
         if (codeInput) {
-            codeInput.value = nextCode;
+            codeInput.value = code;
         }
     } catch (error) {
         console.error('Failed to generate worker code:', error);
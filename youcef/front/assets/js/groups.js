@@ -1,15 +1,18 @@
 // Groups Management JavaScript
-const API_BASE = 'http://127.0.0.1:5000/api';
+// Same origin when the backend serves the pages; Electron opens them from disk
+const API_BASE = location.protocol === 'file:' ? 'http://127.0.0.1:5000/api' : `${location.origin}/api`;
 const ADMIN_PIN = '1234';
 
 let currentGroups = [];
 let currentWorkers = [];
 let currentGroupId = null;
+let eventSource = null;
 
 // Initialize the page
 document.addEventListener('DOMContentLoaded', function() {
     loadGroups();
     loadWorkers();
+    connectEventStream();
     
     // Event listeners
     document.getElementById('addGroupBtn').addEventListener('click', showCreateGroupModal);
@@ -432,6 +435,53 @@ function viewGroupDetails(groupId) {
     showAlert(`Group Details for "${group.name}" - Feature coming soon!`, 'info');
 }
 
+// Live updates: patch the loaded groups/workers from server-sent events
+function connectEventStream() {
+    if (!window.EventSource) return;
+
+    eventSource = new EventSource(`${API_BASE}/events`);
+    eventSource.addEventListener('group_changed', event => applyGroupChange(JSON.parse(event.data)));
+    eventSource.addEventListener('worker_changed', event => applyWorkerChange(JSON.parse(event.data)));
+    eventSource.addEventListener('workers_imported', () => Promise.all([loadGroups(), loadWorkers()]));
+    // Too many missed events to replay: reload once
+    eventSource.addEventListener('reset', () => Promise.all([loadGroups(), loadWorkers()]));
+}
+
+function applyGroupChange({ action, group }) {
+    const others = currentGroups.filter(g => g.id !== group.id);
+    currentGroups = action === 'deleted' ? others : [...others, group].sort((a, b) => a.id - b.id);
+    renderGroups(currentGroups);
+    updateStatistics(currentGroups);
+
+    // Group changes can move the team leader flag between workers
+    loadWorkers();
+}
+
+function applyWorkerChange({ action, worker }) {
+    const previous = currentWorkers.find(w => w.id === worker.id);
+    const removed = action === 'deleted' || !worker.is_active;
+    const others = currentWorkers.filter(w => w.id !== worker.id);
+    currentWorkers = removed ? others : [...others, worker].sort((a, b) => a.id - b.id);
+    populateTeamLeaderSelect(currentWorkers);
+
+    // Adjust member counts and leader names for the groups this worker left/joined
+    currentGroups = currentGroups.map(group => {
+        let workersCount = group.workers_count;
+        if (previous && previous.group_id === group.id) workersCount -= 1;
+        if (!removed && worker.group_id === group.id) workersCount += 1;
+
+        const isLeader = group.team_leader_id === worker.id;
+        return {
+            ...group,
+            workers_count: workersCount,
+            team_leader_id: isLeader && removed ? null : group.team_leader_id,
+            team_leader_name: isLeader ? (removed ? null : worker.name) : group.team_leader_name
+        };
+    });
+    renderGroups(currentGroups);
+    updateStatistics(currentGroups);
+}
+
 // Refresh all data
 async function refreshData() {
     await Promise.all([loadGroups(), loadWorkers()]);
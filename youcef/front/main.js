@@ -1,9 +1,20 @@
 const { app, BrowserWindow, Menu, shell } = require('electron');
 const path = require('path');
+const http = require('http');
 const { spawn } = require('child_process');
 
 let mainWindow;
 let flaskProcess = null;
+let flaskStopping = null;
+let flaskStopped = false;
+
+// Time the backend gets to finish in-flight requests before it is killed
+const FLASK_SHUTDOWN_TIMEOUT_MS = 15000;
+// The pages are served by the backend, so they share the API's origin
+const BACKEND_URL = 'http://127.0.0.1:5000';
+// How long to wait for the backend to answer before loading the page anyway
+const FLASK_STARTUP_TIMEOUT_MS = 30000;
+const FLASK_POLL_INTERVAL_MS = 250;
 
 // Auto-start Flask backend
 function startFlaskServer() {
@@ -11,10 +22,14 @@ function startFlaskServer() {
     
     try {
         console.log('🚀 Starting Flask backend...');
-        flaskProcess = spawn('python', [flaskPath], {
+        // --watch-stdin: the backend shuts down gracefully once this pipe
+        // closes, including when Electron itself crashes or is killed
+        flaskProcess = spawn('python', [flaskPath, '--watch-stdin'], {
             cwd: path.join(__dirname, '..', 'back'),
-            stdio: 'inherit'
+            stdio: ['pipe', 'inherit', 'inherit']
         });
+        flaskStopping = null;
+        flaskStopped = false;
         
         flaskProcess.on('error', (error) => {
             console.error('❌ Failed to start Flask server:', error);
@@ -30,6 +45,60 @@ function startFlaskServer() {
     }
 }
 
+// Resolve once the backend answers /api/test, or after FLASK_STARTUP_TIMEOUT_MS
+function waitForFlaskServer() {
+    const deadline = Date.now() + FLASK_STARTUP_TIMEOUT_MS;
+    return new Promise((resolve) => {
+        const poll = () => {
+            const request = http.get(`${BACKEND_URL}/api/test`, (response) => {
+                response.resume();
+                if (response.statusCode === 200) {
+                    resolve(true);
+                } else {
+                    retry();
+                }
+            });
+            request.on('error', retry);
+            request.setTimeout(FLASK_POLL_INTERVAL_MS * 4, () => request.destroy());
+        };
+        const retry = () => {
+            if (Date.now() >= deadline) {
+                resolve(false);
+            } else {
+                setTimeout(poll, FLASK_POLL_INTERVAL_MS);
+            }
+        };
+        poll();
+    });
+}
+
+// Ask the backend to stop and wait for it; kill it if it takes too long
+function stopFlaskServer() {
+    if (!flaskStopping) {
+        const child = flaskProcess;
+        flaskProcess = null;
+        flaskStopping = new Promise((resolve) => {
+            if (!child || !child.pid || child.exitCode !== null || child.signalCode !== null) {
+                resolve();
+                return;
+            }
+            const timer = setTimeout(() => {
+                console.log('⚠️ Flask server did not stop in time, killing it');
+                child.kill();
+            }, FLASK_SHUTDOWN_TIMEOUT_MS);
+            child.once('exit', () => {
+                clearTimeout(timer);
+                resolve();
+            });
+            console.log('🛑 Stopping Flask backend...');
+            child.stdin.end();
+        }).then(() => {
+            flaskStopped = true;
+        });
+    }
+    return flaskStopping;
+}
+
 function createWindow() {
     // Create the browser window
     mainWindow = new BrowserWindow({
@@ -48,28 +117,30 @@ function createWindow() {
         titleBarStyle: 'default'
     });
 
-    // Load the index.html file
-    mainWindow.loadFile('index.html');
+    // Load index.html from the backend once it is up
+    if (!flaskProcess) {
+        startFlaskServer();
+    }
+    waitForFlaskServer().then((ready) => {
+        if (!ready) {
+            console.log('⚠️ Flask backend did not answer in time, loading the page anyway');
+        }
+        if (mainWindow) {
+            mainWindow.loadURL(`${BACKEND_URL}/index.html`);
+        }
+    });
 
     // Show window when ready
     mainWindow.once('ready-to-show', () => {
         mainWindow.show();
-        
-        // Start Flask backend after window is ready
-        setTimeout(() => {
-            startFlaskServer();
-        }, 1000);
     });
 
     // Handle window closed
     mainWindow.on('closed', () => {
         mainWindow = null;
         
-        // Kill Flask process when window closes
-        if (flaskProcess) {
-            flaskProcess.kill();
-            flaskProcess = null;
-        }
+        // Stop Flask process when window closes
+        stopFlaskServer();
     });
 
     // Prevent external links from opening in Electron
@@ -130,22 +201,19 @@ app.whenReady().then(() => {
 });
 
 app.on('window-all-closed', () => {
-    // Kill Flask process
-    if (flaskProcess) {
-        flaskProcess.kill();
-        flaskProcess = null;
-    }
+    // Stop Flask process
+    stopFlaskServer();
     
     if (process.platform !== 'darwin') {
         app.quit();
     }
 });
 
-app.on('before-quit', () => {
-    // Cleanup Flask process
-    if (flaskProcess) {
-        flaskProcess.kill();
-        flaskProcess = null;
+app.on('before-quit', (event) => {
+    // Let Flask finish in-flight requests before Electron exits
+    if (!flaskStopped) {
+        event.preventDefault();
+        stopFlaskServer().then(() => app.quit());
     }
 });
 
@@ -1,52 +1,30 @@
 """
-Simple HTTP Server for GPLAST Frontend
-Serves the frontend files on http://localhost:8080
+Open the GPLAST Frontend
+The Flask backend serves these pages itself on http://127.0.0.1:5000,
+precompressed and with cache headers (see back/static_assets.py); this
+script checks that it is running and opens the launcher.
 """
-import http.server
-import socketserver
-import os
+import urllib.request
 import webbrowser
-import threading
-import time
 
-class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def end_headers(self):
-        # Add CORS headers
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Admin-Pin')
-        super().end_headers()
+BACKEND_URL = 'http://127.0.0.1:5000'
 
-def start_frontend_server():
-    PORT = 8080
+def open_frontend():
+    try:
+        urllib.request.urlopen(f'{BACKEND_URL}/api/test', timeout=3).close()
+    except OSError:
+        print(f"❌ Backend not running on {BACKEND_URL}")
+        print("   Start it with: python ../back/app.py")
+        return
     
-    # Change to frontend directory
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print(f"🌐 Frontend served by the backend on {BACKEND_URL}")
+    print("📋 Available pages:")
+    print(f"   - {BACKEND_URL}/launcher.html (System Launcher)")
+    print(f"   - {BACKEND_URL}/khadama.html (Workers Management)")
+    print(f"   - {BACKEND_URL}/groups.html (Groups Management)")
+    print(f"   - {BACKEND_URL}/index.html (Overview)")
     
-    Handler = CustomHTTPRequestHandler
-    
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print(f"🌐 Frontend server starting on http://localhost:{PORT}")
-        print(f"📁 Serving files from: {os.getcwd()}")
-        print("📋 Available pages:")
-        print(f"   - http://localhost:{PORT}/launcher.html (System Launcher)")
-        print(f"   - http://localhost:{PORT}/khadama.html (Workers Management)")
-        print(f"   - http://localhost:{PORT}/groups.html (Groups Management)")
-        print(f"   - http://localhost:{PORT}/index.html (Overview)")
-        print("\n✅ Frontend server ready!")
-        print("   Press Ctrl+C to stop the server")
-        
-        # Auto-open browser
-        def open_browser():
-            time.sleep(1)
-            webbrowser.open(f'http://localhost:{PORT}/launcher.html')
-        
-        threading.Thread(target=open_browser, daemon=True).start()
-        
-        try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\n🛑 Frontend server stopped")
+    webbrowser.open(f'{BACKEND_URL}/launcher.html')
 
 if __name__ == "__main__":
-    start_frontend_server()
+    open_frontend()
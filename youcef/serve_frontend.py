@@ -1,62 +1,36 @@
 """
-Simple HTTP Server for Frontend
-Serves the frontend on http://localhost:8080
+Open the Frontend
+The Flask backend serves the pages itself at http://127.0.0.1:5000/,
+precompressed and with cache headers (see back/static_assets.py); this
+script checks that it is running and opens the workers page.
 """
-import http.server
-import socketserver
-import os
+import urllib.request
 import webbrowser
-from pathlib import Path
 
 # Configuration
-PORT = 8080
-FRONTEND_DIR = "front"
+BACKEND_URL = "http://127.0.0.1:5000"
+PAGE = "khadama.html"
 
 def serve_frontend():
-    # Change to frontend directory
-    frontend_path = Path(__file__).parent / FRONTEND_DIR
-    if not frontend_path.exists():
-        print(f"❌ Frontend directory '{FRONTEND_DIR}' not found!")
+    try:
+        urllib.request.urlopen(f"{BACKEND_URL}/api/test", timeout=3).close()
+    except OSError:
+        print(f"❌ Backend not running on {BACKEND_URL}")
+        print("   To start backend: python back/app.py")
         return
     
-    os.chdir(frontend_path)
-    
-    # Create HTTP server
-    Handler = http.server.SimpleHTTPRequestHandler
-    Handler.extensions_map.update({
-        '.js': 'application/javascript',
-        '.css': 'text/css',
-        '.html': 'text/html',
-    })
+    print(f"🚀 Frontend served by the backend at: {BACKEND_URL}")
+    print(f"📋 Available pages:")
+    print(f"   - Overview: {BACKEND_URL}/index.html")
+    print(f"   - Workers:  {BACKEND_URL}/khadama.html")
+    print(f"   - Groups:   {BACKEND_URL}/groups.html")
     
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print(f"🌐 Frontend server starting...")
-        print(f"📂 Serving files from: {frontend_path}")
-        print(f"🚀 Server running at: http://localhost:{PORT}")
-        print(f"📋 Available pages:")
-        print(f"   - Overview: http://localhost:{PORT}/index.html")
-        print(f"   - Workers:  http://localhost:{PORT}/khadama.html")
-        print(f"   - Groups:   http://localhost:{PORT}/groups.html")
-        print("")
-        print("💡 Make sure the Flask backend is running on http://127.0.0.1:5000")
-        print("   To start backend: python back/app.py")
-        print("")
-        print("🔄 Press Ctrl+C to stop the server")
-        
-        # Auto-open browser
-        try:
-            webbrowser.open(f'http://localhost:{PORT}/khadama.html')
-            print("🌐 Opening browser automatically...")
-        except:
-            print("📝 Please open your browser manually")
-        
-        # Start serving
-        httpd.serve_forever()
+    # Auto-open browser
+    try:
+        webbrowser.open(f"{BACKEND_URL}/{PAGE}")
+        print("🌐 Opening browser automatically...")
+    except:
+        print("📝 Please open your browser manually")
 
 if __name__ == "__main__":
-    try:
-        serve_frontend()
-    except KeyboardInterrupt:
-        print("\n👋 Server stopped. Goodbye!")
-    except Exception as e:
-        print(f"❌ Error: {e}")
+    serve_frontend()
@@ -3,7 +3,7 @@ echo ==========================================
 echo   GPLAST Factory Management System
 echo ==========================================
 echo.
-echo Starting Frontend Server on localhost:8080...
+echo Opening the frontend served by the backend on 127.0.0.1:5000...
 echo.
 python serve_frontend.py
 pause
@@ -8,7 +8,7 @@ echo.
 echo Choose how to run the system:
 echo.
 echo 1. Simple Browser (Open HTML files directly)
-echo 2. Local Server (Recommended - Better CORS handling)
+echo 2. Local Server (Recommended - served by the backend, cached)
 echo 3. Start Backend Only
 echo 4. Exit
 echo.
@@ -58,21 +58,20 @@ cd /d "%~dp0back"
 start "Flask Backend" cmd /k "python app.py"
 
 echo.
-echo Starting Frontend Server...
-cd /d "%~dp0front"
-start "Frontend Server" cmd /k "python serve.py"
+echo Waiting for backend to start...
+timeout /t 5 /nobreak >nul
 
 echo.
-echo Waiting for servers to start...
-timeout /t 5 /nobreak >nul
+echo Opening frontend served by the backend...
+start "" "http://127.0.0.1:5000/launcher.html"
 
 echo.
 echo ✅ System Started!
 echo    Backend: http://127.0.0.1:5000
-echo    Frontend: http://localhost:8080
+echo    Frontend: http://127.0.0.1:5000/launcher.html
 echo    Admin PIN: 1234
 echo.
-echo Frontend will open automatically in your browser
+echo Frontend opened in your browser
 goto end
 
 :backend_only